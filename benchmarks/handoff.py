@@ -0,0 +1,139 @@
+"""
+Benchmark handing images to conversion worker processes.
+
+Compares pickling each image to a ProcessPoolExecutor (the image is
+serialized, written to a pipe, read back and rebuilt) with ConversionPool's
+shared-memory ring (the image is copied into a slot once and the worker reads
+it in place). `handoff/*` cases only touch one pixel in the worker, so they
+measure transport alone; `convert/*` cases run the real conversion.
+
+For each case the report gives wall time per image, the time the submitting
+thread spends per image (what an event loop would be blocked for), the CPU
+time the parent process spends per image (including the executor's feeder
+thread, which pickles off the submitting thread but still holds the GIL)
+and the bytes pickled per image.
+
+    python -m benchmarks.handoff --report bench/handoff.json
+    python -m benchmarks.handoff --workers 4 --sizes 512 --images 128
+"""
+import pickle
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import click
+from PIL import Image
+
+from src.processors import conversion_pool
+from src.processors.conversion_pool import ConversionPool, convert_sprites
+from .kernels import synthetic_image
+from .stats import write_report
+
+
+SOURCE_SIZES = (128, 256, 512)
+
+
+def _touch_image(image: Image.Image) -> int:
+    return image.getpixel((0, 0))[0]
+
+
+def _touch_slot(slot: int) -> int:
+    return int(conversion_pool._ring.view(slot)[0, 0, 0])
+
+
+def run_round(submit: Callable[[Image.Image], Any], images: List[Image.Image]) -> Dict[str, float]:
+    """Submit every image, wait for all results, and time both."""
+    submitting = 0.0
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    futures = []
+    for image in images:
+        before = time.perf_counter()
+        futures.append(submit(image))
+        submitting += time.perf_counter() - before
+    for future in futures:
+        future.result()
+    elapsed = time.perf_counter() - started
+    return {
+        'wall': elapsed / len(images),
+        'submit': submitting / len(images),
+        'parent_cpu': (time.process_time() - cpu_started) / len(images),
+    }
+
+
+def measure(submit: Callable[[Image.Image], Any], images: List[Image.Image], rounds: int) -> Dict[str, float]:
+    """Median per-image times over several rounds, after one warm-up round."""
+    run_round(submit, images)
+    runs = [run_round(submit, images) for _ in range(rounds)]
+    wall = statistics.median(run['wall'] for run in runs)
+    return {
+        'wall_us': round(wall * 1e6, 1),
+        'submit_us': round(statistics.median(run['submit'] for run in runs) * 1e6, 1),
+        'parent_cpu_us': round(statistics.median(run['parent_cpu'] for run in runs) * 1e6, 1),
+        'images_per_s': round(1 / wall, 1),
+    }
+
+
+def shared_handoff(pool: ConversionPool) -> Callable[[Image.Image], Any]:
+    """Submit through the pool's ring, as ConversionPool.submit does, without converting."""
+    def submit(image: Image.Image):
+        slot = pool.ring.put(image)
+        future = pool.executor.submit(_touch_slot, slot)
+        future.add_done_callback(lambda _: pool.ring.release(slot))
+        return future
+    return submit
+
+
+def run(sizes: List[int], count: int, workers: int, rounds: int) -> Dict[str, Dict[str, float]]:
+    """Run every case for each source size."""
+    results = {}
+    for size in sizes:
+        images = [synthetic_image(size, seed=n) for n in range(count)]
+        payload = len(pickle.dumps(images[0]))
+
+        for kind in ('handoff', 'convert'):
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                if kind == 'handoff':
+                    submit = lambda image: executor.submit(_touch_image, image)
+                else:
+                    submit = lambda image: executor.submit(convert_sprites, image, (16,))
+                results[f"{kind}/pickle/{size}px"] = dict(measure(submit, images, rounds), pickled_bytes=payload)
+
+            # A slot per image, so submitting never waits for a worker
+            with ConversionPool(workers, slots=count, max_side=size) as pool:
+                submit = shared_handoff(pool) if kind == 'handoff' else pool.submit
+                results[f"{kind}/shared/{size}px"] = dict(measure(submit, images, rounds), pickled_bytes=0)
+
+            for transport in ('pickle', 'shared'):
+                name = f"{kind}/{transport}/{size}px"
+                metrics = results[name]
+                click.echo(
+                    f"{name:24s} {metrics['wall_us']:>10.1f} us/image  "
+                    f"submit {metrics['submit_us']:>8.1f} us  parent CPU {metrics['parent_cpu_us']:>8.1f} us  "
+                    f"{metrics['images_per_s']:>8.1f} images/s"
+                )
+    return results
+
+
+@click.command()
+@click.option('--sizes', default=','.join(map(str, SOURCE_SIZES)), show_default=True,
+              help='Comma-separated source image sizes')
+@click.option('--images', 'count', type=click.IntRange(min=1), default=64, show_default=True,
+              help='Images per round')
+@click.option('--workers', type=click.IntRange(min=1), default=2, show_default=True, help='Worker processes')
+@click.option('--rounds', type=click.IntRange(min=1), default=5, show_default=True, help='Timed rounds per case')
+@click.option('--report', type=click.Path(dir_okay=False), default=None, help='Write results as JSON')
+def main(sizes, count, workers, rounds, report):
+    """Compare pickled and shared-memory image handoff to worker processes."""
+    size_list = [int(s) for s in sizes.split(',') if s.strip()]
+    results = run(size_list, count, workers, rounds)
+    if report:
+        config = {'sizes': size_list, 'images': count, 'workers': workers, 'rounds': rounds}
+        write_report(Path(report), 'handoff', results, config)
+        click.echo(f"Report written to {report}")
+
+
+if __name__ == '__main__':
+    main()
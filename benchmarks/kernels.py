@@ -0,0 +1,184 @@
+"""
+Micro-benchmarks for the pixel art processing kernels.
+
+Every case runs on deterministic synthetic input (seeded gradients plus
+blobs, so quantization has realistic work to do) and reports time per op,
+peak traced memory per op and the number of memory blocks an op leaves
+allocated. tracemalloc sees Python and NumPy allocations; Pillow's C image
+buffers are not traced.
+
+    python -m benchmarks.kernels --report bench/kernels.json
+    python -m benchmarks.kernels --baseline bench/kernels-main.json --tolerance 0.25
+"""
+import gc
+import statistics
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import click
+import numpy as np
+from PIL import Image
+
+from src.processors.pixel_art import (
+    analyze_pixel_art,
+    SPRITE_SIZES,
+    convert_to_pixel_art,
+    convert_to_pixel_art_sizes,
+    create_pixel_grid,
+    enhance_pixel_art_prompt,
+)
+from src.processors.prompts import PROMPT_ENGINE
+from src.processors.quality import score_sprites
+from src.processors.recolor import recolor_sprites, shift_hue
+from .stats import compare_metric, load_report, write_report
+
+
+INPUT_SIZES = (256, 512, 1024, 2048)
+PALETTE_SIZES = (8, 16, 32)
+PROMPTS = (
+    "a cute cat",
+    "a pixel art dragon sprite",
+    "an ancient castle on a hill at sunset with dramatic clouds and flying birds",
+)
+
+
+def synthetic_image(size: int, seed: int = 0) -> Image.Image:
+    """Deterministic RGB test image: smooth gradients with a few colored discs."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32) / size
+    pixels = np.stack([x * 255, y * 255, (1 - x) * y * 255], axis=-1)
+    for _ in range(6):
+        cx, cy, radius = rng.uniform(0.1, 0.9), rng.uniform(0.1, 0.9), rng.uniform(0.05, 0.25)
+        mask = (x - cx) ** 2 + (y - cy) ** 2 < radius ** 2
+        pixels[mask] = rng.integers(0, 256, size=3)
+    pixels += rng.normal(0, 6, size=pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def build_cases(sizes: Tuple[int, ...]) -> Dict[str, Callable[[], Any]]:
+    """Map case names to zero-argument callables."""
+    cases: Dict[str, Callable[[], Any]] = {}
+    sprites = {size: convert_to_pixel_art(synthetic_image(256, seed=size), size=size) for size in (16, 32)}
+
+    for size in sizes:
+        source = synthetic_image(size, seed=size)
+        for palette in PALETTE_SIZES:
+            for dithering in (True, False):
+                name = f"convert_to_pixel_art/{size}px/{palette}colors/{'dither' if dithering else 'nodither'}"
+                cases[name] = lambda s=source, p=palette, d=dithering: convert_to_pixel_art(
+                    s, size=16, color_palette_size=p, dithering=d
+                )
+        cases[f"convert_to_pixel_art/{size}px/32colors/transparent"] = lambda s=source: convert_to_pixel_art(
+            s, size=16, transparent=True
+        )
+        for count in (1, 2, len(SPRITE_SIZES)):
+            cases[f"convert_to_pixel_art_sizes/{size}px/{count}sizes"] = lambda s=source, c=count: (
+                convert_to_pixel_art_sizes(s, SPRITE_SIZES[:c])
+            )
+        cases[f"analyze_pixel_art/{size}px"] = lambda s=source: analyze_pixel_art(s)
+
+    for size, sprite in sprites.items():
+        cases[f"analyze_pixel_art/sprite{size}"] = lambda s=sprite: analyze_pixel_art(s)
+        for pixel_size in (10, 20):
+            cases[f"create_pixel_grid/sprite{size}/x{pixel_size}"] = lambda s=sprite, p=pixel_size: create_pixel_grid(
+                s, pixel_size=p
+            )
+        batch = [sprite] * 16
+        cases[f"score_sprites/sprite{size}/x16"] = lambda b=batch: score_sprites(b)
+        # Bulk recolor: one palette for the whole batch, one lookup per sprite
+        recolor_batch = [convert_to_pixel_art(synthetic_image(64, seed=n), size=size) for n in range(256)]
+        cases[f"recolor_sprites/sprite{size}/x256"] = lambda b=recolor_batch: recolor_sprites(b, shift_hue(90))
+
+    for i, prompt in enumerate(PROMPTS):
+        cases[f"enhance_pixel_art_prompt/prompt{i}"] = lambda p=prompt: enhance_pixel_art_prompt(p)
+        # The engine memoizes renders; time the rule scan itself too
+        cases[f"render_prompt/uncached/prompt{i}"] = lambda p=prompt: PROMPT_ENGINE._render(p, 'stability')
+
+    return cases
+
+
+def time_case(func: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, float]:
+    """Time one case with an auto-calibrated loop count; results in microseconds per op."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    runs = [t / number * 1e6 for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        'min_us': round(min(runs), 3),
+        'median_us': round(statistics.median(runs), 3),
+        'loops': number,
+    }
+
+
+def measure_memory(func: Callable[[], Any]) -> Dict[str, int]:
+    """Peak traced bytes during one op and blocks still allocated after it."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    retained = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    del result
+    return {'peak_bytes': peak - baseline, 'retained_blocks': retained}
+
+
+def run(sizes: Tuple[int, ...], repeat: int, min_time: float, pattern: str) -> Dict[str, Dict[str, float]]:
+    """Run every case whose name contains `pattern`."""
+    results = {}
+    for name, func in build_cases(sizes).items():
+        if pattern and pattern not in name:
+            continue
+        func()  # warm up caches and lazy imports
+        metrics = time_case(func, repeat, min_time)
+        metrics.update(measure_memory(func))
+        results[name] = metrics
+        click.echo(
+            f"{name:60s} {metrics['median_us']:>12.1f} us/op  "
+            f"peak {metrics['peak_bytes'] / 1024:>9.1f} KiB  retained {metrics['retained_blocks']:>5d} blocks"
+        )
+    return results
+
+
+@click.command()
+@click.option('--sizes', default=','.join(map(str, INPUT_SIZES)), show_default=True,
+              help='Comma-separated input image sizes')
+@click.option('--repeat', type=int, default=5, show_default=True, help='Timing repetitions per case')
+@click.option('--min-time', type=float, default=0.2, show_default=True, help='Seconds per repetition')
+@click.option('--filter', 'pattern', default='', help='Only run cases containing this text')
+@click.option('--report', type=click.Path(dir_okay=False), default=None, help='Write results as JSON')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='Previous report to compare against')
+@click.option('--tolerance', type=float, default=0.25, show_default=True,
+              help='Allowed relative slowdown of median time per op')
+def main(sizes, repeat, min_time, pattern, report, baseline, tolerance):
+    """Benchmark the pixel art kernels and optionally check for regressions."""
+    size_list = tuple(int(s) for s in sizes.split(',') if s.strip())
+    results = run(size_list, repeat, min_time, pattern)
+
+    if report:
+        config = {'sizes': size_list, 'repeat': repeat, 'min_time': min_time, 'filter': pattern}
+        write_report(Path(report), 'kernels', results, config)
+        click.echo(f"Report written to {report}")
+
+    if baseline:
+        regressions: List[str] = compare_metric(
+            results, load_report(Path(baseline))['results'], 'median_us', tolerance
+        )
+        if regressions:
+            for regression in regressions:
+                click.echo(click.style(f"REGRESSION {regression}", fg='red'))
+            sys.exit(1)
+        click.echo(f"No kernel slowed down by more than {tolerance:.0%}")
+
+
+if __name__ == '__main__':
+    main()
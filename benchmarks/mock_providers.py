@@ -0,0 +1,276 @@
+"""
+Local stand-ins for the image generation APIs.
+
+One aiohttp server answers the OpenAI, FreePik, Stability and Replicate
+endpoints the generators call (each under its own path prefix) plus a
+"CDN" route for URL downloads. Latency, error rate and payload size are
+configurable per provider. The server runs in a separate process so its
+CPU and memory do not skew measurements of the pipeline under test.
+
+    python -m benchmarks.mock_providers --port 9000 --latency 0.5 --error-rate 0.05
+"""
+import asyncio
+import base64
+import io
+import multiprocessing
+import random
+import time
+import uuid
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Optional
+
+import click
+import numpy as np
+from aiohttp import web
+from PIL import Image
+
+
+PROVIDERS = ('openai', 'freepik', 'stability', 'replicate')
+
+
+@dataclass
+class MockBehavior:
+    """How a mocked provider responds."""
+    latency: float = 0.0       # mean seconds spent "generating"
+    jitter: float = 0.0        # +/- uniform jitter around latency
+    error_rate: float = 0.0    # probability of a 500 response
+    image_size: int = 512      # side of returned square images when the request names no size
+    download_latency: float = 0.0  # seconds per CDN download
+
+
+@dataclass
+class MockConfig:
+    """Behavior for every provider, with optional per-provider overrides."""
+    default: MockBehavior = field(default_factory=MockBehavior)
+    overrides: Dict[str, MockBehavior] = field(default_factory=dict)
+    seed: int = 0
+
+    def behavior(self, provider: str) -> MockBehavior:
+        return self.overrides.get(provider, self.default)
+
+
+class MockProviderApp:
+    """aiohttp application implementing the mocked endpoints."""
+
+    def __init__(self, config: MockConfig, pool_size: int = 8):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.files: Dict[str, bytes] = {}
+        self.requests: Dict[str, int] = {provider: 0 for provider in PROVIDERS}
+        self._payloads: Dict[int, list] = {}
+        self._pool_size = pool_size
+
+    def _payload(self, size: int, seed: Optional[int] = None) -> bytes:
+        """
+        Return a pre-encoded noise PNG (noise compresses like real renders do not).
+
+        A seeded request always gets the same payload, like a seeded provider.
+        """
+        if size not in self._payloads:
+            np_rng = np.random.default_rng(self.config.seed + size)
+            pool = []
+            for _ in range(self._pool_size):
+                pixels = np_rng.integers(0, 256, size=(size, size, 3), dtype=np.uint8)
+                buffer = io.BytesIO()
+                Image.fromarray(pixels).save(buffer, 'PNG', compress_level=1)
+                pool.append(buffer.getvalue())
+            self._payloads[size] = pool
+        pool = self._payloads[size]
+        return self.rng.choice(pool) if seed is None else pool[seed % len(pool)]
+
+    async def _simulate(self, provider: str) -> Optional[web.Response]:
+        """Sleep for the configured latency and maybe fail."""
+        behavior = self.config.behavior(provider)
+        self.requests[provider] += 1
+        delay = behavior.latency + self.rng.uniform(-behavior.jitter, behavior.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.rng.random() < behavior.error_rate:
+            return web.json_response({'error': f'mock {provider} failure'}, status=500)
+        return None
+
+    def _size(self, provider: str, requested: Optional[int]) -> int:
+        """Honor the size a generator asked for, like the real APIs do."""
+        return int(requested) if requested else self.config.behavior(provider).image_size
+
+    def _file_url(
+        self, request: web.Request, provider: str, size: Optional[int] = None, seed: Optional[int] = None
+    ) -> str:
+        """Store a payload for the CDN route and return its URL."""
+        name = f"{provider}-{uuid.uuid4().hex}.png"
+        self.files[name] = self._payload(self._size(provider, size), seed)
+        return f"{request.scheme}://{request.host}/files/{name}"
+
+    def _b64(self, provider: str, size: Optional[int] = None, seed: Optional[int] = None) -> str:
+        return base64.b64encode(self._payload(self._size(provider, size), seed)).decode('ascii')
+
+    async def openai_generations(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        failure = await self._simulate('openai')
+        if failure:
+            return failure
+        n = int(body.get('n', 1))
+        size = int(body['size'].split('x')[0]) if body.get('size') else None
+        if body.get('response_format') == 'b64_json':
+            data = [{'b64_json': self._b64('openai', size)} for _ in range(n)]
+        else:
+            data = [{'url': self._file_url(request, 'openai', size)} for _ in range(n)]
+        return web.json_response({'created': int(time.time()), 'data': data})
+
+    async def freepik_text_to_image(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        failure = await self._simulate('freepik')
+        if failure:
+            return failure
+        data = [
+            {'base64': self._b64('freepik'), 'url': self._file_url(request, 'freepik'), 'has_nsfw': False}
+            for _ in range(int(body.get('num_images', 1)))
+        ]
+        return web.json_response({'data': data, 'meta': {'prompt': body.get('prompt')}})
+
+    async def stability_text_to_image(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        failure = await self._simulate('stability')
+        if failure:
+            return failure
+        artifacts = [
+            {
+                'base64': self._b64('stability', body.get('width'), body.get('seed')),
+                'seed': body.get('seed', 0), 'finishReason': 'SUCCESS'
+            }
+            for _ in range(int(body.get('samples', 1)))
+        ]
+        return web.json_response({'artifacts': artifacts})
+
+    async def replicate_predictions(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        failure = await self._simulate('replicate')
+        if failure:
+            return failure
+        prediction_id = uuid.uuid4().hex
+        return web.json_response({
+            'id': prediction_id,
+            'status': 'succeeded',
+            'output': [self._file_url(
+                request, 'replicate', body.get('input', {}).get('width'), body.get('input', {}).get('seed')
+            )],
+            'error': None,
+            'urls': {'get': f"{request.scheme}://{request.host}/replicate/v1/predictions/{prediction_id}"}
+        }, status=201)
+
+    async def download(self, request: web.Request) -> web.Response:
+        name = request.match_info['name']
+        provider = name.split('-', 1)[0]
+        behavior = self.config.behavior(provider)
+        if behavior.download_latency > 0:
+            await asyncio.sleep(behavior.download_latency)
+        payload = self.files.pop(name, None)
+        if payload is None:
+            raise web.HTTPNotFound()
+        return web.Response(body=payload, content_type='image/png')
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({'requests': self.requests})
+
+    def build(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.add_routes([
+            web.post('/openai/v1/images/generations', self.openai_generations),
+            web.post('/freepik/v1/ai/text-to-image', self.freepik_text_to_image),
+            web.post('/stability/v1/generation/{engine}/text-to-image', self.stability_text_to_image),
+            web.post('/replicate/v1/predictions', self.replicate_predictions),
+            web.get('/files/{name}', self.download),
+            web.get('/stats', self.stats),
+        ])
+        return app
+
+
+def provider_env(base_url: str) -> Dict[str, str]:
+    """Environment that points every generator at the mock server."""
+    return {
+        'OPENAI_API_KEY': 'mock-openai-key',
+        'OPENAI_BASE_URL': f'{base_url}/openai/v1',
+        'FREEPIK_API_KEY': 'mock-freepik-key',
+        'FREEPIK_BASE_URL': f'{base_url}/freepik/v1',
+        'STABILITY_API_KEY': 'mock-stability-key',
+        'STABILITY_BASE_URL': f'{base_url}/stability/v1',
+        'REPLICATE_API_TOKEN': 'mock-replicate-token',
+        'REPLICATE_BASE_URL': f'{base_url}/replicate/v1',
+    }
+
+
+def _serve(config_dict: dict, port: int, ready: "multiprocessing.Queue") -> None:
+    """Process entry point: run the mock server until terminated."""
+    config = MockConfig(
+        default=MockBehavior(**config_dict['default']),
+        overrides={name: MockBehavior(**b) for name, b in config_dict['overrides'].items()},
+        seed=config_dict['seed'],
+    )
+
+    async def run():
+        runner = web.AppRunner(MockProviderApp(config).build(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', port)
+        await site.start()
+        ready.put(runner.addresses[0][1])
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+class MockProviderServer:
+    """Runs MockProviderApp in a child process."""
+
+    def __init__(self, config: Optional[MockConfig] = None, port: int = 0):
+        self.config = config or MockConfig()
+        self.port = port
+        self.process: Optional[multiprocessing.Process] = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.port}'
+
+    def start(self) -> 'MockProviderServer':
+        context = multiprocessing.get_context('spawn')
+        ready = context.Queue()
+        config_dict = {
+            'default': asdict(self.config.default),
+            'overrides': {name: asdict(b) for name, b in self.config.overrides.items()},
+            'seed': self.config.seed,
+        }
+        self.process = context.Process(target=_serve, args=(config_dict, self.port, ready), daemon=True)
+        self.process.start()
+        self.port = ready.get(timeout=30)
+        return self
+
+    def stop(self) -> None:
+        if self.process and self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+    def env(self) -> Dict[str, str]:
+        return provider_env(self.base_url)
+
+    def __enter__(self) -> 'MockProviderServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+@click.command()
+@click.option('--port', type=int, default=9000, show_default=True)
+@click.option('--latency', type=float, default=0.0, help='Mean generation latency in seconds')
+@click.option('--jitter', type=float, default=0.0, help='Uniform latency jitter in seconds')
+@click.option('--error-rate', type=float, default=0.0, help='Probability of a 500 response')
+@click.option('--image-size', type=int, default=512, help='Side of returned images in pixels')
+def main(port, latency, jitter, error_rate, image_size):
+    """Run the mock provider server in the foreground."""
+    config = MockConfig(default=MockBehavior(latency, jitter, error_rate, image_size))
+    for key, value in provider_env(f'http://127.0.0.1:{port}').items():
+        click.echo(f"export {key}={value}")
+    web.run_app(MockProviderApp(config).build(), host='127.0.0.1', port=port, print=None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+End-to-end pipeline benchmark against local mock providers.
+
+Drives GeneratorRegistry -> convert_to_pixel_art -> OutputManager exactly as
+async_main does (minus the Gemini classification) and reports sprites per
+second, per-session latency percentiles and peak RSS. Results are written
+as JSON and can be checked against a previous report.
+
+    python -m benchmarks.pipeline --sessions 50 --concurrency 4 --latency 0.2 \
+        --report bench/pipeline.json --baseline bench/pipeline-main.json
+"""
+import asyncio
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import click
+
+from .mock_providers import MockBehavior, MockConfig, MockProviderServer, PROVIDERS
+from .stats import compare_metric, load_report, summarize_latencies, write_report
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+async def run_session(
+    registry, output_manager, session_path: Path, prompt: str, variations: int, seed: Optional[int] = None
+) -> Dict[str, int]:
+    """Generate, convert and save one session; mirrors steps 5-7 of async_main."""
+    from src.processors.pixel_art import convert_to_pixel_art
+
+    session_path.mkdir(parents=True, exist_ok=True)
+    all_results = await registry.generate_all(prompt, variations, seed=seed)
+
+    saved = 0
+    for provider, results in all_results.items():
+        for i, image in enumerate(results['images'], 1):
+            output_manager.save_image(convert_to_pixel_art(image), provider, i, session_path)
+            saved += 1
+
+    output_manager.save_metadata(prompt, {'image_description': prompt}, all_results, session_path, seed=seed)
+    errors = sum(len(results['errors']) for results in all_results.values())
+    return {'saved': saved, 'errors': errors}
+
+
+async def run_benchmark(
+    sessions: int,
+    concurrency: int,
+    variations: int,
+    output_dir: Path,
+    providers: List[str],
+    seed: Optional[int] = None
+) -> Dict[str, Any]:
+    """Run `sessions` pipeline sessions, `concurrency` at a time."""
+    from src.generators.registry import GeneratorRegistry
+    from src.processors.pixel_art import working_resolution
+    from src.utils.file_manager import OutputManager
+
+    registry = GeneratorRegistry()
+    registry.generators = {name: gen for name, gen in registry.generators.items() if name in providers}
+    # Reduce sources on download, as async_main does
+    registry.set_working_size(working_resolution())
+    output_manager = OutputManager(str(output_dir))
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    totals = {'saved': 0, 'errors': 0}
+
+    async def one(n: int):
+        async with semaphore:
+            start = time.perf_counter()
+            # Unique folders: timestamped sessions would collide within a second
+            result = await run_session(
+                registry, output_manager, output_dir / f"bench-{n:05d}",
+                f"benchmark sprite {n}", variations, seed
+            )
+            latencies.append(time.perf_counter() - start)
+            totals['saved'] += result['saved']
+            totals['errors'] += result['errors']
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(sessions)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'sessions': sessions,
+        'sprites': totals['saved'],
+        'errors': totals['errors'],
+        'elapsed_s': round(elapsed, 3),
+        'sprites_per_second': round(totals['saved'] / elapsed, 2),
+        'session_latency': summarize_latencies(latencies),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+@click.command()
+@click.option('--sessions', '-n', type=int, default=20, show_default=True, help='Sessions to run')
+@click.option('--concurrency', '-c', type=int, default=4, show_default=True, help='Sessions in flight')
+@click.option('--variations', '-v', type=click.IntRange(1, 4), default=2, show_default=True)
+@click.option('--providers', default=','.join(PROVIDERS), show_default=True, help='Comma-separated providers')
+@click.option('--latency', type=float, default=0.05, show_default=True, help='Mock generation latency (s)')
+@click.option('--jitter', type=float, default=0.0, help='Mock latency jitter (s)')
+@click.option('--error-rate', type=float, default=0.0, help='Mock error probability')
+@click.option('--download-latency', type=float, default=0.0, help='Mock CDN latency per URL download (s)')
+@click.option('--image-size', type=int, default=512, show_default=True, help='Mock image side (px)')
+@click.option('--seed', type=click.IntRange(min=1), default=None,
+              help='Seed the sessions; seeded mock providers then return the same images every run')
+@click.option('--output-dir', type=click.Path(file_okay=False), default=None, help='Defaults to a temp dir')
+@click.option('--report', type=click.Path(dir_okay=False), default=None, help='Write results as JSON')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='Previous report to compare against')
+@click.option('--tolerance', type=float, default=0.15, show_default=True, help='Allowed relative regression')
+def main(sessions, concurrency, variations, providers, latency, jitter, error_rate, download_latency, image_size,
+         seed, output_dir, report, baseline, tolerance):
+    """Benchmark the full generation pipeline against mock providers."""
+    # Per-image INFO logging would dominate the measurement
+    logging.disable(logging.INFO)
+    provider_list = [p.strip() for p in providers.split(',') if p.strip()]
+    config = MockConfig(default=MockBehavior(latency, jitter, error_rate, image_size, download_latency=download_latency))
+
+    with MockProviderServer(config) as server, tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(server.env())
+        target = Path(output_dir) if output_dir else Path(tmp)
+        results = asyncio.run(run_benchmark(sessions, concurrency, variations, target, provider_list, seed))
+
+    latency_stats = results['session_latency']
+    click.echo(
+        f"{results['sprites']} sprites in {results['elapsed_s']}s: "
+        f"{results['sprites_per_second']} sprites/s, session p50 {latency_stats['p50_ms']} ms, "
+        f"p95 {latency_stats['p95_ms']} ms, p99 {latency_stats['p99_ms']} ms, "
+        f"peak RSS {results['peak_rss_mb']} MiB, errors {results['errors']}"
+    )
+
+    config_dict = {
+        'sessions': sessions, 'concurrency': concurrency, 'variations': variations,
+        'providers': provider_list, 'latency': latency, 'jitter': jitter,
+        'error_rate': error_rate, 'download_latency': download_latency, 'image_size': image_size,
+        'seed': seed,
+    }
+    if report:
+        write_report(Path(report), 'pipeline', results, config_dict)
+        click.echo(f"Report written to {report}")
+
+    if baseline:
+        previous = load_report(Path(baseline))['results']
+        current = {'pipeline': {**results, **results['session_latency']}}
+        old = {'pipeline': {**previous, **previous['session_latency']}}
+        regressions = (
+            compare_metric(current, old, 'sprites_per_second', tolerance, higher_is_better=True)
+            + compare_metric(current, old, 'p95_ms', tolerance)
+            + compare_metric(current, old, 'peak_rss_mb', tolerance)
+        )
+        if regressions:
+            for regression in regressions:
+                click.echo(click.style(f"REGRESSION {regression}", fg='red'))
+            sys.exit(1)
+        click.echo("No regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Quality, latency and download-size benchmark for provider resolutions.
+
+Offline (default): for each sprite size, a 1024px synthetic render is
+resampled to every candidate provider resolution and converted to a sprite.
+Each sprite is compared with the render area-averaged down to sprite size,
+i.e. what the sprite should depict; the mean per-channel error shows how
+small a source can get before sprites get worse, and the PNG size at each
+resolution approximates the download saved.
+
+Live (--live): asks each configured provider for one image per resolution
+tier and reports generation latency and bytes downloaded. This spends API
+credits; point the *_BASE_URL variables at benchmarks.mock_providers to try
+it offline.
+
+    python -m benchmarks.resolution --report bench/resolution.json
+    python -m benchmarks.resolution --live --providers stability,openai
+"""
+import asyncio
+import io
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import click
+import numpy as np
+from PIL import Image
+
+from src.generators.resolution import RESOLUTION_TIERS, negotiate_settings
+from src.processors.pixel_art import convert_to_pixel_art
+from .kernels import synthetic_image
+from .stats import write_report
+
+
+SPRITE_SIZES = (16, 32, 64, 128)
+CANDIDATE_RESOLUTIONS = (128, 256, 320, 384, 512, 768, 1024)
+REFERENCE_RESOLUTION = 1024
+
+
+def sprite_error(sprite: Image.Image, reference: Image.Image) -> float:
+    """Mean absolute per-channel difference, 0-255."""
+    diff = np.asarray(sprite, dtype=np.int16) - np.asarray(reference, dtype=np.int16)
+    return float(np.abs(diff).mean())
+
+
+def png_size(image: Image.Image) -> int:
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.tell()
+
+
+def run_offline(seeds: int) -> Dict[str, Dict[str, Any]]:
+    """Sprite error and PNG size for every sprite size / source resolution pair."""
+    renders = [synthetic_image(REFERENCE_RESOLUTION, seed=seed) for seed in range(seeds)]
+    results = {}
+    for sprite_size in SPRITE_SIZES:
+        references = [r.resize((sprite_size, sprite_size), Image.Resampling.BOX) for r in renders]
+        for resolution in CANDIDATE_RESOLUTIONS:
+            if resolution < sprite_size:
+                continue
+            errors, sizes = [], []
+            for render, reference in zip(renders, references):
+                source = render.resize((resolution, resolution), Image.Resampling.LANCZOS)
+                sprite = convert_to_pixel_art(source, size=sprite_size, dithering=False)
+                errors.append(sprite_error(sprite, reference))
+                sizes.append(png_size(source))
+            results[f"sprite{sprite_size}/{resolution}px"] = {
+                'sprite_size': sprite_size,
+                'resolution': resolution,
+                'mean_error': round(float(np.mean(errors)), 2),
+                'png_kib': round(float(np.mean(sizes)) / 1024, 1),
+            }
+    return results
+
+
+async def run_live(providers: List[str], prompt: str) -> Dict[str, Dict[str, Any]]:
+    """Generate one image per provider tier and time it."""
+    from src.generators.registry import GeneratorRegistry
+    from src.utils.metrics import HTTP_BYTES
+
+    registry = GeneratorRegistry()
+    results = {}
+    for name, generator in registry.generators.items():
+        if name not in providers:
+            continue
+        for max_sprite_size, settings in RESOLUTION_TIERS.get(name, ()):
+            generator.sprite_size = max_sprite_size
+            downloaded = HTTP_BYTES.labels(name)
+            before = downloaded.get()
+            start = time.perf_counter()
+            try:
+                images = await generator.generate(prompt, 1)
+                error = None
+            except Exception as e:
+                images, error = [], str(e)
+            results[f"{name}/{settings.size}/{settings.steps or '-'}steps"] = {
+                'provider': name,
+                'settings': settings.size,
+                'steps': settings.steps,
+                'latency_s': round(time.perf_counter() - start, 2),
+                'download_kib': round((downloaded.get() - before) / 1024, 1),
+                'images': len(images),
+                'error': error,
+            }
+    return results
+
+
+@click.command()
+@click.option('--seeds', type=int, default=4, show_default=True, help='Synthetic renders per measurement')
+@click.option('--live', is_flag=True, help='Also call the configured providers (spends credits)')
+@click.option('--providers', default=','.join(RESOLUTION_TIERS), show_default=True,
+              help='Comma-separated providers for --live')
+@click.option('--prompt', default='a red potion bottle, pixel art', show_default=True, help='Prompt for --live')
+@click.option('--report', type=click.Path(dir_okay=False), default=None, help='Write results as JSON')
+def main(seeds, live, providers, prompt, report):
+    """Measure how source resolution affects sprite quality, latency and bytes."""
+    results = run_offline(seeds)
+    click.echo(f"{'case':24s} {'error':>8s} {'PNG KiB':>9s}  chosen by")
+    for name, row in results.items():
+        chosen = [
+            provider for provider in RESOLUTION_TIERS
+            if negotiate_settings(provider, row['sprite_size']).width == row['resolution']
+        ]
+        click.echo(f"{name:24s} {row['mean_error']:8.2f} {row['png_kib']:9.1f}  {', '.join(chosen)}")
+
+    if live:
+        provider_list = [p.strip() for p in providers.split(',') if p.strip()]
+        live_results = asyncio.run(run_live(provider_list, prompt))
+        for name, row in live_results.items():
+            status = row['error'] or f"{row['images']} image(s)"
+            click.echo(f"{name:32s} {row['latency_s']:7.2f}s {row['download_kib']:9.1f} KiB  {status}")
+        results.update(live_results)
+
+    if report:
+        write_report(Path(report), 'resolution', results, {'seeds': seeds, 'live': live})
+        click.echo(f"Report written to {report}")
+
+
+if __name__ == '__main__':
+    main()
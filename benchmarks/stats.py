@@ -0,0 +1,112 @@
+import json
+import platform
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+def summarize_latencies(samples: Iterable[float]) -> Dict[str, float]:
+    """
+    Summarize latency samples (seconds) as milliseconds.
+
+    Args:
+        samples: Latency samples in seconds
+
+    Returns:
+        Dictionary with count, mean, p50, p95, p99 and max in milliseconds
+    """
+    values = np.asarray(list(samples), dtype=np.float64) * 1000.0
+    if values.size == 0:
+        return {'count': 0, 'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'count': int(values.size),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'max_ms': round(float(values.max()), 3),
+    }
+
+
+def code_version() -> str:
+    """Return the current git revision, or 'unknown' outside a checkout."""
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def write_report(path: Path, benchmark: str, results: Any, config: Optional[Dict[str, Any]] = None) -> Path:
+    """
+    Write benchmark results as JSON, tagged with version and host information.
+
+    Args:
+        path: Output file
+        benchmark: Benchmark name
+        results: JSON-serializable results
+        config: Parameters the benchmark ran with
+
+    Returns:
+        Path to the written report
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        'benchmark': benchmark,
+        'version': code_version(),
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'config': config or {},
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def load_report(path: Path) -> Dict[str, Any]:
+    """Load a report written by write_report."""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def compare_metric(
+    current: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    metric: str,
+    tolerance: float,
+    higher_is_better: bool = False
+) -> List[str]:
+    """
+    Compare one metric per case against a baseline.
+
+    Args:
+        current: Mapping of case name to metrics
+        baseline: Mapping of case name to baseline metrics
+        metric: Metric key to compare
+        tolerance: Allowed relative regression (0.2 = 20%)
+        higher_is_better: Whether larger values are improvements
+
+    Returns:
+        Human-readable descriptions of cases that regressed beyond tolerance
+    """
+    regressions = []
+    for case, metrics in current.items():
+        if case not in baseline or metric not in metrics or metric not in baseline[case]:
+            continue
+        old, new = baseline[case][metric], metrics[metric]
+        if not old:
+            continue
+        change = (old - new) / old if higher_is_better else (new - old) / old
+        if change > tolerance:
+            regressions.append(f"{case}: {metric} {old} -> {new} ({change:+.0%})")
+    return regressions
@@ -0,0 +1,165 @@
+"""
+Load test for the output browser.
+
+Populates (optionally) a synthetic output tree, starts the UI server in the
+requested mode (or targets an already running one) and hammers directory
+listings and image fetches with concurrent keep-alive clients, reporting
+requests per second and latency percentiles per scenario.
+
+    python -m benchmarks.ui_load --output-dir /tmp/bench-output --populate 2000 --serve production
+    python -m benchmarks.ui_load --url http://localhost:8080 --output-dir ./output
+"""
+import asyncio
+import itertools
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import click
+import httpx
+import numpy as np
+from PIL import Image
+
+from src.utils.file_manager import OutputManager
+from .stats import summarize_latencies, write_report
+
+
+PROVIDERS = ['openai', 'freepik', 'stability', 'replicate']
+
+
+def populate_output(output_dir: Path, sessions: int, seed: int = 0) -> None:
+    """Write synthetic sessions of random 16x16 sprites through OutputManager."""
+    rng = np.random.default_rng(seed)
+    manager = OutputManager(str(output_dir))
+    for n in range(sessions):
+        session_path = output_dir / f"bench-{n:06d}"
+        session_path.mkdir(exist_ok=True)
+        manager.current_session = session_path
+        results = {}
+        for provider in PROVIDERS:
+            for variation in (1, 2):
+                pixels = rng.integers(0, 256, size=(16, 16, 3), dtype=np.uint8)
+                manager.save_image(Image.fromarray(pixels), provider, variation, session_path)
+            results[provider] = {'variations_requested': 2, 'variations_generated': 2, 'errors': []}
+        manager.save_metadata(f"benchmark sprite {n}", {'image_description': None}, results, session_path)
+
+
+def discover_targets(output_dir: Path, limit: int = 200) -> Dict[str, List[str]]:
+    """Build request paths per scenario from the sessions on disk."""
+    sessions = sorted(p.name for p in output_dir.iterdir() if p.is_dir() and not p.name.startswith('.'))
+    images = []
+    for session in sessions[:limit]:
+        for image in sorted((output_dir / session).glob('*/variation_*.png')):
+            images.append(image.relative_to(output_dir).as_posix())
+
+    return {
+        'listing_root': ['/'],
+        'listing_session': [f'/{session}' for session in sessions[:limit]],
+        'image_raw': [f'/raw/{image}' for image in images],
+        'image_preview': [f'/preview/{image}?scale=20&grid=1' for image in images],
+    }
+
+
+async def run_scenario(base_url: str, paths: List[str], concurrency: int, duration: float) -> Dict[str, float]:
+    """Issue requests from `concurrency` clients for `duration` seconds."""
+    latencies: List[float] = []
+    errors = 0
+    shuffled = paths[:]
+    random.Random(0).shuffle(shuffled)
+    cycle = itertools.cycle(shuffled)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(next(cycle))
+                    await response.aread()
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    result = summarize_latencies(latencies)
+    result['requests_per_second'] = round(len(latencies) / elapsed, 1)
+    result['errors'] = errors
+    return result
+
+
+def start_server(output_dir: Path, port: int, mode: str) -> subprocess.Popen:
+    """Start the UI server in a subprocess and wait until it answers."""
+    env = dict(os.environ, UI_OUTPUT_DIR=str(output_dir), UI_PORT=str(port), UI_SERVER=mode)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'src.ui_server'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/', timeout=1.0)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("UI server did not start within 30 seconds")
+
+
+@click.command()
+@click.option('--url', default=None, help='Base URL of a running UI server')
+@click.option('--output-dir', type=click.Path(file_okay=False), required=True, help='Output tree the server browses')
+@click.option('--populate', type=int, default=0, help='Write this many synthetic sessions first')
+@click.option('--serve', type=click.Choice(['production', 'dev']), default=None, help='Start the UI server in this mode')
+@click.option('--port', type=int, default=8765, help='Port for --serve')
+@click.option('--concurrency', '-c', type=int, default=32, help='Concurrent clients')
+@click.option('--duration', '-d', type=float, default=10.0, help='Seconds per scenario')
+@click.option('--report', type=click.Path(dir_okay=False), default=None, help='Write results as JSON')
+def main(url, output_dir, populate, serve, port, concurrency, duration, report):
+    """Load-test directory listings and image fetches of the UI server."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if populate:
+        click.echo(f"Populating {populate} sessions in {output_dir}...")
+        populate_output(output_dir, populate)
+
+    if not url and not serve:
+        raise click.UsageError("Pass --url for a running server or --serve to start one")
+
+    process = start_server(output_dir, port, serve) if serve else None
+    base_url = url or f'http://127.0.0.1:{port}'
+    try:
+        results = {}
+        for scenario, paths in discover_targets(output_dir).items():
+            if not paths:
+                continue
+            results[scenario] = asyncio.run(run_scenario(base_url, paths, concurrency, duration))
+            r = results[scenario]
+            click.echo(
+                f"{scenario:16s} {r['requests_per_second']:>9.1f} req/s  "
+                f"p50 {r['p50_ms']:>7.2f} ms  p99 {r['p99_ms']:>7.2f} ms  errors {r['errors']}"
+            )
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    if report:
+        config = {'server': serve or url, 'concurrency': concurrency, 'duration': duration}
+        write_report(Path(report), 'ui_load', results, config)
+        click.echo(f"Report written to {report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ from pydantic_ai import Agent
 from pydantic_ai.models.gemini import GeminiModel
 from pydantic_ai.providers.google_gla import GoogleGLAProvider
 from .models import ImageQueryClassification
+from ..utils.tracing import traced
 
 
 class QueryClassifier:
@@ -41,6 +42,7 @@ Analyze the query and return:
 - rejection_reason: explanation of why it's not an image request (if applicable)"""
         )
     
+    @traced('QueryClassifier.classify')
     async def classify(self, query: str) -> ImageQueryClassification:
         result = await self.agent.run(query)
         return result.data
@@ -1,28 +1,156 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
-from PIL import Image
+from dataclasses import asdict
+from typing import List, Dict, Any, Iterable, Optional, Union
+from PIL import Image, ImageFile
+import asyncio
+import base64
+import binascii
+import httpx
+import io
 import logging
+import os
+from .pricing import estimate_cost
+from .resolution import GenerationSettings, negotiate_settings
+from ..processors.prompts import PROMPT_ENGINE
+from ..utils.instrumentation import InstrumentedTransport
+from ..utils.metrics import (
+    PROVIDER_COST,
+    PROVIDER_ERRORS,
+    PROVIDER_IMAGES,
+    PROVIDER_LATENCY,
+    PROVIDER_REQUESTS,
+    RATE_LIMIT_WAIT,
+)
+from ..utils.tracing import span
+
+
+# Downloads larger than this are refused rather than buffered
+MAX_DOWNLOAD_BYTES = int(os.getenv('MAX_DOWNLOAD_BYTES', 32 * 1024 * 1024))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Most variations a single provider call asks for: the --variations limit,
+# and what budget redistribution may move onto one provider
+MAX_VARIATIONS = 4
+
+# How closely image-to-image results follow the source image, from 0 (only
+# the prompt matters) to 1 (the source comes back unchanged)
+DEFAULT_STRENGTH = 0.35
+
+# Seeds run from 1 to SEED_MAX: unsigned 32-bit, the widest range every seeded
+# provider accepts, without 0, which Stability takes as "pick one at random"
+SEED_MAX = 2 ** 32 - 1
+
+
+def variation_seeds(seed: Optional[int], numbers: Iterable[int]) -> Optional[List[int]]:
+    """
+    Seeds of some variations of a seeded session: variation N uses seed + N - 1.
+    
+    Args:
+        seed: Session seed (1 to SEED_MAX), or None for an unseeded session
+        numbers: Variation numbers (1-based)
+        
+    Returns:
+        One seed per variation number, wrapping past SEED_MAX back to 1, or
+        None if the session is unseeded
+    """
+    if seed is None:
+        return None
+    return [(seed + number - 2) % SEED_MAX + 1 for number in numbers]
 
 
 class ImageGenerator(ABC):
+    # Whether the provider accepts a seed, making its output reproducible
+    SUPPORTS_SEED = False
+    # Whether generate_from_image is implemented (image-to-image or variations)
+    SUPPORTS_IMAGE_INPUT = False
+    
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key
         self.logger = logging.getLogger(self.__class__.__name__)
+        # Largest side kept after download; None keeps the full resolution
+        self.working_size: Optional[int] = None
+        self.max_download_bytes = MAX_DOWNLOAD_BYTES
+        # Side of the sprites made from this generator's images
+        self.sprite_size = 16
+        # Prompt template name; None uses the provider's usual template
+        self.prompt_template: Optional[str] = None
+        # Optional SharedRateLimiter drawn from before each generation
+        self.rate_limiter = None
+        # Optional CostLedger charged after each generation
+        self.ledger = None
     
     @abstractmethod
-    async def generate(self, prompt: str, variations: int = 1) -> List[Image.Image]:
+    async def generate(
+        self,
+        prompt: str,
+        variations: int = 1,
+        seeds: Optional[List[int]] = None
+    ) -> List[Image.Image]:
         """
         Generate images based on the prompt.
         
         Args:
             prompt: The image description/prompt
             variations: Number of variations to generate (1-4)
+            seeds: Optional seed for each variation; ignored by providers
+                that don't accept one (SUPPORTS_SEED is False)
             
         Returns:
             List of PIL Image objects
         """
         pass
     
+    async def generate_from_image(
+        self,
+        image: Image.Image,
+        prompt: str,
+        variations: int = 1,
+        strength: float = DEFAULT_STRENGTH,
+        seeds: Optional[List[int]] = None
+    ) -> List[Image.Image]:
+        """
+        Generate images starting from an existing image instead of noise.
+        
+        Only providers with SUPPORTS_IMAGE_INPUT implement this.
+        
+        Args:
+            image: Source image, e.g. a saved sprite or its archived source
+            prompt: The image description/prompt
+            variations: Number of variations to generate (1-4)
+            strength: How closely results follow the source (0-1); ignored
+                by providers that can't weigh it
+            seeds: Optional seed for each variation
+            
+        Returns:
+            List of PIL Image objects
+        """
+        raise NotImplementedError(f"{self.get_service_name()} does not generate from images")
+    
+    def source_png(self, image: Image.Image) -> bytes:
+        """
+        Encode a source image at the negotiated resolution for upload.
+        
+        Sprites are scaled up with nearest neighbor so their pixels stay
+        crisp blocks; transparent areas are flattened onto white.
+        
+        Args:
+            image: Source image of any size and mode
+            
+        Returns:
+            PNG bytes of an RGB image
+        """
+        settings = self.settings
+        size = (settings.width, settings.height) if settings else image.size
+        if image.mode != 'RGB':
+            rgba = image.convert('RGBA')
+            image = Image.new('RGB', rgba.size, 'white')
+            image.paste(rgba, mask=rgba.getchannel('A'))
+        upscaling = image.width < size[0] or image.height < size[1]
+        image = image.resize(size, Image.Resampling.NEAREST if upscaling else Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG')
+        return buffer.getvalue()
+    
     @abstractmethod
     def get_service_name(self) -> str:
         """Return the name of the image generation service."""
@@ -33,10 +161,142 @@ class ImageGenerator(ABC):
         """Check if the service is available (API key configured, etc.)."""
         pass
     
-    async def generate_with_metadata(self, prompt: str, variations: int = 1) -> Dict[str, Any]:
+    @property
+    def settings(self) -> Optional[GenerationSettings]:
+        """Cheapest resolution, steps and model that serve the sprite size."""
+        return negotiate_settings(self.get_service_name(), self.sprite_size)
+    
+    @property
+    def cost_per_image(self) -> Optional[float]:
+        """Estimated USD per image at the negotiated settings, None if unknown."""
+        return estimate_cost(self.get_service_name(), self.settings)
+    
+    def style_prompt(self, prompt: str) -> str:
+        """Add this provider's pixel art template to a prompt."""
+        return PROMPT_ENGINE.render(prompt, self.get_service_name(), self.prompt_template)
+    
+    def http_client(self, **kwargs) -> httpx.AsyncClient:
+        """Create an httpx client whose requests are recorded in traces and metrics."""
+        return httpx.AsyncClient(transport=InstrumentedTransport(provider=self.get_service_name()), **kwargs)
+    
+    async def download_image(self, client: httpx.AsyncClient, url: str, timeout: float = 60.0) -> Image.Image:
+        """
+        Stream an image, decoding chunks as they arrive, and reduce it to the working size.
+        
+        Args:
+            client: HTTP client to download with
+            url: Image URL
+            timeout: Request timeout in seconds
+            
+        Returns:
+            Decoded PIL Image, no larger than working_size on its longest side
+        """
+        parser = ImageFile.Parser()
+        received = 0
+        
+        async with client.stream('GET', url, timeout=timeout) as response:
+            if response.status_code != 200:
+                raise Exception(f"Image download returned status {response.status_code}")
+            
+            declared = int(response.headers.get('content-length') or 0)
+            if declared > self.max_download_bytes:
+                raise Exception(f"Image of {declared} bytes exceeds the {self.max_download_bytes} byte limit")
+            
+            async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                received += len(chunk)
+                if received > self.max_download_bytes:
+                    raise Exception(f"Image download exceeded the {self.max_download_bytes} byte limit")
+                parser.feed(chunk)
+        
+        return self.reduce_image(parser.close())
+    
+    def decode_image(self, payload: str) -> Image.Image:
+        """
+        Decode an inline base64 image (or data: URI) and reduce it to the working size.
+        
+        Args:
+            payload: Base64 text as returned in provider JSON, optionally a data: URI
+            
+        Returns:
+            Decoded PIL Image
+        """
+        if payload.startswith('data:'):
+            payload = payload.partition(',')[2]
+        
+        if len(payload) * 3 // 4 > self.max_download_bytes:
+            raise Exception(f"Inline image exceeds the {self.max_download_bytes} byte limit")
+        
+        try:
+            data = base64.b64decode(payload)
+        except binascii.Error as e:
+            raise Exception(f"Invalid base64 image payload: {e}")
+        
+        # BytesIO shares the decoded bytes rather than copying them
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        return self.reduce_image(image)
+    
+    async def fetch_image(self, client: httpx.AsyncClient, reference: str) -> Image.Image:
+        """Return the image behind a URL or data: URI."""
+        if reference.startswith('data:'):
+            return self.decode_image(reference)
+        return await self.download_image(client, reference)
+    
+    @staticmethod
+    async def collect_images(pending: List[Union[Image.Image, "asyncio.Task[Image.Image]"]]) -> List[Image.Image]:
+        """
+        Resolve decoded images and download tasks started while generating, in order.
+        
+        Downloads still running are cancelled if any of them fails.
+        """
+        tasks = [item for item in pending if isinstance(item, asyncio.Task)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            await ImageGenerator.cancel_downloads(pending)
+        return [item.result() if isinstance(item, asyncio.Task) else item for item in pending]
+    
+    @staticmethod
+    async def cancel_downloads(pending: List[Union[Image.Image, "asyncio.Task[Image.Image]"]]) -> None:
+        """
+        Cancel download tasks that have not finished and wait for them to unwind.
+        
+        Generators call this once their request loop exits, so a failed API call
+        does not leave earlier downloads running against a closed client.
+        """
+        tasks = [item for item in pending if isinstance(item, asyncio.Task) and not item.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def reduce_image(self, image: Image.Image) -> Image.Image:
+        """Shrink an image to the working size so full-resolution pixels are not held."""
+        if self.working_size is None or max(image.size) <= self.working_size:
+            return image
+        
+        scale = self.working_size / max(image.size)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        # Nearest neighbor, like convert_to_pixel_art, so sprites keep their hard edges
+        return image.resize(size, Image.Resampling.NEAREST)
+    
+    async def generate_with_metadata(
+        self,
+        prompt: str,
+        variations: int = 1,
+        seeds: Optional[List[int]] = None,
+        source: Optional[Image.Image] = None,
+        strength: float = DEFAULT_STRENGTH
+    ) -> Dict[str, Any]:
         """
         Generate images with metadata about the generation process.
         
+        Args:
+            prompt: The image description/prompt
+            variations: Number of variations to generate
+            seeds: Optional seed for each variation
+            source: Optional image to start from (generate_from_image)
+            strength: How closely results follow the source image
+        
         Returns:
             Dictionary containing:
             - 'images': List of PIL Image objects
@@ -44,6 +304,11 @@ class ImageGenerator(ABC):
             - 'prompt': Original prompt
             - 'variations_requested': Number of variations requested
             - 'variations_generated': Actual number generated
+            - 'settings': Resolution, steps and model requested
+            - 'template': Name of the prompt template used
+            - 'seeded': Whether the provider generated from the given seeds
+            - 'from_image': Whether the images were generated from a source image
+            - 'cost': Estimated USD spent, None if the price is unknown
             - 'errors': Any errors encountered
         """
         metadata = {
@@ -51,16 +316,54 @@ class ImageGenerator(ABC):
             'prompt': prompt,
             'variations_requested': variations,
             'variations_generated': 0,
+            'settings': asdict(self.settings) if self.settings else None,
+            'template': PROMPT_ENGINE.template(self.get_service_name(), self.prompt_template).name,
+            'seeded': seeds is not None and self.SUPPORTS_SEED,
+            'from_image': source is not None,
             'images': [],
             'errors': []
         }
         
+        service = metadata['service']
+        PROVIDER_REQUESTS.labels(service).inc()
+        
+        # One request per variation; waiting for quota is not provider latency
+        if self.rate_limiter is not None:
+            with span('RateLimiter.acquire', provider=service, requests=variations):
+                waited = await self.rate_limiter.acquire(service, variations)
+            if waited:
+                RATE_LIMIT_WAIT.labels(service).inc(waited)
+        
         try:
-            images = await self.generate(prompt, variations)
+            with PROVIDER_LATENCY.labels(service).time(), \
+                    span('ImageGenerator.generate', provider=service, variations=variations) as current:
+                if source is not None:
+                    images = await self.generate_from_image(source, prompt, variations, strength, seeds=seeds)
+                else:
+                    images = await self.generate(prompt, variations, seeds=seeds)
+                if current is not None:
+                    current.attributes['images'] = len(images)
             metadata['images'] = images
             metadata['variations_generated'] = len(images)
+            PROVIDER_IMAGES.labels(service).inc(len(images))
         except Exception as e:
             self.logger.error(f"Error generating images: {e}")
             metadata['errors'].append(str(e))
+            PROVIDER_ERRORS.labels(service).inc()
+        
+        # Only images received are charged
+        price = self.cost_per_image
+        metadata['cost'] = None if price is None else price * metadata['variations_generated']
+        if metadata['cost']:
+            PROVIDER_COST.labels(service).inc(metadata['cost'])
+        if self.ledger is not None:
+            try:
+                self.ledger.record(
+                    service, requests=variations, images=metadata['variations_generated'],
+                    failures=1 if metadata['errors'] else 0, cost=metadata['cost'] or 0.0
+                )
+            except Exception as e:
+                # Bookkeeping never fails a generation
+                self.logger.warning(f"Failed to record {service} charge: {e}")
             
         return metadata
\ No newline at end of file
@@ -1,7 +1,6 @@
 import os
 from typing import List, Optional, Dict, Any
 from PIL import Image
-import io
 import httpx
 import asyncio
 from .base import ImageGenerator
@@ -11,7 +10,7 @@ class FreePikGenerator(ImageGenerator):
     def __init__(self, api_key: Optional[str] = None):
         api_key = api_key or os.getenv('FREEPIK_API_KEY')
         super().__init__(api_key)
-        self.base_url = "https://api.freepik.com/v1"
+        self.base_url = os.getenv('FREEPIK_BASE_URL', "https://api.freepik.com/v1")
     
     def get_service_name(self) -> str:
         return "freepik"
@@ -19,21 +18,29 @@ class FreePikGenerator(ImageGenerator):
     def is_available(self) -> bool:
         return self.api_key is not None
     
-    async def generate(self, prompt: str, variations: int = 1) -> List[Image.Image]:
+    async def generate(
+        self,
+        prompt: str,
+        variations: int = 1,
+        seeds: Optional[List[int]] = None
+    ) -> List[Image.Image]:
         if not self.is_available():
             raise ValueError("FreePik API key not configured")
         
         images = []
         
-        # Add pixel art style to the prompt
-        enhanced_prompt = f"{prompt}, pixel art style, 16-bit, retro game sprite"
+        # Add this provider's pixel art template to the prompt
+        enhanced_prompt = self.style_prompt(prompt)
         
         headers = {
             "x-freepik-api-key": self.api_key,
             "Content-Type": "application/json"
         }
         
-        async with httpx.AsyncClient() as client:
+        # URL-only results are downloaded on the shared client between requests
+        pending = []
+        
+        async with self.http_client() as client:
             try:
                 # Generate images
                 for i in range(variations):
@@ -61,21 +68,24 @@ class FreePikGenerator(ImageGenerator):
                     
                     result = response.json()
                     
-                    # Extract image URL from response
+                    # Prefer the inline image; fall back to downloading its URL
                     if "data" in result and len(result["data"]) > 0:
-                        image_url = result["data"][0].get("url")
-                        if image_url:
-                            # Download the image
-                            image_response = await client.get(image_url)
-                            image = Image.open(io.BytesIO(image_response.content))
-                            images.append(image)
+                        data = result["data"][0]
+                        if data.get("base64"):
+                            pending.append(self.decode_image(data["base64"]))
+                        elif data.get("url"):
+                            pending.append(asyncio.create_task(self.fetch_image(client, data["url"])))
                     
                     # Add small delay between requests to avoid rate limiting
                     if i < variations - 1:
                         await asyncio.sleep(1)
+                
+                images = await self.collect_images(pending)
                         
             except Exception as e:
                 self.logger.error(f"Failed to generate image with FreePik: {e}")
                 raise
+            finally:
+                await self.cancel_downloads(pending)
             
         return images
\ No newline at end of file
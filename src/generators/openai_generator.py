@@ -1,13 +1,15 @@
 import os
 from typing import List, Optional
 from PIL import Image
-import io
 import httpx
 from openai import AsyncOpenAI
-from .base import ImageGenerator
+from .base import DEFAULT_STRENGTH, ImageGenerator
+from ..utils.tracing import span
 
 
 class OpenAIGenerator(ImageGenerator):
+    SUPPORTS_IMAGE_INPUT = True
+    
     def __init__(self, api_key: Optional[str] = None):
         api_key = api_key or os.getenv('OPENAI_API_KEY')
         super().__init__(api_key)
@@ -23,35 +25,90 @@ class OpenAIGenerator(ImageGenerator):
     def is_available(self) -> bool:
         return self.api_key is not None and self.client is not None
     
-    async def generate(self, prompt: str, variations: int = 1) -> List[Image.Image]:
+    async def generate(
+        self,
+        prompt: str,
+        variations: int = 1,
+        seeds: Optional[List[int]] = None
+    ) -> List[Image.Image]:
         if not self.is_available():
             raise ValueError("OpenAI API key not configured")
         
         images = []
+        settings = self.settings
         
-        # Add pixel art style to the prompt for better results
-        enhanced_prompt = f"{prompt}, pixel art style, 16-bit, retro game art"
+        # Add this provider's pixel art template to the prompt
+        enhanced_prompt = self.style_prompt(prompt)
         
         try:
             # Generate multiple images in parallel
             for i in range(variations):
-                response = await self.client.images.generate(
-                    model="dall-e-2",  # Using DALL-E 2 as it supports smaller sizes
-                    prompt=enhanced_prompt,
-                    size="256x256",  # Smallest available size
-                    n=1,
-                    response_format="url"
-                )
+                # The SDK owns its HTTP client, so trace the API call as a whole
+                with span('http', method='POST', url=f"{self.client.base_url}images/generations",
+                          provider=self.get_service_name()):
+                    response = await self.client.images.generate(
+                        model=settings.model,
+                        prompt=enhanced_prompt,
+                        size=settings.size,  # Smallest size that serves the sprite
+                        n=1,
+                        # Inline payload: no second request to fetch the image
+                        response_format="b64_json"
+                    )
                 
-                # Download the image
-                image_url = response.data[0].url
-                async with httpx.AsyncClient() as http_client:
-                    image_response = await http_client.get(image_url)
-                    image = Image.open(io.BytesIO(image_response.content))
-                    images.append(image)
+                data = response.data[0]
+                if data.b64_json:
+                    images.append(self.decode_image(data.b64_json))
+                else:
+                    async with self.http_client() as http_client:
+                        images.append(await self.download_image(http_client, data.url))
                     
         except Exception as e:
             self.logger.error(f"Failed to generate image with OpenAI: {e}")
             raise
             
-        return images
\ No newline at end of file
+        return images
+    
+    async def generate_from_image(
+        self,
+        image: Image.Image,
+        prompt: str,
+        variations: int = 1,
+        strength: float = DEFAULT_STRENGTH,
+        seeds: Optional[List[int]] = None
+    ) -> List[Image.Image]:
+        """
+        Generate DALL-E 2 variations of an image.
+        
+        The variations endpoint takes no prompt or strength: results are
+        new takes on the source image alone.
+        """
+        if not self.is_available():
+            raise ValueError("OpenAI API key not configured")
+        
+        settings = self.settings
+        images = []
+        
+        try:
+            # One request for all variations; the endpoint takes n up to 10
+            with span('http', method='POST', url=f"{self.client.base_url}images/variations",
+                      provider=self.get_service_name()):
+                response = await self.client.images.create_variation(
+                    image=("source.png", self.source_png(image), "image/png"),
+                    model=settings.model,
+                    size=settings.size,
+                    n=variations,
+                    response_format="b64_json"
+                )
+            
+            for data in response.data:
+                if data.b64_json:
+                    images.append(self.decode_image(data.b64_json))
+                else:
+                    async with self.http_client() as http_client:
+                        images.append(await self.download_image(http_client, data.url))
+        
+        except Exception as e:
+            self.logger.error(f"Failed to generate image variations with OpenAI: {e}")
+            raise
+        
+        return images
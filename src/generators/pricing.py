@@ -0,0 +1,53 @@
+import os
+from typing import Dict, Optional, Tuple
+from .resolution import GenerationSettings
+
+
+# Estimated list prices in USD per image for the settings in
+# RESOLUTION_TIERS. Providers bill in their own units (credits, GPU seconds),
+# so these are approximations for budgeting; set PRICE_<PROVIDER> (USD per
+# image, e.g. PRICE_OPENAI=0.02) when an account is billed differently.
+
+# DALL-E 2 is priced per image by size
+SIZE_PRICES: Dict[str, Dict[str, float]] = {
+    'openai': {'256x256': 0.016, '512x512': 0.018, '1024x1024': 0.020},
+}
+
+# Diffusion providers bill compute, which grows with steps and pixels:
+# (USD at the reference settings, reference pixels, reference steps)
+SCALED_PRICES: Dict[str, Tuple[float, int, int]] = {
+    # 0.9 credits at $0.01 for a 512x512, 30-step SD 1.6 image
+    'stability': (0.009, 512 * 512, 30),
+    # About 3 GPU seconds for a 512x512, 50-step image
+    'replicate': (0.0023, 512 * 512, 50),
+}
+
+FLAT_PRICES: Dict[str, float] = {
+    'freepik': 0.005,
+}
+
+
+def estimate_cost(provider: str, settings: Optional[GenerationSettings]) -> Optional[float]:
+    """
+    Estimate what one image costs at the given settings.
+
+    Args:
+        provider: Generator service name
+        settings: Negotiated settings, or None if the provider has no tiers
+
+    Returns:
+        USD per image, or None if the price is unknown
+    """
+    override = os.getenv(f'PRICE_{provider.upper()}')
+    if override:
+        return float(override)
+    if provider in FLAT_PRICES:
+        return FLAT_PRICES[provider]
+    if settings is None:
+        return None
+    if provider in SIZE_PRICES:
+        return SIZE_PRICES[provider].get(settings.size)
+    if provider in SCALED_PRICES:
+        price, pixels, steps = SCALED_PRICES[provider]
+        return price * (settings.width * settings.height / pixels) * ((settings.steps or steps) / steps)
+    return None
@@ -1,20 +1,27 @@
 import os
 import asyncio
-from typing import Dict, List, Any
+import copy
+import hashlib
+import json
+from dataclasses import asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from PIL import Image
 import logging
-from .base import ImageGenerator
+from .base import DEFAULT_STRENGTH, MAX_VARIATIONS, ImageGenerator, variation_seeds
 from .openai_generator import OpenAIGenerator
 from .freepik_generator import FreePikGenerator
 from .replicate_generator import ReplicateGenerator
 from .stability_generator import StabilityGenerator
+from ..utils.ledger import Allocation
 from ..utils.logger import setup_logger
+from ..utils.metrics import BUDGET_CUTS
 
 
 class GeneratorRegistry:
     def __init__(self):
         self.logger = setup_logger(__name__)
         self.generators: Dict[str, ImageGenerator] = {}
+        self.ledger = None
         self._register_all_generators()
     
     def _register_all_generators(self):
@@ -60,64 +67,288 @@ class GeneratorRegistry:
         if not self.generators:
             self.logger.warning("No image generators registered. Please configure API keys.")
     
+    def for_session(self) -> 'GeneratorRegistry':
+        """
+        A registry for one session, sharing this one's connections.
+        
+        The setters below change generator attributes, and sessions running
+        concurrently on one registry (e.g. batch lanes) would otherwise see
+        each other's templates, sizes and ledger. Generators are shallow
+        copies, so HTTP clients and the rate limiter stay shared.
+        
+        Returns:
+            Registry whose settings can be changed without affecting this one
+        """
+        session = copy.copy(self)
+        session.generators = {name: copy.copy(generator) for name, generator in self.generators.items()}
+        return session
+    
+    def set_working_size(self, size: Optional[int]) -> None:
+        """
+        Set the largest side generators reduce downloaded images to.
+        
+        Args:
+            size: Maximum side in pixels, or None to keep full-resolution sources
+        """
+        for generator in self.generators.values():
+            generator.working_size = size
+    
+    def set_sprite_size(self, size: int) -> None:
+        """
+        Set the sprite size generators negotiate their resolution for.
+        
+        Args:
+            size: Side of the pixel art made from generated images
+        """
+        for generator in self.generators.values():
+            generator.sprite_size = size
+    
+    def set_rate_limiter(self, limiter) -> None:
+        """
+        Make every generator wait for quota from a shared rate limiter.
+        
+        Args:
+            limiter: SharedRateLimiter, or None to stop limiting
+        """
+        for generator in self.generators.values():
+            generator.rate_limiter = limiter
+    
+    def set_ledger(self, ledger) -> None:
+        """
+        Charge every generation to a cost ledger and keep providers within its budgets.
+        
+        Args:
+            ledger: CostLedger, or None to stop accounting
+        """
+        self.ledger = ledger
+        for generator in self.generators.values():
+            generator.ledger = ledger
+    
+    def set_prompt_templates(self, templates: Dict[str, str]) -> None:
+        """
+        Set the prompt template each provider styles its prompts with.
+        
+        Args:
+            templates: Template name per provider; others keep their usual template
+        """
+        for name, generator in self.generators.items():
+            generator.prompt_template = templates.get(name)
+    
+    def flight_key(self, prompt: str, variations: int, seed: Optional[int] = None) -> str:
+        """
+        Identify a generate_all call, for sharing its results across processes.
+        
+        Two calls get the same key only if they would send the same requests
+        and reduce the images to the same size.
+        
+        Args:
+            prompt: Image generation prompt
+            variations: Number of variations per provider
+            seed: Session seed, if any
+            
+        Returns:
+            Hex digest of the prompt, variations, seed and per-provider
+            settings and styled prompt
+        """
+        providers = {
+            name: {
+                'settings': asdict(generator.settings) if generator.settings else None,
+                'working_size': generator.working_size,
+                'styled_prompt': generator.style_prompt(prompt)
+            }
+            for name, generator in sorted(self.generators.items())
+        }
+        payload = json.dumps(
+            {'prompt': prompt, 'variations': variations, 'seed': seed, 'providers': providers}, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
     def get_available_generators(self) -> List[str]:
         """Get list of available generator names."""
         return list(self.generators.keys())
     
-    async def generate_all(self, prompt: str, variations: int = 1) -> Dict[str, Dict[str, Any]]:
+    def get_image_generators(self) -> List[str]:
+        """Get the names of available generators that accept a source image."""
+        return [name for name, generator in self.generators.items() if generator.SUPPORTS_IMAGE_INPUT]
+    
+    async def generate_all(
+        self,
+        prompt: str,
+        variations: int = 1,
+        on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        seed: Optional[int] = None
+    ) -> Dict[str, Dict[str, Any]]:
         """
         Generate images from all available providers in parallel.
         
+        With a ledger, variations a provider's budget can't cover are moved
+        to providers with budget left.
+        
+        Args:
+            prompt: Image generation prompt
+            variations: Number of variations per provider (1-4)
+            on_result: Optional callback run with each provider's name and
+                results as soon as that provider finishes
+            seed: Optional session seed; variation N uses seed + N - 1
+            
+        Returns:
+            Dictionary mapping provider names to their results
+        """
+        counts = {name: variations for name in self.generators}
+        allocation = self._allocate(counts, redistribute=True)
+        seeds = None
+        if seed is not None:
+            seeds = {name: variation_seeds(seed, range(1, n + 1)) for name, n in allocation.counts.items()}
+        return await self._generate_allocated(prompt, counts, allocation, on_result, seeds)
+    
+    async def generate_from_image(
+        self,
+        image: Image.Image,
+        prompt: str,
+        variations: int = 1,
+        on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        seed: Optional[int] = None,
+        strength: float = DEFAULT_STRENGTH
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Generate images from an existing image with every provider that accepts one.
+        
         Args:
+            image: Source image, e.g. a saved sprite
             prompt: Image generation prompt
             variations: Number of variations per provider (1-4)
+            on_result: Optional callback run with each provider's name and
+                results as soon as that provider finishes
+            seed: Optional session seed; variation N uses seed + N - 1
+            strength: How closely results follow the source image (0-1)
+            
+        Returns:
+            Dictionary mapping provider names to their results
+        """
+        counts = {name: variations for name in self.get_image_generators()}
+        if not counts:
+            raise ValueError("No configured generator accepts source images.")
+        allocation = self._allocate(counts, redistribute=True)
+        seeds = None
+        if seed is not None:
+            seeds = {name: variation_seeds(seed, range(1, n + 1)) for name, n in allocation.counts.items()}
+        return await self._generate_allocated(prompt, counts, allocation, on_result, seeds, (image, strength))
+    
+    async def generate_some(
+        self,
+        prompt: str,
+        counts: Dict[str, int],
+        on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        seeds: Optional[Dict[str, List[int]]] = None,
+        source: Optional[Image.Image] = None,
+        strength: float = DEFAULT_STRENGTH
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Generate a given number of images from each of some providers, in parallel.
+        
+        With a ledger, providers only generate the variations their budgets
+        cover; the first ones are kept.
+        
+        Args:
+            prompt: Image generation prompt
+            counts: Variations to generate per provider name; names without
+                a registered generator are ignored
+            on_result: Optional callback run with each provider's name and
+                results as soon as that provider finishes
+            seeds: Optional seed of each variation to generate, per provider
+            source: Optional image to generate from, as in generate_from_image
+            strength: How closely results follow the source image
             
         Returns:
             Dictionary mapping provider names to their results
         """
+        counts = {name: count for name, count in counts.items() if name in self.generators}
+        allocation = self._allocate(counts, redistribute=False)
+        if seeds is not None:
+            seeds = {name: values[:allocation.counts.get(name, 0)] for name, values in seeds.items()}
+        return await self._generate_allocated(
+            prompt, counts, allocation, on_result, seeds, None if source is None else (source, strength)
+        )
+    
+    def _allocate(self, counts: Dict[str, int], redistribute: bool) -> Allocation:
+        """Fit counts into the ledger's budgets, or grant them all without one."""
+        if self.ledger is None:
+            return Allocation(counts=dict(counts))
+        allocation = self.ledger.allocate(
+            counts, {name: self.generators[name].cost_per_image for name in counts}, redistribute,
+            max_per_provider=MAX_VARIATIONS
+        )
+        for name, note in allocation.notes.items():
+            BUDGET_CUTS.labels(name).inc(counts[name] - allocation.counts[name])
+            self.logger.warning(f"{name}: {note}")
+        return allocation
+    
+    async def _generate_allocated(
+        self,
+        prompt: str,
+        counts: Dict[str, int],
+        allocation: Allocation,
+        on_result: Optional[Callable[[str, Dict[str, Any]], None]],
+        seeds: Optional[Dict[str, List[int]]],
+        source: Optional[Tuple[Image.Image, float]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Run each provider's granted variations; providers granted none report why."""
         if not self.generators:
             raise ValueError("No image generators available. Please configure API keys.")
         
-        results = {}
-        tasks = []
+        def failed(name: str, variations: int, error: str) -> Dict[str, Any]:
+            return {
+                'service': name,
+                'prompt': prompt,
+                'variations_requested': variations,
+                'variations_generated': 0,
+                'images': [],
+                'errors': [error]
+            }
         
-        # Create tasks for parallel generation
-        for name, generator in self.generators.items():
-            task = self._generate_with_provider(name, generator, prompt, variations)
-            tasks.append(task)
+        async def run(name: str, variations: int) -> Dict[str, Any]:
+            granted = allocation.counts.get(name, 0)
+            try:
+                if not granted:
+                    result = failed(name, variations, f"Over budget: {allocation.notes.get(name)}")
+                else:
+                    result = await self._generate_with_provider(
+                        name, self.generators[name], prompt, granted, (seeds or {}).get(name), source
+                    )
+            except Exception as e:
+                self.logger.error(f"Generator {name} failed: {e}")
+                result = failed(name, granted, str(e))
+            finally:
+                # The generator has charged what it actually spent
+                if name in allocation.reservations:
+                    self.ledger.release(allocation.reservations[name])
+            if on_result is not None:
+                on_result(name, result)
+            return result
         
         # Execute all tasks in parallel
-        completed = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Process results
-        for i, (name, _) in enumerate(self.generators.items()):
-            if isinstance(completed[i], Exception):
-                self.logger.error(f"Generator {name} failed: {completed[i]}")
-                results[name] = {
-                    'service': name,
-                    'prompt': prompt,
-                    'variations_requested': variations,
-                    'variations_generated': 0,
-                    'images': [],
-                    'errors': [str(completed[i])]
-                }
-            else:
-                results[name] = completed[i]
-        
-        return results
+        names = [name for name in self.generators if counts.get(name) or allocation.counts.get(name)]
+        completed = await asyncio.gather(*(run(name, counts.get(name, 0)) for name in names))
+        return dict(zip(names, completed))
     
     async def _generate_with_provider(
         self, 
         name: str, 
         generator: ImageGenerator, 
         prompt: str, 
-        variations: int
+        variations: int,
+        seeds: Optional[List[int]] = None,
+        source: Optional[Tuple[Image.Image, float]] = None
     ) -> Dict[str, Any]:
-        """Generate images with a specific provider."""
+        """Generate images with a specific provider, from a (source image, strength) if given."""
         self.logger.info(f"Generating {variations} images with {name}...")
         
         try:
-            result = await generator.generate_with_metadata(prompt, variations)
+            if source is not None:
+                image, strength = source
+                result = await generator.generate_with_metadata(prompt, variations, seeds, source=image, strength=strength)
+            else:
+                result = await generator.generate_with_metadata(prompt, variations, seeds)
             self.logger.info(f"{name} generated {result['variations_generated']} images successfully")
             return result
         except Exception as e:
@@ -1,19 +1,22 @@
 import os
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from PIL import Image
-import io
 import httpx
-import replicate
+import asyncio
 from .base import ImageGenerator
 
 
 class ReplicateGenerator(ImageGenerator):
+    # Stable Diffusion model version on Replicate
+    MODEL_VERSION = "db21e45d3f7023abc2a46ee38a23973f6dce16bb082a930b0c49861f96d1e5bf"
+    SUPPORTS_SEED = True
+    
     def __init__(self, api_key: Optional[str] = None):
         api_key = api_key or os.getenv('REPLICATE_API_TOKEN')
         super().__init__(api_key)
-        
-        if self.api_key:
-            os.environ['REPLICATE_API_TOKEN'] = self.api_key
+        self.base_url = os.getenv('REPLICATE_BASE_URL', "https://api.replicate.com/v1")
+        self.poll_interval = 1.0
+        self.timeout = 120.0
     
     def get_service_name(self) -> str:
         return "replicate"
@@ -21,41 +24,94 @@ class ReplicateGenerator(ImageGenerator):
     def is_available(self) -> bool:
         return self.api_key is not None
     
-    async def generate(self, prompt: str, variations: int = 1) -> List[Image.Image]:
+    async def generate(
+        self,
+        prompt: str,
+        variations: int = 1,
+        seeds: Optional[List[int]] = None
+    ) -> List[Image.Image]:
         if not self.is_available():
             raise ValueError("Replicate API token not configured")
         
         images = []
+        settings = self.settings
         
-        # Add pixel art style to the prompt
-        enhanced_prompt = f"{prompt}, pixel art style, 16-bit, retro game sprite, low resolution"
+        # Add this provider's pixel art template to the prompt
+        enhanced_prompt = self.style_prompt(prompt)
         
-        try:
-            # Using Stable Diffusion through Replicate
-            model = replicate.models.get("stability-ai/stable-diffusion")
-            version = model.versions.get("db21e45d3f7023abc2a46ee38a23973f6dce16bb082a930b0c49861f96d1e5bf")
-            
-            for i in range(variations):
-                # Run the model
-                output = version.predict(
-                    prompt=enhanced_prompt,
-                    width=512,
-                    height=512,
-                    num_outputs=1,
-                    num_inference_steps=50,
-                    guidance_scale=7.5
-                )
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            # Hold the request open until the prediction finishes (up to 60s)
+            "Prefer": "wait"
+        }
+        
+        # Downloads run on the shared client while the next prediction is created
+        pending = []
+        
+        async with self.http_client() as client:
+            try:
+                for i in range(variations):
+                    payload = {
+                        "version": self.MODEL_VERSION,
+                        "input": {
+                            "prompt": enhanced_prompt,
+                            "width": settings.width,
+                            "height": settings.height,
+                            "num_outputs": 1,
+                            "num_inference_steps": settings.steps,
+                            "guidance_scale": 7.5
+                        }
+                    }
+                    if seeds is not None:
+                        payload["input"]["seed"] = seeds[i]
+                    
+                    response = await client.post(
+                        f"{self.base_url}/predictions",
+                        headers=headers,
+                        json=payload,
+                        timeout=self.timeout
+                    )
+                    
+                    if response.status_code not in (200, 201):
+                        self.logger.error(f"Replicate API error: {response.status_code} - {response.text}")
+                        raise Exception(f"Replicate API returned status {response.status_code}")
+                    
+                    prediction = await self._wait_for_prediction(client, response.json(), headers)
+                    
+                    # Output is a file URL, or a data: URI for small synchronous results
+                    output = prediction.get("output")
+                    if output and len(output) > 0:
+                        pending.append(asyncio.create_task(self.fetch_image(client, output[0])))
                 
-                # Download the generated image
-                if output and len(output) > 0:
-                    image_url = output[0]
-                    async with httpx.AsyncClient() as client:
-                        response = await client.get(image_url)
-                        image = Image.open(io.BytesIO(response.content))
-                        images.append(image)
+                images = await self.collect_images(pending)
                         
-        except Exception as e:
-            self.logger.error(f"Failed to generate image with Replicate: {e}")
-            raise
+            except Exception as e:
+                self.logger.error(f"Failed to generate image with Replicate: {e}")
+                raise
+            finally:
+                await self.cancel_downloads(pending)
             
-        return images
\ No newline at end of file
+        return images
+    
+    async def _wait_for_prediction(
+        self,
+        client: httpx.AsyncClient,
+        prediction: Dict[str, Any],
+        headers: Dict[str, str]
+    ) -> Dict[str, Any]:
+        """Poll a prediction until it reaches a terminal state."""
+        deadline = asyncio.get_running_loop().time() + self.timeout
+        
+        while prediction.get("status") not in ("succeeded", "failed", "canceled"):
+            if asyncio.get_running_loop().time() > deadline:
+                raise Exception("Replicate prediction timed out")
+            await asyncio.sleep(self.poll_interval)
+            response = await client.get(prediction["urls"]["get"], headers=headers, timeout=30.0)
+            response.raise_for_status()
+            prediction = response.json()
+        
+        if prediction["status"] != "succeeded":
+            raise Exception(f"Replicate prediction {prediction['status']}: {prediction.get('error')}")
+        
+        return prediction
@@ -0,0 +1,67 @@
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class GenerationSettings:
+    """Resolution, sampling steps and model a provider is asked for."""
+    width: int
+    height: int
+    steps: Optional[int] = None
+    model: Optional[str] = None
+
+    @property
+    def size(self) -> str:
+        return f"{self.width}x{self.height}"
+
+
+# Per provider: (largest sprite side the tier serves, settings), cheapest first.
+# Sprite error against the scene is flat from 4x the sprite side upward
+# while download size grows with the square of the side (see
+# benchmarks/resolution.py), so tiers use the smallest native size of at
+# least 4x. Diffusion models stay at 384px or more: below their training
+# resolution composition degrades before pixel error shows it.
+RESOLUTION_TIERS: Dict[str, Tuple[Tuple[int, GenerationSettings], ...]] = {
+    # DALL-E 2 renders 256, 512 or 1024 squares, priced by size
+    'openai': (
+        (64, GenerationSettings(256, 256, model='dall-e-2')),
+        (128, GenerationSettings(512, 512, model='dall-e-2')),
+        (1 << 30, GenerationSettings(1024, 1024, model='dall-e-2')),
+    ),
+    # SD 1.6 accepts multiples of 64 from 320 to 1536; cost scales with steps
+    'stability': (
+        (32, GenerationSettings(384, 384, steps=20, model='stable-diffusion-v1-6')),
+        (64, GenerationSettings(512, 512, steps=25, model='stable-diffusion-v1-6')),
+        (1 << 30, GenerationSettings(512, 512, steps=30, model='stable-diffusion-v1-6')),
+    ),
+    # stability-ai/stable-diffusion on Replicate accepts multiples of 64 from 128 to 1024
+    'replicate': (
+        (32, GenerationSettings(384, 384, steps=20)),
+        (64, GenerationSettings(512, 512, steps=30)),
+        (1 << 30, GenerationSettings(512, 512, steps=50)),
+    ),
+    # FreePik only takes aspect-ratio presets, so there is nothing to negotiate
+    'freepik': (
+        (1 << 30, GenerationSettings(1024, 1024)),
+    ),
+}
+
+
+def negotiate_settings(provider: str, sprite_size: int) -> Optional[GenerationSettings]:
+    """
+    Pick the cheapest settings a provider supports that still serve the sprite size.
+
+    Args:
+        provider: Generator service name
+        sprite_size: Side of the pixel art that will be made from the image
+
+    Returns:
+        Generation settings, or None for providers without known tiers
+    """
+    tiers = RESOLUTION_TIERS.get(provider)
+    if not tiers:
+        return None
+    for max_sprite_size, settings in tiers:
+        if sprite_size <= max_sprite_size:
+            return settings
+    return tiers[-1][1]
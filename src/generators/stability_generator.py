@@ -1,17 +1,18 @@
 import os
 from typing import List, Optional
 from PIL import Image
-import io
-import base64
 import httpx
-from .base import ImageGenerator
+from .base import DEFAULT_STRENGTH, ImageGenerator
 
 
 class StabilityGenerator(ImageGenerator):
+    SUPPORTS_SEED = True
+    SUPPORTS_IMAGE_INPUT = True
+    
     def __init__(self, api_key: Optional[str] = None):
         api_key = api_key or os.getenv('STABILITY_API_KEY')
         super().__init__(api_key)
-        self.base_url = "https://api.stability.ai/v1"
+        self.base_url = os.getenv('STABILITY_BASE_URL', "https://api.stability.ai/v1")
     
     def get_service_name(self) -> str:
         return "stability"
@@ -19,14 +20,20 @@ class StabilityGenerator(ImageGenerator):
     def is_available(self) -> bool:
         return self.api_key is not None
     
-    async def generate(self, prompt: str, variations: int = 1) -> List[Image.Image]:
+    async def generate(
+        self,
+        prompt: str,
+        variations: int = 1,
+        seeds: Optional[List[int]] = None
+    ) -> List[Image.Image]:
         if not self.is_available():
             raise ValueError("Stability API key not configured")
         
         images = []
+        settings = self.settings
         
-        # Add pixel art style to the prompt
-        enhanced_prompt = f"{prompt}, pixel art style, 16-bit, retro game sprite, pixelated"
+        # Add this provider's pixel art template to the prompt
+        enhanced_prompt = self.style_prompt(prompt)
         
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -34,7 +41,7 @@ class StabilityGenerator(ImageGenerator):
             "Accept": "application/json"
         }
         
-        async with httpx.AsyncClient() as client:
+        async with self.http_client() as client:
             try:
                 for i in range(variations):
                     payload = {
@@ -45,37 +52,95 @@ class StabilityGenerator(ImageGenerator):
                             }
                         ],
                         "cfg_scale": 7,
-                        "height": 512,
-                        "width": 512,
+                        "height": settings.height,
+                        "width": settings.width,
                         "samples": 1,
-                        "steps": 30,
+                        "steps": settings.steps,
                         "style_preset": "digital-art"
                     }
+                    # Without a seed Stability picks a random one
+                    if seeds is not None:
+                        payload["seed"] = seeds[i]
                     
                     response = await client.post(
-                        f"{self.base_url}/generation/stable-diffusion-v1-6/text-to-image",
+                        f"{self.base_url}/generation/{settings.model}/text-to-image",
                         headers=headers,
                         json=payload,
                         timeout=60.0
                     )
                     
-                    if response.status_code != 200:
-                        self.logger.error(f"Stability API error: {response.status_code} - {response.text}")
-                        raise Exception(f"Stability API returned status {response.status_code}")
-                    
-                    result = response.json()
-                    
-                    # Extract image from base64
-                    if "artifacts" in result and len(result["artifacts"]) > 0:
-                        for artifact in result["artifacts"]:
-                            if artifact.get("finishReason") == "SUCCESS":
-                                image_data = base64.b64decode(artifact["base64"])
-                                image = Image.open(io.BytesIO(image_data))
-                                images.append(image)
-                                break
+                    images.extend(self._artifact_images(response))
                         
             except Exception as e:
                 self.logger.error(f"Failed to generate image with Stability: {e}")
                 raise
             
-        return images
\ No newline at end of file
+        return images
+    
+    async def generate_from_image(
+        self,
+        image: Image.Image,
+        prompt: str,
+        variations: int = 1,
+        strength: float = DEFAULT_STRENGTH,
+        seeds: Optional[List[int]] = None
+    ) -> List[Image.Image]:
+        """Generate images with SD 1.6 image-to-image, starting from the source image."""
+        if not self.is_available():
+            raise ValueError("Stability API key not configured")
+        
+        images = []
+        settings = self.settings
+        # The output takes the init image's dimensions, so it is uploaded
+        # at the negotiated resolution
+        init_image = self.source_png(image)
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Accept": "application/json"
+        }
+        
+        async with self.http_client() as client:
+            try:
+                for i in range(variations):
+                    data = {
+                        "text_prompts[0][text]": self.style_prompt(prompt),
+                        "text_prompts[0][weight]": "1.0",
+                        "init_image_mode": "IMAGE_STRENGTH",
+                        "image_strength": str(strength),
+                        "cfg_scale": "7",
+                        "samples": "1",
+                        "steps": str(settings.steps),
+                        "style_preset": "digital-art"
+                    }
+                    if seeds is not None:
+                        data["seed"] = str(seeds[i])
+                    
+                    response = await client.post(
+                        f"{self.base_url}/generation/{settings.model}/image-to-image",
+                        headers=headers,
+                        data=data,
+                        files={"init_image": ("source.png", init_image, "image/png")},
+                        timeout=60.0
+                    )
+                    images.extend(self._artifact_images(response))
+            
+            except Exception as e:
+                self.logger.error(f"Failed to generate image from image with Stability: {e}")
+                raise
+        
+        return images
+    
+    def _artifact_images(self, response: httpx.Response) -> List[Image.Image]:
+        """Decode the first successful artifact of a generation response."""
+        if response.status_code != 200:
+            self.logger.error(f"Stability API error: {response.status_code} - {response.text}")
+            raise Exception(f"Stability API returned status {response.status_code}")
+        
+        result = response.json()
+        
+        # Extract image from base64
+        for artifact in result.get("artifacts") or []:
+            if artifact.get("finishReason") == "SUCCESS":
+                return [self.decode_image(artifact["base64"])]
+        return []
@@ -1,13 +1,43 @@
 import asyncio
+import json
+import math
+import os
 import sys
+import time
+from datetime import timedelta
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 import click
+import numpy as np
+from PIL import Image
 from dotenv import load_dotenv
 from .agent.query_classifier import QueryClassifier
+from .generators.base import DEFAULT_STRENGTH, MAX_VARIATIONS, SEED_MAX, variation_seeds
 from .generators.registry import GeneratorRegistry
-from .processors.pixel_art import convert_to_pixel_art, enhance_pixel_art_prompt
-from .utils.file_manager import OutputManager
+from .processors.conversion_pool import ConversionPool, convert_sprites
+from .processors.pixel_art import working_resolution
+from .processors.prompts import PROMPT_ENGINE
+from .processors.quality import score_sprites, top_scores
+from .processors.recolor import (
+    SWAP_TOLERANCE,
+    lock_to_palette,
+    recolor_sprites,
+    shift_hue,
+    sprite_colors,
+    swap_colors,
+)
+from .utils.catalog import SessionCatalog, VARIATION_PATTERN, parse_hex_color
+from .utils.dedupe import DUPLICATE_DISTANCE, HASH_BITS, find_duplicates, replace_with_link
+from .utils.file_manager import DEDUPE_MODES, DuplicateImageError, OutputManager
+from .utils.journal import SessionJournal
+from .utils.ledger import CostLedger, budget_limits
 from .utils.logger import setup_logger
+from .utils.profiling import Profiler
+from .utils.rate_limit import SharedRateLimiter, rate_limits
+from .utils.single_flight import SingleFlight
+from .utils.tracing import span, start_tracing
+from .worker_pool import run_pool
 
 
 # Load environment variables
@@ -17,7 +47,74 @@ load_dotenv()
 logger = setup_logger('16pixels')
 
 
-@click.command()
+def candidate_variations(variations: int, best_of: Optional[int], providers: int) -> int:
+    """
+    Variations per provider to generate so --best-of has candidates to choose from.
+    
+    Args:
+        variations: Variations per provider asked for
+        best_of: Sprites to keep, or None to keep them all
+        providers: Number of providers generating
+        
+    Returns:
+        variations plus ceil(best_of / providers), at most MAX_VARIATIONS
+    """
+    if best_of is None or not providers:
+        return variations
+    return min(MAX_VARIATIONS, variations + math.ceil(best_of / providers))
+
+
+def parse_sizes(ctx, param, value: Optional[str]) -> Optional[Tuple[int, ...]]:
+    """Parse a comma-separated list of sprite sizes, keeping the order given."""
+    if value is None:
+        return None
+    try:
+        sizes = tuple(dict.fromkeys(int(part) for part in value.split(',') if part.strip()))
+    except ValueError:
+        raise click.BadParameter(f"expected comma-separated integers, got '{value}'")
+    if not sizes or any(size < 1 or size > 256 for size in sizes):
+        raise click.BadParameter("sizes must be between 1 and 256")
+    return sizes
+
+
+def parse_budgets(ctx, param, values: Tuple[str, ...]) -> Dict[str, float]:
+    """Parse repeated provider=usd options."""
+    budgets = {}
+    for value in values:
+        provider, _, budget = value.partition('=')
+        try:
+            budgets[provider.strip()] = float(budget)
+        except ValueError:
+            raise click.BadParameter(f"expected provider=usd, got '{value}'")
+        if not provider.strip() or budgets[provider.strip()] < 0:
+            raise click.BadParameter(f"expected provider=usd, got '{value}'")
+    return budgets
+
+
+class DefaultCommandGroup(click.Group):
+    """Click group that runs its default command when no subcommand is named."""
+    
+    def __init__(self, *args, default_command: str = 'generate', **kwargs):
+        super().__init__(*args, **kwargs)
+        self.default_command = default_command
+    
+    def parse_args(self, ctx, args):
+        # Keep `16pixels --query ...` working alongside `16pixels <command> ...`
+        if not args or (args[0] not in self.commands and args[0] not in ctx.help_option_names):
+            args = [self.default_command] + list(args)
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=DefaultCommandGroup)
+def main():
+    """
+    16-Pixels: AI-powered 16x16 pixel art generator.
+    
+    Runs `generate` when no command is given.
+    """
+
+
+@main.command()
 @click.option(
     '--query', '-q',
     required=True,
@@ -40,14 +137,102 @@ logger = setup_logger('16pixels')
     is_flag=True,
     help='Skip pixel art conversion (save original resolution)'
 )
+@click.option(
+    '--sizes',
+    default='16',
+    show_default=True,
+    callback=parse_sizes,
+    help='Comma-separated sprite sizes, e.g. 16,24,32,48,64; the first is the primary sprite'
+)
+@click.option(
+    '--transparent',
+    is_flag=True,
+    help='Remove the background and save sprites with transparency'
+)
+@click.option(
+    '--dedupe',
+    type=click.Choice(DEDUPE_MODES),
+    help='Skip sprites that near-duplicate one already in the output tree, or hard-link them to it'
+)
+@click.option(
+    '--best-of',
+    type=click.IntRange(min=1),
+    help='Generate extra variations, score every sprite and keep only the best K across all providers'
+)
+@click.option(
+    '--seed',
+    type=click.IntRange(1, SEED_MAX),
+    help='Seed providers that accept one and use each provider\'s usual template, for reproducible runs'
+)
+@click.option(
+    '--budget',
+    'budgets',
+    multiple=True,
+    callback=parse_budgets,
+    metavar='PROVIDER=USD',
+    help='Cap a provider\'s spend over the ledger window; work it can\'t afford moves to other providers (repeatable)'
+)
+@click.option(
+    '--no-share',
+    is_flag=True,
+    help='Always call the providers, even if another process is generating the same prompt'
+)
+@click.option(
+    '--keep-source',
+    is_flag=True,
+    help='Also save each full-resolution provider image as source_N.png'
+)
+@click.option(
+    '--convert-workers',
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help='Convert images on this many worker processes (0 converts in-process)'
+)
 @click.option(
     '--debug',
     is_flag=True,
     help='Enable debug logging'
 )
-def main(query: str, variations: int, output_dir: str, no_pixel_art: bool, debug: bool):
+@click.option(
+    '--trace',
+    'trace_file',
+    type=click.Path(dir_okay=False),
+    help='Write a trace of the run to this file'
+)
+@click.option(
+    '--trace-format',
+    type=click.Choice(['chrome', 'otlp']),
+    default='chrome',
+    show_default=True,
+    help='Trace file format: Chrome trace events or OpenTelemetry JSON'
+)
+@click.option(
+    '--profile',
+    is_flag=True,
+    help='Profile the run (cProfile + tracemalloc) into the session folder'
+)
+def generate(
+    query: str,
+    variations: int,
+    output_dir: str,
+    no_pixel_art: bool,
+    sizes: Tuple[int, ...],
+    transparent: bool,
+    dedupe: Optional[str],
+    best_of: Optional[int],
+    seed: Optional[int],
+    budgets: Dict[str, float],
+    no_share: bool,
+    keep_source: bool,
+    convert_workers: int,
+    debug: bool,
+    trace_file: str,
+    trace_format: str,
+    profile: bool
+):
     """
-    16-Pixels: AI-powered 16x16 pixel art generator.
+    Generate pixel art from a text description.
     
     This tool uses Google Gemini to determine if your query is for image generation,
     then generates pixel art from multiple AI providers.
@@ -57,11 +242,208 @@ def main(query: str, variations: int, output_dir: str, no_pixel_art: bool, debug
         logging.getLogger().setLevel(logging.DEBUG)
     
     # Run the async main function
-    asyncio.run(async_main(query, variations, output_dir, no_pixel_art))
+    asyncio.run(async_main(
+        query, variations, output_dir, no_pixel_art, trace_file, trace_format,
+        profiler=Profiler() if profile else None,
+        keep_source=keep_source,
+        sizes=sizes,
+        transparent=transparent,
+        dedupe=dedupe,
+        best_of=best_of,
+        seed=seed,
+        budgets=budgets,
+        share=not no_share,
+        convert_workers=convert_workers
+    ))
+
+
+def journal_provider(journal: SessionJournal, provider: str, result: dict) -> None:
+    """Journal a provider finishing, without its images."""
+    journal.record(
+        'provider', provider=provider, variations_generated=result.get('variations_generated', 0),
+        errors=result.get('errors', []), settings=result.get('settings'), template=result.get('template'),
+        seeded=result.get('seeded', False), cost=result.get('cost')
+    )
+
+
+def save_results(
+    all_results: dict,
+    output_manager: OutputManager,
+    session_path: Path,
+    journal: SessionJournal,
+    numbering: Optional[Dict[str, List[int]]] = None,
+    no_pixel_art: bool = False,
+    sizes: Tuple[int, ...] = (16,),
+    transparent: bool = False,
+    keep_source: bool = False,
+    best_of: Optional[int] = None,
+    memory_stage=lambda name: nullcontext(),
+    converter: Optional[ConversionPool] = None,
+    ledger: Optional[CostLedger] = None,
+    palette: Optional[np.ndarray] = None
+) -> int:
+    """
+    Convert, score and save generated images, journaling every variation.
+    
+    Args:
+        all_results: Results from GeneratorRegistry.generate_all
+        output_manager: Output manager writing the session
+        session_path: Session folder
+        journal: The session's journal
+        numbering: Optional variation number of each provider's images
+            (defaults to 1, 2, ...), e.g. the missing ones on resume
+        no_pixel_art: Save images at full resolution
+        sizes: Sprite sizes, primary first
+        transparent: Remove sprite backgrounds
+        keep_source: Also save full-resolution sources
+        best_of: Keep only this many of the best-scoring sprites
+        memory_stage: Profiler stage context factory
+        converter: Optional conversion worker pool (converts in-process if None)
+        ledger: Optional cost ledger credited with each provider's saved sprites
+        palette: Optional (M, 3) colors every sprite is locked to
+        
+    Returns:
+        Number of variations saved
+    """
+    # Step 6: Convert images to pixel art. With conversion workers, every
+    # image is queued before waiting on the first so they convert in parallel
+    jobs = []
+    for provider, results in all_results.items():
+        numbers = (numbering or {}).get(provider) or range(1, len(results['images']) + 1)
+        for i, image in zip(numbers, results['images']):
+            pending = None
+            if converter is not None and not no_pixel_art:
+                pending = converter.submit(image, sizes, transparent=transparent)
+            jobs.append((provider, i, image, pending))
+    
+    candidates = []
+    for provider, i, image, pending in jobs:
+        try:
+            if no_pixel_art:
+                sprites = None
+            elif pending is not None:
+                with memory_stage('convert_to_pixel_art'):
+                    sprites = pending.result()
+            else:
+                with memory_stage('convert_to_pixel_art'):
+                    sprites = convert_sprites(image, sizes, transparent=transparent)
+            if sprites and palette is not None:
+                sprites = dict(zip(sprites, recolor_sprites(list(sprites.values()), lock_to_palette(palette))))
+            candidates.append((provider, i, image, sprites))
+        except Exception as e:
+            logger.error(f"Failed to convert image from {provider}: {e}")
+    
+    # Step 7: Score the primary sprites (a sprite-size thumbnail of
+    # full-resolution images) and keep the best if requested
+    with memory_stage('score_sprites'):
+        scores = score_sprites([
+            sprites[sizes[0]] if sprites else image.resize((sizes[0], sizes[0]), Image.Resampling.NEAREST)
+            for _, _, image, sprites in candidates
+        ])
+    kept = set(top_scores(scores, best_of)) if best_of is not None else set(range(len(candidates)))
+    quality = [
+        {
+            'provider': provider, 'variation': i, 'template': all_results[provider].get('template'),
+            **score, 'kept': index in kept
+        }
+        for index, ((provider, i, _, _), score) in enumerate(zip(candidates, scores))
+    ]
+    
+    # Step 8: Save the kept images
+    total_saved = 0
+    for provider in all_results:
+        provider_saved = 0
+        provider_duplicates = 0
+        provider_dropped = 0
+        
+        for index, (name, i, image, sprites) in enumerate(candidates):
+            if name != provider:
+                continue
+            if index not in kept:
+                provider_dropped += 1
+                journal.record('skipped', provider=provider, variation=i, reason='best_of', quality=quality[index])
+                continue
+            try:
+                with memory_stage('save_image'):
+                    if sprites is None:
+                        output_manager.save_image(image, provider, i, session_path)
+                    elif len(sprites) == 1:
+                        output_manager.save_image(sprites[sizes[0]], provider, i, session_path)
+                    else:
+                        output_manager.save_sprite_sizes(sprites, provider, i, session_path, primary_size=sizes[0])
+                
+                # Archived only once the sprite is stored, so skipped
+                # duplicates leave no orphaned source behind
+                if keep_source and not no_pixel_art:
+                    output_manager.save_source(image, provider, i, session_path)
+                journal.record('image', provider=provider, variation=i, quality=quality[index])
+                provider_saved += 1
+                total_saved += 1
+                
+            except DuplicateImageError as e:
+                logger.info(f"Skipped {provider} variation {i}: {e}")
+                journal.record('skipped', provider=provider, variation=i, reason='duplicate', quality=quality[index])
+                provider_duplicates += 1
+            except Exception as e:
+                logger.error(f"Failed to save image from {provider}: {e}")
+        
+        if ledger is not None and provider_saved:
+            try:
+                ledger.record(provider, sprites=provider_saved)
+            except Exception as e:
+                logger.warning(f"Failed to record {provider} sprites: {e}")
+        
+        skipped = f" ({provider_duplicates} duplicates skipped)" if provider_duplicates else ""
+        if provider_dropped:
+            skipped += f" ({provider_dropped} below the best {best_of})"
+        if provider_saved > 0:
+            click.echo(f"  ✓ {provider}: {provider_saved} images{skipped}")
+        elif provider_duplicates > 0 or provider_dropped > 0:
+            click.echo(f"  = {provider}: no new images{skipped}")
+        else:
+            click.echo(click.style(f"  ✗ {provider}: failed", fg='red'))
+    
+    return total_saved
 
 
-async def async_main(query: str, variations: int, output_dir: str, no_pixel_art: bool):
-    """Async main function to handle the image generation pipeline."""
+async def async_main(
+    query: str,
+    variations: int,
+    output_dir: str,
+    no_pixel_art: bool,
+    trace_file: Optional[str] = None,
+    trace_format: str = 'chrome',
+    profiler: Optional[Profiler] = None,
+    keep_source: bool = False,
+    sizes: Tuple[int, ...] = (16,),
+    transparent: bool = False,
+    dedupe: Optional[str] = None,
+    best_of: Optional[int] = None,
+    seed: Optional[int] = None,
+    budgets: Optional[Dict[str, float]] = None,
+    share: bool = True,
+    registry: Optional[GeneratorRegistry] = None,
+    convert_workers: int = 0
+) -> Optional[Path]:
+    """
+    Async main function to handle the image generation pipeline.
+    
+    Pass `registry` to reuse one set of generators (and their connections
+    and rate limiter) across sessions, concurrent ones included, and `convert_workers` to convert on
+    a ConversionPool of that many processes. With a `seed`, providers that
+    accept one generate reproducibly and every provider uses its usual
+    template, so the same query always sends the same requests. `budgets`
+    caps spend per provider on top of BUDGET_<PROVIDER> environment
+    variables. Returns the session folder.
+    """
+    # Spans are cheap; always collect them so metadata.json gets stage timings
+    tracer = start_tracing()
+    session_path = None
+    if profiler is not None:
+        profiler.start()
+        memory_stage = profiler.stage
+    else:
+        memory_stage = lambda name: nullcontext()
     
     try:
         # Step 1: Classify the query
@@ -77,21 +459,39 @@ async def async_main(query: str, variations: int, output_dir: str, no_pixel_art:
             click.echo(click.style(f"❌ Request rejected: {classification.rejection_reason}", fg='red'))
             sys.exit(1)
         
-        # Step 2: Enhance prompt for pixel art if needed
+        # Step 2: Pick the prompt; each generator adds its own pixel art template
         generation_prompt = classification.image_description or query
-        if not no_pixel_art:
-            generation_prompt = enhance_pixel_art_prompt(generation_prompt)
         
         logger.info(f"Generation prompt: {generation_prompt}")
         
         # Step 3: Initialize output manager and create session
-        output_manager = OutputManager(output_dir)
+        output_manager = OutputManager(output_dir, dedupe=dedupe)
         session_path = output_manager.create_session_folder()
+        # Progress is journaled as it happens so `resume` can finish the session
+        journal = SessionJournal(session_path)
         click.echo(click.style(f"📁 Creating images in: {session_path}", fg='blue'))
         
-        # Step 4: Initialize generator registry
-        registry = GeneratorRegistry()
+        # Step 4: Initialize generator registry; a shared one is copied so
+        # this session's settings below stay its own
+        registry = GeneratorRegistry() if registry is None else registry.for_session()
         available_generators = registry.get_available_generators()
+        # Resolution and working size must serve the largest sprite requested
+        registry.set_sprite_size(max(sizes))
+        # Full-resolution sources are only held when they will be saved
+        registry.set_working_size(None if no_pixel_art or keep_source else working_resolution(max(sizes)))
+        # Charge every call and keep providers within their budgets
+        ledger = CostLedger(output_dir, budget_limits(budgets))
+        registry.set_ledger(ledger)
+        # Use the templates whose sprites have scored best so far, unless
+        # the run is seeded: that choice changes as the catalog grows
+        if seed is None:
+            template_stats = output_manager.catalog.template_stats()
+            registry.set_prompt_templates({
+                name: PROMPT_ENGINE.choose_template(name, template_stats.get(name)).name
+                for name in available_generators
+            })
+        else:
+            registry.set_prompt_templates({})
         
         if not available_generators:
             logger.error("No image generators available")
@@ -101,47 +501,86 @@ async def async_main(query: str, variations: int, output_dir: str, no_pixel_art:
         click.echo(click.style(f"🎨 Generating images from {len(available_generators)} providers: "
                              f"{', '.join(available_generators)}", fg='green'))
         
-        # Step 5: Generate images from all providers
-        all_results = await registry.generate_all(generation_prompt, variations)
-        
-        # Step 6: Process and save images
-        total_saved = 0
-        for provider, results in all_results.items():
-            provider_saved = 0
-            
-            for i, image in enumerate(results['images'], 1):
-                try:
-                    # Convert to pixel art if requested
-                    if not no_pixel_art:
-                        processed_image = convert_to_pixel_art(image)
-                    else:
-                        processed_image = image
-                    
-                    # Save the image
-                    output_manager.save_image(processed_image, provider, i, session_path)
-                    provider_saved += 1
-                    total_saved += 1
-                    
-                except Exception as e:
-                    logger.error(f"Failed to save image from {provider}: {e}")
-            
-            if provider_saved > 0:
-                click.echo(f"  ✓ {provider}: {provider_saved} images")
-            else:
-                click.echo(click.style(f"  ✗ {provider}: failed", fg='red'))
+        # Best-of only has a choice if there are more candidates than it keeps
+        variations = candidate_variations(variations, best_of, len(available_generators))
+        if best_of is not None and best_of >= variations * len(available_generators):
+            click.echo(click.style(
+                f"⚠️  --best-of {best_of} keeps all {variations * len(available_generators)} candidates; "
+                f"at most {MAX_VARIATIONS} variations per provider can be generated", fg='yellow'
+            ))
         
-        # Step 7: Save metadata
         classification_dict = {
             'is_image_request': classification.is_image_request,
             'confidence': classification.confidence,
             'image_description': classification.image_description,
             'rejection_reason': classification.rejection_reason
         }
-        output_manager.save_metadata(query, classification_dict, all_results, session_path)
+        journal.record(
+            'start', query=query, classification=classification_dict, prompt=generation_prompt,
+            variations=variations, providers=available_generators, seed=seed,
+            templates={name: generator.prompt_template for name, generator in registry.generators.items()},
+            options={
+                'no_pixel_art': no_pixel_art, 'sizes': list(sizes), 'transparent': transparent,
+                'keep_source': keep_source, 'dedupe': dedupe, 'best_of': best_of
+            }
+        )
+        
+        # Step 5: Generate images from all providers
+        # Concurrent runs of the same prompt in this output directory share
+        # one set of provider calls
+        journaled = set()
+        
+        def on_result(name: str, result: dict) -> None:
+            journal_provider(journal, name, result)
+            journaled.add(name)
+        
+        with span('GeneratorRegistry.generate_all', providers=len(available_generators)):
+            generate_all = lambda: registry.generate_all(
+                generation_prompt, variations, on_result=on_result, seed=seed
+            )
+            if share:
+                flights = SingleFlight(output_dir)
+                # Seeded runs reproduce each other, so they may also reuse a
+                # flight that just finished; unseeded runs only join one in progress
+                all_results = await flights.run(
+                    registry.flight_key(generation_prompt, variations, seed), generate_all,
+                    reuse_finished=seed is not None
+                )
+            else:
+                all_results = await generate_all()
+        # Results shared by another process were journaled and paid for over
+        # there; this session spent nothing on them
+        for name, result in all_results.items():
+            if name not in journaled:
+                if result.get('cost') is not None:
+                    result['cost'] = 0.0
+                journal_provider(journal, name, result)
+        
+        # Steps 6-8: Convert, score and save
+        converter = ConversionPool(convert_workers) if convert_workers and not no_pixel_art else None
+        try:
+            total_saved = save_results(
+                all_results, output_manager, session_path, journal,
+                no_pixel_art=no_pixel_art, sizes=sizes, transparent=transparent,
+                keep_source=keep_source, best_of=best_of, memory_stage=memory_stage,
+                converter=converter, ledger=ledger
+            )
+        finally:
+            if converter is not None:
+                converter.close()
+        
+        # Step 9: Save metadata
+        output_manager.save_metadata(
+            query, classification_dict, all_results, session_path, timings=tracer.summary(),
+            sizes=None if no_pixel_art else list(sizes), quality=SessionJournal.load(session_path).quality(),
+            seed=seed
+        )
+        journal.record('finish')
         
-        # Step 8: Show summary
+        # Step 10: Show summary
         click.echo(click.style(f"\n✨ Generated {total_saved} images total", fg='green', bold=True))
         click.echo(f"\n{output_manager.create_session_summary(session_path)}")
+        return session_path
         
     except KeyboardInterrupt:
         logger.info("Generation cancelled by user")
@@ -151,6 +590,617 @@ async def async_main(query: str, variations: int, output_dir: str, no_pixel_art:
         logger.error(f"Unexpected error: {e}", exc_info=True)
         click.echo(click.style(f"\n❌ Error: {e}", fg='red'))
         sys.exit(1)
+    finally:
+        if trace_file:
+            tracer.export(trace_file, trace_format)
+            click.echo(f"Trace written to {trace_file}")
+        if profiler is not None:
+            profiler.stop()
+            if session_path is not None:
+                _, summary_path = profiler.write(session_path)
+                click.echo(f"Profile written to {summary_path}")
+
+
+def parse_rate_limits(ctx, param, values: Tuple[str, ...]) -> Dict[str, float]:
+    """Parse repeated provider=requests_per_minute options."""
+    limits = {}
+    for value in values:
+        provider, _, limit = value.partition('=')
+        try:
+            limits[provider.strip()] = float(limit)
+        except ValueError:
+            raise click.BadParameter(f"expected provider=requests_per_minute, got '{value}'")
+        if not provider.strip() or limits[provider.strip()] <= 0:
+            raise click.BadParameter(f"expected provider=requests_per_minute, got '{value}'")
+    return limits
+
+
+@main.command()
+@click.argument('queries_file', type=click.File('r'))
+@click.option('--workers', '-w', type=click.IntRange(min=1), default=lambda: os.cpu_count() or 1,
+              show_default='CPU count', help='Worker processes')
+@click.option('--concurrency', '-c', type=click.IntRange(min=1), default=4, show_default=True,
+              help='Sessions each worker runs at once')
+@click.option('--variations', '-v', type=click.IntRange(1, 4), default=1, show_default=True,
+              help='Number of variations to generate per provider (1-4)')
+@click.option('--output-dir', '-o', type=click.Path(), default='./output', help='Output directory for generated images')
+@click.option('--no-pixel-art', is_flag=True, help='Skip pixel art conversion (save original resolution)')
+@click.option('--sizes', default='16', show_default=True, callback=parse_sizes,
+              help='Comma-separated sprite sizes; the first is the primary sprite')
+@click.option('--transparent', is_flag=True, help='Remove the background and save sprites with transparency')
+@click.option('--dedupe', type=click.Choice(DEDUPE_MODES), help='Skip or hard-link near-duplicate sprites')
+@click.option('--best-of', type=click.IntRange(min=1), help='Keep only the best K sprites of each session')
+@click.option('--seed', type=click.IntRange(1, SEED_MAX), help='Seed every session for reproducible runs')
+@click.option('--rate-limit', 'rate_limit', multiple=True, callback=parse_rate_limits, metavar='PROVIDER=RPM',
+              help='Requests per minute allowed for a provider across all workers (repeatable)')
+@click.option('--budget', 'budgets', multiple=True, callback=parse_budgets, metavar='PROVIDER=USD',
+              help='Spend cap for a provider over the ledger window, shared by all workers (repeatable)')
+@click.option('--metrics-port', type=click.IntRange(1, 65535),
+              help='Serve Prometheus metrics from worker N on this port + N')
+@click.option('--json', 'as_json', is_flag=True, help='Print per-query results as JSON')
+def batch(queries_file, workers, concurrency, variations, output_dir, no_pixel_art, sizes, transparent,
+          dedupe, best_of, seed, rate_limit, budgets, metrics_port, as_json):
+    """
+    Generate one session per line of QUERIES_FILE on a pool of worker processes.
+    
+    Provider requests from all workers share per-provider rate limits
+    (defaults, RATE_LIMIT_<PROVIDER> environment variables, then --rate-limit).
+    Budgets (BUDGET_<PROVIDER>, then --budget) are checked against the
+    output directory's cost ledger before every session.
+    """
+    queries = [line.strip() for line in queries_file if line.strip() and not line.lstrip().startswith('#')]
+    if not queries:
+        raise click.UsageError("No queries in the file")
+    
+    options = {
+        'variations': variations, 'output_dir': output_dir, 'no_pixel_art': no_pixel_art, 'sizes': sizes,
+        'transparent': transparent, 'dedupe': dedupe, 'best_of': best_of, 'seed': seed,
+        'budgets': budgets
+    }
+    limiter = SharedRateLimiter(rate_limits(rate_limit))
+    started = time.perf_counter()
+    results = run_pool(queries, min(workers, len(queries)), concurrency, options, limiter, metrics_port)
+    elapsed = time.perf_counter() - started
+    
+    if as_json:
+        click.echo(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            if result['status'] == 'ok':
+                click.echo(f"  ✓ {result['query']} -> {result['session']} ({result['seconds']:.1f}s)")
+            else:
+                click.echo(click.style(f"  ✗ {result['query']}: {result.get('error')}", fg='red'))
+    
+    succeeded = sum(result['status'] == 'ok' for result in results)
+    click.echo(click.style(
+        f"\n✨ {succeeded}/{len(results)} sessions in {elapsed:.1f}s ({len(results) / elapsed:.2f} sessions/s)",
+        fg='green' if succeeded == len(results) else 'yellow', bold=True
+    ), err=as_json)
+    if succeeded < len(results):
+        sys.exit(1)
+
+
+@main.command()
+@click.argument('session')
+@click.option('--output-dir', '-o', type=click.Path(file_okay=False), default='./output',
+              help='Output directory holding the session')
+@click.option('--debug', is_flag=True, help='Enable debug logging')
+def resume(session, output_dir, debug):
+    """
+    Finish an interrupted session from its journal.
+    
+    Only provider/variation pairs that were never saved are generated again,
+    with the session's original prompt, templates and options.
+    """
+    if debug:
+        import logging
+        logging.getLogger().setLevel(logging.DEBUG)
+    
+    session_path = Path(session) if Path(session).is_dir() else Path(output_dir) / session
+    if not session_path.is_dir():
+        raise click.ClickException(f"No session folder {session}")
+    asyncio.run(async_resume(session_path))
+
+
+async def async_resume(session_path: Path):
+    """Async half of `resume`: regenerate missing variations and rewrite metadata."""
+    state = SessionJournal.load(session_path)
+    if state.start is None:
+        raise click.ClickException(f"{session_path} has no journal to resume from")
+    start = state.start
+    options = start['options']
+    sizes = tuple(options['sizes'])
+    best_of = options.get('best_of')
+    journal = SessionJournal(session_path)
+    output_manager = OutputManager(str(session_path.parent), dedupe=options.get('dedupe'))
+    
+    missing = state.missing()
+    saved = sum(1 for event in state.variations.values() if event['event'] == 'image')
+    if best_of is not None and saved >= best_of:
+        # The best-of selection already saved everything it was going to
+        missing = {}
+    
+    if missing:
+        registry = GeneratorRegistry()
+        registry.set_sprite_size(max(sizes))
+        registry.set_working_size(
+            None if options['no_pixel_art'] or options['keep_source'] else working_resolution(max(sizes))
+        )
+        registry.set_prompt_templates(start.get('templates') or {})
+        ledger = CostLedger(session_path.parent, budget_limits())
+        registry.set_ledger(ledger)
+        unavailable = [provider for provider in missing if provider not in registry.generators]
+        for provider in unavailable:
+            click.echo(click.style(f"  ✗ {provider}: not configured, cannot resume", fg='red'))
+        missing = {provider: numbers for provider, numbers in missing.items() if provider not in unavailable}
+    
+    if not missing:
+        click.echo(f"Nothing to resume in {session_path}")
+    else:
+        click.echo(click.style(
+            f"🔁 Resuming {session_path}: " + ', '.join(
+                f"{provider} {len(numbers)}" for provider, numbers in missing.items()
+            ), fg='blue'
+        ))
+        journal.record('resume', missing=missing)
+        # Seeded variations are regenerated from their own seeds, so resuming
+        # gives the images the interrupted run would have saved
+        seed = start.get('seed')
+        # Regenerated sessions start from their source sprite again
+        source = start.get('source')
+        all_results = await registry.generate_some(
+            start['prompt'], {provider: len(numbers) for provider, numbers in missing.items()},
+            on_result=lambda name, result: journal_provider(journal, name, result),
+            seeds=None if seed is None else {
+                provider: variation_seeds(seed, numbers) for provider, numbers in missing.items()
+            },
+            source=None if source is None else regeneration_source(Path(source['sprite'])),
+            strength=(source or {}).get('strength', DEFAULT_STRENGTH)
+        )
+        total_saved = save_results(
+            all_results, output_manager, session_path, journal, numbering=missing,
+            no_pixel_art=options['no_pixel_art'], sizes=sizes, transparent=options['transparent'],
+            keep_source=options['keep_source'], best_of=None if best_of is None else best_of - saved,
+            ledger=ledger,
+            palette=sprite_colors(Image.open(source['sprite'])) if source and source.get('lock_palette') else None
+        )
+        click.echo(click.style(f"\n✨ Generated {total_saved} missing images", fg='green', bold=True))
+    
+    state = SessionJournal.load(session_path)
+    output_manager.save_metadata(
+        start['query'], start['classification'], state.results(), session_path,
+        sizes=None if options['no_pixel_art'] else list(sizes), quality=state.quality(),
+        seed=start.get('seed'), source=start.get('source')
+    )
+    journal.record('finish')
+    click.echo(f"\n{output_manager.create_session_summary(session_path)}")
+
+
+def resolve_sprite(sprite: str, output_dir: str) -> Path:
+    """Find a saved sprite given as a path or relative to the output directory."""
+    for path in (Path(sprite), Path(output_dir) / sprite):
+        if path.is_file():
+            return path
+    raise click.ClickException(f"No sprite {sprite}")
+
+
+def regeneration_source(sprite_path: Path) -> Image.Image:
+    """
+    The image to regenerate a sprite from: its archived full-resolution source if kept, else the sprite.
+    
+    Args:
+        sprite_path: A saved variation_N.png
+        
+    Returns:
+        The loaded image
+    """
+    if not sprite_path.is_file():
+        raise click.ClickException(f"Source sprite {sprite_path} no longer exists")
+    match = VARIATION_PATTERN.match(sprite_path.name)
+    archived = sprite_path.with_name(f"source_{match.group(1)}.png") if match else None
+    with Image.open(archived if archived is not None and archived.is_file() else sprite_path) as image:
+        return image.copy()
+
+
+def sprite_prompt(sprite_path: Path) -> Optional[str]:
+    """The prompt a saved sprite's session generated from, if it was recorded."""
+    session_path = sprite_path.parent.parent
+    start = SessionJournal.load(session_path).start
+    if start is not None:
+        return start.get('prompt')
+    metadata_path = session_path / 'metadata.json'
+    if metadata_path.exists():
+        metadata = json.loads(metadata_path.read_text())
+        return (metadata.get('classification') or {}).get('image_description') or metadata.get('query')
+    return None
+
+
+@main.command()
+@click.argument('sprite')
+@click.option('--prompt', '-p', help="Prompt steering the new images (default: the sprite's original prompt)")
+@click.option('--variations', '-v', type=click.IntRange(1, 4), default=1, show_default=True,
+              help='Number of variations to generate per provider (1-4)')
+@click.option('--strength', type=click.FloatRange(0, 1), default=DEFAULT_STRENGTH, show_default=True,
+              help='How closely new images follow the sprite, from 0 (prompt only) to 1 (unchanged)')
+@click.option('--lock-palette/--free-palette', default=True, show_default=True,
+              help="Map new sprites onto the source sprite's colors")
+@click.option('--sizes', default=None, callback=parse_sizes,
+              help="Comma-separated sprite sizes (default: the source sprite's size)")
+@click.option('--transparent', is_flag=True, help='Remove the background and save sprites with transparency')
+@click.option('--seed', type=click.IntRange(1, SEED_MAX), help='Seed providers that accept one')
+@click.option('--budget', 'budgets', multiple=True, callback=parse_budgets, metavar='PROVIDER=USD',
+              help='Spend cap for a provider over the ledger window (repeatable)')
+@click.option('--output-dir', '-o', type=click.Path(file_okay=False), default='./output',
+              help='Output directory holding the sprite and receiving the new session')
+@click.option('--debug', is_flag=True, help='Enable debug logging')
+def regenerate(sprite, prompt, variations, strength, lock_palette, sizes, transparent, seed, budgets,
+               output_dir, debug):
+    """
+    Generate new versions of a saved SPRITE with image-to-image providers.
+    
+    OpenAI returns DALL-E 2 variations of the sprite; Stability runs
+    image-to-image with the prompt. The sprite's archived source_N.png is
+    sent instead when it was kept. New sprites go to a new session.
+    """
+    if debug:
+        import logging
+        logging.getLogger().setLevel(logging.DEBUG)
+    
+    sprite_path = resolve_sprite(sprite, output_dir)
+    prompt = prompt or sprite_prompt(sprite_path)
+    if not prompt:
+        raise click.UsageError(f"No prompt recorded for {sprite_path}; pass --prompt")
+    if sizes is None:
+        with Image.open(sprite_path) as image:
+            sizes = (image.width,)
+    asyncio.run(async_regenerate(
+        sprite_path, prompt, variations, output_dir, strength=strength, lock_palette=lock_palette,
+        sizes=sizes, transparent=transparent, seed=seed, budgets=budgets
+    ))
+
+
+async def async_regenerate(
+    sprite_path: Path,
+    prompt: str,
+    variations: int,
+    output_dir: str,
+    strength: float = DEFAULT_STRENGTH,
+    lock_palette: bool = True,
+    sizes: Tuple[int, ...] = (16,),
+    transparent: bool = False,
+    seed: Optional[int] = None,
+    budgets: Optional[Dict[str, float]] = None,
+    registry: Optional[GeneratorRegistry] = None
+) -> Path:
+    """
+    Async half of `regenerate`: generate from a saved sprite into a new, journaled session.
+    
+    Skips classification, since the prompt comes from a session that was
+    already classified or from the user. Returns the session folder.
+    """
+    source = regeneration_source(sprite_path)
+    registry = GeneratorRegistry() if registry is None else registry.for_session()
+    providers = registry.get_image_generators()
+    if not providers:
+        raise click.ClickException("No configured provider accepts source images (OpenAI and Stability do)")
+    
+    output_manager = OutputManager(output_dir)
+    session_path = output_manager.create_session_folder()
+    journal = SessionJournal(session_path)
+    click.echo(click.style(f"📁 Regenerating {sprite_path} in: {session_path}", fg='blue'))
+    
+    registry.set_sprite_size(max(sizes))
+    registry.set_working_size(working_resolution(max(sizes)))
+    registry.set_prompt_templates({})
+    ledger = CostLedger(output_dir, budget_limits(budgets))
+    registry.set_ledger(ledger)
+    
+    source_info = {'sprite': str(sprite_path), 'strength': strength, 'lock_palette': lock_palette}
+    journal.record(
+        'start', query=prompt, classification=None, prompt=prompt, variations=variations,
+        providers=providers, seed=seed, source=source_info,
+        templates={name: None for name in providers},
+        options={
+            'no_pixel_art': False, 'sizes': list(sizes), 'transparent': transparent,
+            'keep_source': False, 'dedupe': None, 'best_of': None
+        }
+    )
+    
+    click.echo(click.style(f"🎨 Generating from the sprite with: {', '.join(providers)}", fg='green'))
+    all_results = await registry.generate_from_image(
+        source, prompt, variations, on_result=lambda name, result: journal_provider(journal, name, result),
+        seed=seed, strength=strength
+    )
+    
+    # New sprites keep the source sprite's colors
+    palette = None
+    if lock_palette:
+        with Image.open(sprite_path) as image:
+            palette = sprite_colors(image)
+    total_saved = save_results(
+        all_results, output_manager, session_path, journal, sizes=sizes, transparent=transparent,
+        ledger=ledger, palette=palette
+    )
+    
+    output_manager.save_metadata(
+        prompt, None, all_results, session_path, sizes=list(sizes),
+        quality=SessionJournal.load(session_path).quality(), seed=seed, source=source_info
+    )
+    journal.record('finish')
+    
+    click.echo(click.style(f"\n✨ Generated {total_saved} images total", fg='green', bold=True))
+    click.echo(f"\n{output_manager.create_session_summary(session_path)}")
+    return session_path
+
+
+def collect_sprites(targets: Tuple[str, ...], output_dir: str) -> List[List[Path]]:
+    """
+    Find saved variations in sprite files, provider folders or session folders.
+    
+    Args:
+        targets: Paths, absolute or relative to the output directory
+        output_dir: Output directory
+        
+    Returns:
+        Per variation, its variation_N.png followed by its other sizes
+    """
+    variations = []
+    for target in targets:
+        path = Path(target) if Path(target).exists() else Path(output_dir) / target
+        if path.is_file():
+            candidates = [path]
+        elif path.is_dir():
+            candidates = sorted(path.rglob('variation_*.png'))
+        else:
+            raise click.ClickException(f"No sprite or folder {target}")
+        for candidate in candidates:
+            if VARIATION_PATTERN.match(candidate.name):
+                variations.append([candidate] + sorted(candidate.parent.glob(f"{candidate.stem}_*x*.png")))
+    return variations
+
+
+def parse_swaps(ctx, param, values: Tuple[str, ...]) -> Dict[Tuple[int, int, int], Tuple[int, int, int]]:
+    """Parse repeated old=new hex color options."""
+    swaps = {}
+    for value in values:
+        old, _, new = value.partition('=')
+        try:
+            swaps[parse_hex_color(old)] = parse_hex_color(new)
+        except ValueError:
+            raise click.BadParameter(f"expected #rrggbb=#rrggbb, got '{value}'")
+    return swaps
+
+
+@main.command()
+@click.argument('targets', nargs=-1, required=True)
+@click.option('--swap', 'swaps', multiple=True, callback=parse_swaps, metavar='OLD=NEW',
+              help='Replace a color and its nearby shades, e.g. "#c83c3c=#3c64c8" (repeatable)')
+@click.option('--tolerance', type=click.IntRange(0, 255), default=SWAP_TOLERANCE, show_default=True,
+              help='Largest per-channel difference from an OLD color still swapped')
+@click.option('--hue-shift', type=float, help='Rotate every color\'s hue by this many degrees')
+@click.option('--palette', 'palette_from',
+              help='Lock colors to a palette: a sprite whose colors to use, or comma-separated hex colors')
+@click.option('--output-dir', '-o', type=click.Path(file_okay=False), default='./output',
+              help='Output directory holding the sprites and receiving the new session')
+@click.option('--json', 'as_json', is_flag=True, help='Print each source and recolored path as JSON')
+def recolor(targets, swaps, tolerance, hue_shift, palette_from, output_dir, as_json):
+    """
+    Recolor saved sprites locally, without calling any provider.
+    
+    TARGETS are sprites, provider folders or session folders. All their
+    sprites (every saved size) share one palette, which is transformed once
+    (swaps, then hue shift, then palette lock) and mapped back onto every
+    pixel. Results go to a new session with the same provider folders.
+    """
+    transforms = []
+    description = []
+    if swaps:
+        transforms.append(swap_colors(swaps, tolerance))
+        description.append('swap ' + ', '.join(
+            '#%02x%02x%02x=#%02x%02x%02x' % (old + new) for old, new in swaps.items()
+        ))
+    if hue_shift:
+        transforms.append(shift_hue(hue_shift))
+        description.append(f"hue {hue_shift:+g}")
+    if palette_from:
+        palette_path = Path(palette_from)
+        if not palette_path.is_file() and (Path(output_dir) / palette_from).is_file():
+            palette_path = Path(output_dir) / palette_from
+        if palette_path.is_file():
+            with Image.open(palette_path) as image:
+                colors = sprite_colors(image)
+        else:
+            try:
+                colors = np.array([parse_hex_color(value) for value in palette_from.split(',') if value.strip()])
+            except ValueError:
+                raise click.BadParameter(f"expected a sprite or hex colors, got '{palette_from}'")
+        transforms.append(lock_to_palette(colors))
+        description.append(f"palette {palette_from}")
+    if not transforms:
+        raise click.UsageError("Pass --swap, --hue-shift or --palette")
+    
+    variations = collect_sprites(targets, output_dir)
+    if not variations:
+        raise click.ClickException("No sprites found")
+    
+    def transform(palette: np.ndarray) -> np.ndarray:
+        for step in transforms:
+            palette = step(palette)
+        return palette
+    
+    paths = [path for variation in variations for path in variation]
+    images = []
+    for path in paths:
+        with Image.open(path) as image:
+            image.load()
+            images.append(image)
+    recolored = dict(zip(paths, recolor_sprites(images, transform)))
+    
+    output_manager = OutputManager(output_dir)
+    session_path = output_manager.create_session_folder()
+    counts: Dict[str, int] = {}
+    results = []
+    for variation in variations:
+        provider = variation[0].parent.name
+        counts[provider] = counts.get(provider, 0) + 1
+        primary = recolored[variation[0]]
+        sprites = {primary.width: primary}
+        sprites.update({recolored[path].width: recolored[path] for path in variation[1:]})
+        saved = output_manager.save_sprite_sizes(
+            sprites, provider, counts[provider], session_path, primary_size=primary.width
+        )
+        results.append({'source': str(variation[0]), 'path': str(saved[0])})
+    
+    output_manager.save_metadata(
+        f"Recolor ({'; '.join(description)})", None,
+        {provider: {'variations_requested': n, 'variations_generated': n, 'errors': []} for provider, n in counts.items()},
+        session_path,
+        source={'recolor': '; '.join(description), 'sprites': [result['source'] for result in results]}
+    )
+    
+    if as_json:
+        click.echo(json.dumps(results, indent=2))
+    else:
+        click.echo(f"Recolored {len(results)} sprites into {session_path}")
+
+
+@main.command()
+@click.argument('text', required=False)
+@click.option('--provider', '-p', help='Only sprites from this provider')
+@click.option('--since', type=click.DateTime(), help='Only sessions created on or after this date')
+@click.option('--until', type=click.DateTime(), help='Only sessions created on or before this date')
+@click.option('--success/--failed', default=None, help='Only providers that finished with or without errors')
+@click.option('--color', '-c', help='Dominant color near this hex value, e.g. "#ff0000"')
+@click.option('--distance', type=float, default=48.0, show_default=True, help='Maximum RGB distance for --color')
+@click.option('--limit', '-n', type=int, default=50, show_default=True, help='Maximum number of results')
+@click.option('--output-dir', '-o', type=click.Path(file_okay=False), default='./output',
+              help='Output directory to search')
+@click.option('--json', 'as_json', is_flag=True, help='Print results as JSON')
+def search(text, provider, since, until, success, color, distance, limit, output_dir, as_json):
+    """Search generated sprites by prompt, provider, date, status and color."""
+    try:
+        rgb = parse_hex_color(color) if color else None
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--color')
+    
+    catalog = SessionCatalog(output_dir)
+    # Index anything written since the last scan (unchanged directories cost a stat)
+    catalog.rescan()
+    
+    # A bare date means the whole day
+    if until is not None and until.time() == until.min.time():
+        until = until + timedelta(days=1)
+    
+    results = catalog.search(
+        text=text, provider=provider, since=since, until=until, success=success,
+        color=rgb, color_distance=distance, limit=limit
+    )
+    
+    if as_json:
+        click.echo(json.dumps(results, indent=2))
+        return
+    
+    if not results:
+        click.echo("No matching sprites found")
+        return
+    
+    for result in results:
+        line = f"{Path(output_dir) / result['path']}  [{result['provider']}]  {result['query'] or ''}"
+        if result.get('color_distance') is not None:
+            line += f"  (color distance {result['color_distance']})"
+        click.echo(line)
+
+
+
+@main.command()
+@click.option('--output-dir', '-o', type=click.Path(file_okay=False), default='./output',
+              help='Output directory to deduplicate')
+@click.option('--distance', type=click.IntRange(0, HASH_BITS - 1), default=DUPLICATE_DISTANCE, show_default=True,
+              help='Maximum differing sprite hash bits for a near-duplicate')
+@click.option('--action', type=click.Choice(['report', 'link', 'delete']), default='report', show_default=True,
+              help='List duplicates, replace them with hard links to the original, or delete them')
+@click.option('--json', 'as_json', is_flag=True, help='Print duplicates as JSON')
+def dedupe(output_dir, distance, action, as_json):
+    """Find near-duplicate sprites across the output tree; the oldest copy is kept."""
+    base_dir = Path(output_dir)
+    catalog = SessionCatalog(output_dir)
+    # Indexes and hashes anything written since the last scan
+    catalog.rescan()
+    
+    duplicates = find_duplicates(catalog.image_hashes(), distance)
+    results = []
+    reclaimed = 0
+    for rel, (original, bits) in duplicates.items():
+        path, original_path = base_dir / rel, base_dir / original
+        # Hard links already share storage with the original
+        linked = os.path.samefile(path, original_path)
+        if not linked:
+            reclaimed += path.stat().st_size
+        if action == 'link' and not linked:
+            replace_with_link(path, original_path)
+        elif action == 'delete':
+            # Extra sizes of a deleted variation go with it
+            for variant in path.parent.glob(f"{path.stem}_*x*.png"):
+                variant.unlink()
+            path.unlink()
+        results.append({'path': rel, 'original': original, 'distance': bits, 'already_linked': linked})
+    
+    if action != 'report':
+        catalog.rescan()
+    
+    if as_json:
+        click.echo(json.dumps(results, indent=2))
+        return
+    
+    if not results:
+        click.echo("No near-duplicate sprites found")
+        return
+    
+    for result in results:
+        note = "  (already linked)" if result['already_linked'] else ""
+        click.echo(f"{result['path']} ~ {result['original']}  ({result['distance']} bits){note}")
+    verb = {'report': 'Reclaimable', 'link': 'Reclaimed', 'delete': 'Deleted'}[action]
+    click.echo(f"\n{len(results)} duplicates; {verb}: {reclaimed / 1024:.1f} KiB")
+
+
+@main.command()
+@click.option('--since', type=click.DateTime(), help='Only count spend on or after this date')
+@click.option('--output-dir', '-o', type=click.Path(file_okay=False), default='./output',
+              help='Output directory holding the ledger')
+@click.option('--json', 'as_json', is_flag=True, help='Print the report as JSON')
+def costs(since, output_dir, as_json):
+    """
+    Report estimated spend and cost per sprite by provider.
+    
+    Costs are estimated from each provider's price for the settings it was
+    asked for (src/generators/pricing.py, or PRICE_<PROVIDER>). Budgets come
+    from BUDGET_<PROVIDER> environment variables.
+    """
+    ledger = CostLedger(output_dir, budget_limits())
+    report = ledger.report(since.timestamp() if since else None)
+    
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+        return
+    
+    if not report:
+        click.echo("No provider calls recorded")
+        return
+    
+    money = lambda value: '-' if value is None else f"${value:.4f}"
+    click.echo(f"{'provider':12s} {'requests':>8s} {'images':>7s} {'sprites':>7s} {'failed':>6s} "
+               f"{'cost':>10s} {'per image':>10s} {'per sprite':>10s}  budget left")
+    for entry in report:
+        budget = f"  {money(entry['remaining'])} of {money(entry['budget'])}" if 'budget' in entry else ''
+        click.echo(
+            f"{entry['provider']:12s} {entry['requests']:>8d} {entry['images']:>7d} {entry['sprites']:>7d} "
+            f"{entry['failures']:>6d} {money(entry['cost']):>10s} {money(entry['cost_per_image']):>10s} "
+            f"{money(entry['cost_per_sprite']):>10s}{budget}"
+        )
+    total = sum(entry['cost'] for entry in report)
+    sprites = sum(entry['sprites'] for entry in report)
+    per_sprite = f", {money(total / sprites)} per sprite" if sprites else ''
+    click.echo(f"\nTotal: {money(total)} for {sprites} sprites{per_sprite}")
 
 
 if __name__ == '__main__':
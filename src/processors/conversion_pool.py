@@ -0,0 +1,113 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional, Sequence, Tuple
+from PIL import Image
+from .pixel_art import SPRITE_SIZES, convert_to_pixel_art, convert_to_pixel_art_sizes, working_resolution
+from ..utils.metrics import CONVERSION_HANDOFFS
+from ..utils.shared_frames import FrameRing
+
+
+# Slots per worker: one being converted, one already queued behind it
+SLOTS_PER_WORKER = 2
+
+# The ring attached in each worker process
+_ring: Optional[FrameRing] = None
+
+
+def convert_sprites(image: Image.Image, sizes: Sequence[int], transparent: bool = False) -> Dict[int, Image.Image]:
+    """
+    Convert an image to pixel art at one or more sizes.
+
+    Args:
+        image: Input PIL Image
+        sizes: Sprite sizes, primary first
+        transparent: Whether to remove the background
+
+    Returns:
+        Dictionary mapping each size to its sprite
+    """
+    if len(sizes) == 1:
+        return {sizes[0]: convert_to_pixel_art(image, size=sizes[0], transparent=transparent)}
+    return convert_to_pixel_art_sizes(image, sizes, transparent=transparent)
+
+
+def _attach(spec: Tuple[str, int, int]) -> None:
+    global _ring
+    _ring = FrameRing.attach(*spec)
+
+
+def _convert_slot(slot: int, sizes: Tuple[int, ...], transparent: bool) -> Dict[int, Image.Image]:
+    return convert_sprites(_ring.image(slot), sizes, transparent)
+
+
+class ConversionPool:
+    """
+    Pixel art conversion on worker processes, fed through shared memory.
+
+    Images are copied into a FrameRing and workers read them in place, so
+    only slot numbers and the finished sprites (a few KiB) are pickled.
+    Images too large for a slot fall back to being pickled whole. Submitting
+    blocks while every slot is in use, which bounds the memory held by
+    images waiting for a worker.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        slots: Optional[int] = None,
+        max_side: int = working_resolution(max(SPRITE_SIZES))
+    ):
+        """
+        Start the workers.
+
+        Args:
+            workers: Number of conversion processes
+            slots: Images in flight at once (default two per worker)
+            max_side: Largest image side handed over through shared memory;
+                defaults to the working resolution of the largest sprite size
+        """
+        self.ring = FrameRing(slots or SLOTS_PER_WORKER * workers, max_side)
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(self.ring.spec,))
+
+    def submit(
+        self,
+        image: Image.Image,
+        sizes: Sequence[int] = (16,),
+        transparent: bool = False
+    ) -> Future:
+        """
+        Queue an image for conversion.
+
+        Args:
+            image: Input PIL Image
+            sizes: Sprite sizes, primary first
+            transparent: Whether to remove the background
+
+        Returns:
+            Future resolving to a dictionary mapping each size to its sprite
+        """
+        sizes = tuple(sizes)
+        if not self.ring.fits(image):
+            CONVERSION_HANDOFFS.labels('pickled').inc()
+            return self.executor.submit(convert_sprites, image, sizes, transparent)
+
+        slot = self.ring.put(image)
+        CONVERSION_HANDOFFS.labels('shared').inc()
+        try:
+            future = self.executor.submit(_convert_slot, slot, sizes, transparent)
+        except Exception:
+            self.ring.release(slot)
+            raise
+        # The worker has finished reading the slot once its result is back
+        future.add_done_callback(lambda _: self.ring.release(slot))
+        return future
+
+    def close(self) -> None:
+        """Wait for queued conversions, stop the workers and free the ring."""
+        self.executor.shutdown(wait=True)
+        self.ring.close()
+
+    def __enter__(self) -> 'ConversionPool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
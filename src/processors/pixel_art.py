@@ -1,13 +1,44 @@
 from PIL import Image
 import numpy as np
-from typing import Optional, Tuple
+from typing import Dict, Iterable, Optional, Tuple
+from .prompts import render_prompt
+from ..utils.metrics import CONVERSION_LATENCY
+from ..utils.tracing import traced
 
 
+# Generator output is reduced to this multiple of the sprite size on download
+WORKING_SCALE = 8
+
+# Sprite sizes offered by the --sizes option
+SPRITE_SIZES = (16, 24, 32, 48, 64)
+
+# Largest per-channel difference from the key color still counted as background
+BACKGROUND_TOLERANCE = 24
+
+# Share of border pixels that must match the key color for it to be a background
+BACKGROUND_MIN_BORDER_SHARE = 0.5
+
+# Source pixels less opaque than this are background in transparent mode
+ALPHA_THRESHOLD = 128
+
+# Larger images (full-resolution --no-pixel-art saves) are hashed and color
+# indexed on a nearest-neighbor sample this size, so they cost what a sprite does
+ANALYSIS_MAX_SIDE = max(SPRITE_SIZES)
+
+
+def working_resolution(size: int = 16) -> int:
+    """Largest source side worth keeping when converting to a size x size sprite."""
+    return size * WORKING_SCALE
+
+
+@traced('convert_to_pixel_art')
+@CONVERSION_LATENCY.time()
 def convert_to_pixel_art(
     image: Image.Image, 
     size: int = 16,
     color_palette_size: int = 32,
-    dithering: bool = True
+    dithering: bool = True,
+    transparent: bool = False
 ) -> Image.Image:
     """
     Convert an image to pixel art style with specified dimensions.
@@ -17,31 +48,255 @@ def convert_to_pixel_art(
         size: Target size (will create size x size image)
         color_palette_size: Number of colors in the final palette
         dithering: Whether to apply dithering for smoother color transitions
+        transparent: Whether to remove the background, returning an RGBA image
         
     Returns:
         PIL Image in pixel art style
     """
-    # Convert to RGB if not already
-    if image.mode != 'RGB':
-        image = image.convert('RGB')
+    # Convert to RGB if not already, keeping any alpha for transparent mode
+    image, alpha = _split_alpha(image, transparent)
     
     # Step 1: Resize to target size using nearest neighbor for sharp pixels
     resized = image.resize((size, size), Image.Resampling.NEAREST)
     
-    # Step 2: Reduce color palette
-    if dithering:
-        # Convert to P mode with dithering for better color distribution
-        quantized = resized.convert('P', palette=Image.ADAPTIVE, colors=color_palette_size, dither=Image.FLOYDSTEINBERG)
-    else:
-        # Simple color quantization without dithering
-        quantized = resized.convert('P', palette=Image.ADAPTIVE, colors=color_palette_size, dither=Image.NONE)
+    # Step 1b: Key out the background before it takes up palette entries
+    background = None
+    if transparent:
+        resized, background = _key_background(resized, alpha)
+    
+    # Step 2: Reduce the color palette the same way convert_to_pixel_art_sizes
+    # does, so a sprite does not depend on which other sizes were requested
+    final_image = _quantize_levels({size: resized}, color_palette_size, dithering)[size]
     
-    # Convert back to RGB for consistency
-    final_image = quantized.convert('RGB')
+    if background is not None:
+        final_image = _apply_background(final_image, background)
     
     return final_image
 
 
+@traced('convert_to_pixel_art_sizes')
+@CONVERSION_LATENCY.time()
+def convert_to_pixel_art_sizes(
+    image: Image.Image,
+    sizes: Iterable[int],
+    color_palette_size: int = 32,
+    dithering: bool = True,
+    transparent: bool = False
+) -> Dict[int, Image.Image]:
+    """
+    Convert one image to pixel art at several sizes sharing a single palette.
+    
+    The palette is chosen once, on the smallest size, and every other size is
+    mapped onto it, so colors match across sizes and each added size costs a
+    nearest-neighbor resize and a palette lookup rather than another median
+    cut. Every size, the smallest included, goes through the same palette
+    mapping, so dithering applies to all of them alike, and the smallest
+    sprite is the one convert_to_pixel_art returns at that size.
+    
+    Args:
+        image: Input PIL Image
+        sizes: Target sizes (each creates a size x size image)
+        color_palette_size: Number of colors in the shared palette
+        dithering: Whether to apply dithering when mapping onto the palette
+        transparent: Whether to remove the background, returning RGBA images
+        
+    Returns:
+        Dictionary mapping each size to its pixel art image
+    """
+    image, alpha = _split_alpha(image, transparent)
+    
+    # Nearest neighbor samples the source directly; its cost depends only on
+    # the output size, so there is nothing to gain from resizing level by level
+    levels = {
+        size: image.resize((size, size), Image.Resampling.NEAREST)
+        for size in sorted(set(sizes))
+    }
+    
+    # Each size gets its own mask; masks are a few microseconds at sprite sizes
+    backgrounds = {}
+    if transparent:
+        for size in levels:
+            levels[size], backgrounds[size] = _key_background(levels[size], alpha)
+    
+    sprites = _quantize_levels(levels, color_palette_size, dithering)
+    
+    for size, background in backgrounds.items():
+        if background is not None:
+            sprites[size] = _apply_background(sprites[size], background)
+    
+    return sprites
+
+
+def _quantize_levels(
+    levels: Dict[int, Image.Image],
+    color_palette_size: int,
+    dithering: bool
+) -> Dict[int, Image.Image]:
+    """Reduce every level to one palette chosen on the smallest, returning RGB sprites."""
+    # Median cut cost grows with pixel count, and the smallest level samples
+    # the scene's colors as well as the largest does. Sorting the palette
+    # makes colors equally near two entries map to the same one every time
+    smallest = min(levels)
+    palette = _sort_palette(levels[smallest].convert('P', palette=Image.ADAPTIVE, colors=color_palette_size))
+    dither = Image.FLOYDSTEINBERG if dithering else Image.NONE
+    
+    # convert('P', ADAPTIVE) only picks the palette; it never dithers
+    return {
+        size: level.quantize(palette=palette, dither=dither).convert('RGB')
+        for size, level in levels.items()
+    }
+
+
+def remove_background(image: Image.Image, tolerance: int = BACKGROUND_TOLERANCE) -> Image.Image:
+    """
+    Make an image's background transparent.
+    
+    The background is keyed on the color most of the border agrees on and
+    flood-filled inward from the border, so matching colors inside the
+    subject (eyes, highlights) stay opaque.
+    
+    Args:
+        image: Input PIL Image, typically a sprite
+        tolerance: Largest per-channel difference from the key color to remove
+        
+    Returns:
+        RGBA image; fully opaque if no uniform background was found
+    """
+    rgba = np.array(image.convert('RGBA'))
+    background = background_mask(rgba[..., :3], tolerance)
+    rgba[background] = 0
+    return Image.fromarray(rgba)
+
+
+def background_mask(pixels: np.ndarray, tolerance: int = BACKGROUND_TOLERANCE) -> np.ndarray:
+    """
+    Find the background of an RGB array by border keying and flood fill.
+    
+    Args:
+        pixels: (height, width, 3) uint8 array
+        tolerance: Largest per-channel difference from the key color to remove
+        
+    Returns:
+        Boolean (height, width) array, True for background pixels
+    """
+    height, width = pixels.shape[:2]
+    if height < 3 or width < 3:
+        return np.zeros((height, width), dtype=bool)
+    
+    # Key color: the mean of the most common tolerance-sized bin of border
+    # colors, which tolerates noisy or slightly graded generator backgrounds
+    border = np.concatenate([pixels[0], pixels[-1], pixels[1:-1, 0], pixels[1:-1, -1]])
+    bins = _pack_rgb(border // (tolerance + 1))
+    values, counts = np.unique(bins, return_counts=True)
+    key = border[bins == values[counts.argmax()]].mean(axis=0)
+    if _close_to(border, key, tolerance).sum() < len(border) * BACKGROUND_MIN_BORDER_SHARE:
+        return np.zeros((height, width), dtype=bool)
+    candidate = _close_to(pixels, key, tolerance)
+    
+    # Flood fill from the border. Each pass spreads along whole runs of
+    # candidate pixels, first in rows and then in columns, so it converges in
+    # as many passes as a path has turns rather than one pass per pixel
+    reached = np.zeros_like(candidate)
+    reached[[0, -1]] = candidate[[0, -1]]
+    reached[:, [0, -1]] = candidate[:, [0, -1]]
+    while True:
+        grown = _spread_runs(reached, candidate)
+        grown = _spread_runs(grown.T, candidate.T).T
+        if np.array_equal(grown, reached):
+            return reached
+        reached = grown
+
+
+def _close_to(pixels: np.ndarray, key: np.ndarray, tolerance: int) -> np.ndarray:
+    """Mask of pixels within tolerance of key in every channel."""
+    # Per-channel comparisons; reducing over the size-3 channel axis is far slower
+    key = np.rint(key).astype(np.int16)
+    close = np.abs(pixels[..., 0].astype(np.int16) - key[0]) <= tolerance
+    close &= np.abs(pixels[..., 1].astype(np.int16) - key[1]) <= tolerance
+    close &= np.abs(pixels[..., 2].astype(np.int16) - key[2]) <= tolerance
+    return close
+
+
+def _spread_runs(reached: np.ndarray, candidate: np.ndarray) -> np.ndarray:
+    """Extend reached pixels to every candidate pixel in the same row run."""
+    # Number the runs: a new one starts at every gap and at every row start
+    starts = ~candidate
+    starts[:, 0] = True
+    runs = np.cumsum(starts).reshape(candidate.shape)
+    hit = np.zeros(runs[-1, -1] + 1, dtype=bool)
+    hit[runs[reached]] = True
+    return hit[runs] & candidate
+
+
+def _split_alpha(image: Image.Image, transparent: bool) -> Tuple[Image.Image, Optional[Image.Image]]:
+    """Return the image as RGB plus its alpha channel when transparency is kept."""
+    alpha = None
+    if transparent and (image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info):
+        alpha = image.convert('RGBA').getchannel('A')
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image, alpha
+
+
+def _key_background(
+    resized: Image.Image,
+    alpha: Optional[Image.Image]
+) -> Tuple[Image.Image, Optional[np.ndarray]]:
+    """
+    Mask a sprite-size image's background and paint it with a foreground color.
+    
+    Painting the background with the most common foreground color keeps it
+    from taking palette entries away from the subject.
+    
+    Returns:
+        The repainted image and its background mask, or the image unchanged
+        and None if there is no background (or nothing but background)
+    """
+    pixels = np.asarray(resized)
+    background = background_mask(pixels)
+    if alpha is not None:
+        background |= np.asarray(alpha.resize(resized.size, Image.Resampling.NEAREST)) < ALPHA_THRESHOLD
+    if not background.any() or background.all():
+        return resized, None
+    
+    packed, counts = np.unique(_pack_rgb(pixels[~background]), return_counts=True)
+    fill = packed[counts.argmax()]
+    repainted = pixels.copy()
+    repainted[background] = (fill >> 16, (fill >> 8) & 0xFF, fill & 0xFF)
+    return Image.fromarray(repainted), background
+
+
+def _apply_background(image: Image.Image, background: np.ndarray) -> Image.Image:
+    """Turn the masked pixels of an RGB image fully transparent."""
+    rgba = np.empty(background.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = np.asarray(image)
+    rgba[..., 3] = 255
+    rgba[background] = 0
+    return Image.fromarray(rgba)
+
+
+def _sort_palette(quantized: Image.Image) -> Image.Image:
+    """
+    Reorder a P image's palette by packed RGB value, remapping its pixels.
+    
+    Median cut leaves entries in whatever order its boxes were split, which
+    is an implementation detail of Pillow. Mapping another image onto the
+    palette breaks nearest-color ties towards the lower index, so a sorted
+    palette maps the same colors the same way whatever that order was.
+    """
+    palette = np.array(quantized.getpalette(), dtype=np.uint8).reshape(-1, 3)
+    order = np.argsort(_pack_rgb(palette), kind='stable')
+    return quantized.remap_palette(order.tolist())
+
+
+def _pack_rgb(rgb: np.ndarray) -> np.ndarray:
+    """Pack (..., 3) uint8 colors into single uint32 values."""
+    packed = rgb[..., 0].astype(np.uint32) << 16
+    packed |= rgb[..., 1].astype(np.uint32) << 8
+    packed |= rgb[..., 2]
+    return packed
+
+
 def enhance_pixel_art_prompt(prompt: str) -> str:
     """
     Enhance a prompt to better generate pixel art style images.
@@ -50,25 +305,9 @@ def enhance_pixel_art_prompt(prompt: str) -> str:
         prompt: Original user prompt
         
     Returns:
-        Enhanced prompt optimized for pixel art generation
+        Prompt with the default template's pixel art fragments it lacks
     """
-    pixel_art_keywords = [
-        "pixel art style",
-        "8-bit",
-        "16-bit", 
-        "retro game sprite",
-        "low resolution",
-        "pixelated",
-        "simple shapes",
-        "limited color palette"
-    ]
-    
-    # Add pixel art keywords if not already present
-    enhanced = prompt
-    if not any(keyword in prompt.lower() for keyword in ["pixel", "8-bit", "16-bit", "sprite"]):
-        enhanced = f"{prompt}, {', '.join(pixel_art_keywords[:3])}"
-    
-    return enhanced
+    return render_prompt(prompt)
 
 
 def create_pixel_grid(
@@ -81,7 +320,7 @@ def create_pixel_grid(
     Create a larger preview image with visible pixel grid for better visualization.
     
     Args:
-        image: 16x16 pixel art image
+        image: 16x16 pixel art image (RGBA sprites keep their transparency)
         pixel_size: Size of each pixel in the preview
         grid_color: RGB color for the grid lines
         grid_width: Width of grid lines
@@ -89,33 +328,54 @@ def create_pixel_grid(
     Returns:
         Enlarged image with pixel grid
     """
+    # Transparent sprites keep their alpha; grid lines stay opaque
+    mode = 'RGBA' if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info else 'RGB'
+    if image.mode != mode:
+        image = image.convert(mode)
+    
     # Get original dimensions
     width, height = image.size
+    step = pixel_size + grid_width
     
     # Calculate new dimensions
     new_width = width * pixel_size + (width + 1) * grid_width
     new_height = height * pixel_size + (height + 1) * grid_width
     
-    # Create new image with grid color background
-    preview = Image.new('RGB', (new_width, new_height), grid_color)
-    
-    # Place each pixel
-    for y in range(height):
-        for x in range(width):
-            pixel_color = image.getpixel((x, y))
-            
-            # Calculate position in preview
-            px = x * (pixel_size + grid_width) + grid_width
-            py = y * (pixel_size + grid_width) + grid_width
-            
-            # Draw the pixel
-            for dy in range(pixel_size):
-                for dx in range(pixel_size):
-                    preview.putpixel((px + dx, py + dy), pixel_color)
+    # Start from a canvas filled with the grid color
+    canvas = np.empty((new_height, new_width, len(mode)), dtype=np.uint8)
+    canvas[:] = grid_color if mode == 'RGB' else (*grid_color, 255)
+    
+    # View everything right of/below the first grid line as (row, dy, col, dx)
+    # cells and broadcast each source pixel into its pixel_size block
+    cells = canvas[grid_width:, grid_width:].reshape(height, step, width, step, len(mode))
+    cells[:, :pixel_size, :, :pixel_size] = np.asarray(image)[:, None, :, None]
+    
+    preview = Image.fromarray(canvas)
     
     return preview
 
 
+def analysis_sample(image: Image.Image) -> Image.Image:
+    """
+    The image itself if it is sprite-sized, else a nearest-neighbor sample of it.
+    
+    Nearest neighbor keeps the image's real colors instead of blending new
+    ones, so the sample's dominant colors are the image's.
+    
+    Args:
+        image: Any PIL image
+        
+    Returns:
+        Image at most ANALYSIS_MAX_SIDE pixels on its longer side
+    """
+    width, height = image.size
+    if max(width, height) <= ANALYSIS_MAX_SIDE:
+        return image
+    scale = ANALYSIS_MAX_SIDE / max(width, height)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return image.resize(size, Image.Resampling.NEAREST)
+
+
 def analyze_pixel_art(image: Image.Image) -> dict:
     """
     Analyze a pixel art image and return statistics.
@@ -129,20 +389,31 @@ def analyze_pixel_art(image: Image.Image) -> dict:
     # Convert to numpy array for analysis
     img_array = np.array(image)
     
-    # Get unique colors
-    unique_colors = len(np.unique(img_array.reshape(-1, 3), axis=0))
+    # Transparent pixels are not part of the sprite's colors
+    rgb = img_array[..., :3].reshape(-1, 3)
+    transparent_pixels = 0
+    if image.mode == 'RGBA':
+        opaque = img_array[..., 3].reshape(-1) >= ALPHA_THRESHOLD
+        transparent_pixels = int(len(opaque) - opaque.sum())
+        rgb = rgb[opaque]
     
-    # Calculate color distribution
-    colors, counts = np.unique(img_array.reshape(-1, 3), axis=0, return_counts=True)
+    # Calculate color distribution and unique colors in one pass; packing RGB
+    # into one integer avoids np.unique's much slower row-wise (axis=0) sort
+    packed, counts = np.unique(_pack_rgb(rgb), return_counts=True)
+    colors = np.stack([packed >> 16, (packed >> 8) & 0xFF, packed & 0xFF], axis=1).astype(img_array.dtype)
+    unique_colors = len(colors)
     
     # Find dominant colors
     sorted_indices = np.argsort(counts)[::-1]
     dominant_colors = [tuple(colors[i]) for i in sorted_indices[:5]]
+    color_counts = [int(counts[i]) for i in sorted_indices[:5]]
     
     return {
         'dimensions': image.size,
         'total_pixels': image.size[0] * image.size[1],
         'unique_colors': unique_colors,
         'dominant_colors': dominant_colors,
+        'color_counts': color_counts,
+        'transparent_pixels': transparent_pixels,
         'mode': image.mode
     }
\ No newline at end of file
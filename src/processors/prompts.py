@@ -0,0 +1,177 @@
+import math
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+
+# Concepts a prompt can already carry, each with the pattern that detects it.
+# A template fragment is skipped when its concept is already present, so a
+# prompt never gets two ways of saying the same thing
+CONCEPT_PATTERNS: Dict[str, re.Pattern] = {
+    'pixel_art': re.compile(r'\bpixel[- ]?art\b', re.IGNORECASE),
+    'pixelated': re.compile(r'\bpixel(?:ated|ized|ised)\b', re.IGNORECASE),
+    'bit_depth': re.compile(r'\b(?:8|16|32)[- ]?bit\b', re.IGNORECASE),
+    'retro_game': re.compile(r'\bretro\b|\bsprites?\b', re.IGNORECASE),
+    'low_resolution': re.compile(r'\blow[- ]?res(?:olution)?\b', re.IGNORECASE),
+    'palette': re.compile(r'\b(?:limited|restricted|small)\s+colou?r\s+palette\b', re.IGNORECASE),
+}
+
+# Concept of each fragment templates may add
+FRAGMENT_CONCEPTS: Dict[str, str] = {
+    'pixel art style': 'pixel_art',
+    'pixelated': 'pixelated',
+    '8-bit': 'bit_depth',
+    '16-bit': 'bit_depth',
+    'retro game sprite': 'retro_game',
+    'retro game art': 'retro_game',
+    'low resolution': 'low_resolution',
+    'limited color palette': 'palette',
+}
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """Named list of style fragments appended to a prompt."""
+    name: str
+    fragments: Tuple[str, ...]
+
+
+# Per provider: the templates to choose between, the one used so far first.
+# The 'default' entry serves providers without their own
+PROVIDER_TEMPLATES: Dict[str, Tuple[PromptTemplate, ...]] = {
+    'default': (
+        PromptTemplate('sprite', ('pixel art style', '16-bit', 'retro game sprite')),
+    ),
+    'openai': (
+        PromptTemplate('game-art', ('pixel art style', '16-bit', 'retro game art')),
+        PromptTemplate('palette', ('pixel art style', '16-bit', 'retro game sprite', 'limited color palette')),
+    ),
+    'freepik': (
+        PromptTemplate('sprite', ('pixel art style', '16-bit', 'retro game sprite')),
+        PromptTemplate('palette', ('pixel art style', '16-bit', 'retro game sprite', 'limited color palette')),
+    ),
+    # Diffusion models render fine detail unless pushed towards blocky output
+    'stability': (
+        PromptTemplate('pixelated', ('pixel art style', '16-bit', 'retro game sprite', 'pixelated')),
+        PromptTemplate('8-bit', ('pixel art style', '8-bit', 'retro game sprite', 'pixelated', 'low resolution')),
+    ),
+    'replicate': (
+        PromptTemplate('low-res', ('pixel art style', '16-bit', 'retro game sprite', 'low resolution')),
+        PromptTemplate('8-bit', ('pixel art style', '8-bit', 'retro game sprite', 'pixelated', 'low resolution')),
+    ),
+}
+
+# Weight of the exploration bonus when choosing templates. Sprite scores
+# lie in [0, 1] and differ by a few hundredths between templates, so a
+# small bonus keeps retrying close runners-up without wasting many runs
+EXPLORATION = 0.1
+
+# (runs scored, mean score) per template name
+TemplateStats = Dict[str, Tuple[int, float]]
+
+
+class PromptEngine:
+    """
+    Single place prompts get their pixel art styling.
+
+    Concept patterns are compiled once; rendering scans the prompt once per
+    concept and appends the template's fragments whose concept is missing.
+    Renders are memoized per (prompt, provider, template).
+    """
+
+    def __init__(
+        self,
+        templates: Optional[Dict[str, Tuple[PromptTemplate, ...]]] = None,
+        cache_size: int = 1024
+    ):
+        """
+        Initialize the engine.
+
+        Args:
+            templates: Per-provider templates (defaults to PROVIDER_TEMPLATES)
+            cache_size: Number of rendered prompts kept
+        """
+        self.templates = templates or PROVIDER_TEMPLATES
+        self.render = lru_cache(maxsize=cache_size)(self._render)
+
+    def templates_for(self, provider: Optional[str] = None) -> Tuple[PromptTemplate, ...]:
+        """Templates a provider chooses between, its usual one first."""
+        return self.templates.get(provider) or self.templates['default']
+
+    def template(self, provider: Optional[str] = None, name: Optional[str] = None) -> PromptTemplate:
+        """
+        Look up a provider's template by name.
+
+        Args:
+            provider: Provider name, or None for the default templates
+            name: Template name, or None for the provider's usual template
+
+        Returns:
+            The template; the usual one if the name is unknown
+        """
+        templates = self.templates_for(provider)
+        for template in templates:
+            if template.name == name:
+                return template
+        return templates[0]
+
+    def _render(self, prompt: str, provider: Optional[str] = None, template: Optional[str] = None) -> str:
+        """
+        Style a prompt with one of a provider's templates.
+
+        Args:
+            prompt: Image description
+            provider: Provider name, or None for the default templates
+            template: Template name, or None for the provider's usual template
+
+        Returns:
+            The prompt followed by each template fragment it does not
+            already express
+        """
+        present = {concept for concept, pattern in CONCEPT_PATTERNS.items() if pattern.search(prompt)}
+        fragments = []
+        for fragment in self.template(provider, template).fragments:
+            concept = FRAGMENT_CONCEPTS[fragment]
+            if concept not in present:
+                present.add(concept)
+                fragments.append(fragment)
+        return ', '.join([prompt] + fragments) if fragments else prompt
+
+    def choose_template(self, provider: str, stats: Optional[TemplateStats] = None) -> PromptTemplate:
+        """
+        Pick the template most likely to give a provider its best sprites.
+
+        Templates never scored are tried first, in order. After that the
+        choice is UCB1: the best mean sprite score plus a bonus that grows
+        for templates scored less often than the others.
+
+        Args:
+            provider: Provider name
+            stats: (runs scored, mean score) per template name, e.g. from
+                SessionCatalog.template_stats()
+
+        Returns:
+            The template to use for the next run
+        """
+        stats = stats or {}
+        templates = self.templates_for(provider)
+        for template in templates:
+            if stats.get(template.name, (0, 0.0))[0] == 0:
+                return template
+
+        total = sum(stats[template.name][0] for template in templates)
+
+        def bound(template: PromptTemplate) -> float:
+            runs, mean = stats[template.name]
+            return mean + EXPLORATION * math.sqrt(2 * math.log(total) / runs)
+
+        return max(templates, key=bound)
+
+
+PROMPT_ENGINE = PromptEngine()
+
+
+def render_prompt(prompt: str, provider: Optional[str] = None, template: Optional[str] = None) -> str:
+    """Style a prompt with the shared engine; see PromptEngine."""
+    return PROMPT_ENGINE.render(prompt, provider, template)
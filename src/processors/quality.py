@@ -0,0 +1,166 @@
+from PIL import Image
+import numpy as np
+from typing import Dict, List, Sequence
+from .pixel_art import ALPHA_THRESHOLD, _pack_rgb, background_mask
+
+
+# Distinct colors a readable sprite usually uses; fewer looks flat and more
+# looks noisy. The color score falls off in proportion outside this range
+IDEAL_COLORS = (4, 16)
+
+# Neighboring pixels closer than this in luminance belong to one flat area
+FLAT_STEP = 6
+
+# Luminance step between neighbors that reads as a crisp edge. Steps between
+# FLAT_STEP and this are blur, JPEG noise or soft gradients
+CRISP_STEP = 40
+
+# Foreground/background mean color distance that counts as full separation
+FULL_SEPARATION = 128.0
+
+# Share of the sprite the subject should cover to read as a silhouette
+IDEAL_COVERAGE = (0.15, 0.75)
+
+# Weight of each component in the overall score
+SCORE_WEIGHTS = {
+    'colors': 0.2,
+    'edges': 0.3,
+    'separation': 0.25,
+    'silhouette': 0.25
+}
+
+# Packed value marking transparent pixels; above any 24-bit color
+_TRANSPARENT = np.uint32(1 << 24)
+
+
+def score_sprite(image: Image.Image) -> Dict[str, float]:
+    """
+    Score one sprite's quality; see score_sprites.
+
+    Args:
+        image: Sprite to score
+
+    Returns:
+        Component scores and the overall 'score', each between 0 and 1
+    """
+    return score_sprites([image])[0]
+
+
+def score_sprites(images: Sequence[Image.Image]) -> List[Dict[str, float]]:
+    """
+    Score sprite quality in batch, from cheap pixel statistics.
+
+    Sprites of the same size are stacked and scored together. Components:
+
+    - colors: how close the number of distinct colors is to IDEAL_COLORS
+    - edges: share of neighbor steps that are crisp rather than mushy
+    - separation: color distance between the subject and the background
+    - silhouette: subject coverage times the share of subject pixels that
+      are not on its outline, so fragmented subjects score low
+
+    The background is the transparent pixels of RGBA sprites, otherwise
+    the border-keyed area found by background_mask. Sprites without a
+    background score 0 for separation and silhouette.
+
+    Args:
+        images: Sprites to score
+
+    Returns:
+        One dict per image, in order, with each component and the weighted
+        overall 'score', each between 0 and 1
+    """
+    by_size: Dict[tuple, List[int]] = {}
+    for index, image in enumerate(images):
+        by_size.setdefault(image.size, []).append(index)
+
+    scores: List[Dict[str, float]] = [{} for _ in images]
+    for indices in by_size.values():
+        components = _score_batch([images[i] for i in indices])
+        for row, index in enumerate(indices):
+            score = {name: round(float(values[row]), 4) for name, values in components.items()}
+            score['score'] = round(sum(SCORE_WEIGHTS[name] * score[name] for name in SCORE_WEIGHTS), 4)
+            scores[index] = score
+    return scores
+
+
+def top_scores(scores: Sequence[Dict[str, float]], k: int) -> List[int]:
+    """
+    Indices of the k best scores, best first; earlier entries win ties.
+
+    Args:
+        scores: Scores as returned by score_sprites
+        k: Number of indices to keep
+
+    Returns:
+        Up to k indices into scores
+    """
+    order = sorted(range(len(scores)), key=lambda i: (-scores[i]['score'], i))
+    return order[:k]
+
+
+def _score_batch(images: List[Image.Image]) -> Dict[str, np.ndarray]:
+    """Component scores of same-size sprites, one array entry per sprite."""
+    rgb = np.stack([np.asarray(image.convert('RGB')) for image in images])
+    background = np.stack([_background(image, pixels) for image, pixels in zip(images, rgb)])
+    foreground = ~background
+    count = len(images)
+    area = background[0].size
+
+    # Colors: count distinct packed values per sprite, transparent as one extra
+    packed = np.where(background.reshape(count, -1), _TRANSPARENT, _pack_rgb(rgb).reshape(count, -1))
+    packed.sort(axis=1)
+    distinct = 1 + np.count_nonzero(np.diff(packed, axis=1), axis=1)
+    distinct -= (packed[:, -1] == _TRANSPARENT) & _has_alpha(images)
+    low, high = IDEAL_COLORS
+    colors = np.minimum(distinct / low, 1.0) * np.minimum(high / np.maximum(distinct, 1), 1.0)
+
+    # Edges: of all neighbor steps that are not flat, the share that are crisp
+    luma = rgb @ np.array([0.299, 0.587, 0.114])
+    steps = np.concatenate([
+        np.abs(np.diff(luma, axis=1)).reshape(count, -1),
+        np.abs(np.diff(luma, axis=2)).reshape(count, -1)
+    ], axis=1)
+    changes = np.count_nonzero(steps >= FLAT_STEP, axis=1)
+    crisp = np.count_nonzero(steps >= CRISP_STEP, axis=1)
+    edges = crisp / np.maximum(changes, 1)
+
+    # Separation: distance between the mean subject and background colors
+    fg_count = foreground.reshape(count, -1).sum(axis=1)
+    bg_count = area - fg_count
+    has_both = (fg_count > 0) & (bg_count > 0)
+    fg_mean = (rgb * foreground[..., None]).sum(axis=(1, 2)) / np.maximum(fg_count, 1)[:, None]
+    bg_mean = (rgb * background[..., None]).sum(axis=(1, 2)) / np.maximum(bg_count, 1)[:, None]
+    distance = np.sqrt(((fg_mean - bg_mean) ** 2).sum(axis=1))
+    # Transparent backgrounds are perfectly separated, whatever color they hold
+    separation = np.where(_has_alpha(images), 1.0, np.minimum(distance / FULL_SEPARATION, 1.0))
+    separation = np.where(has_both, separation, 0.0)
+
+    # Silhouette: coverage in range, and few subject pixels on the outline
+    coverage = fg_count / area
+    low, high = IDEAL_COVERAGE
+    in_range = np.minimum(coverage / low, 1.0) * np.minimum((1 - coverage) / (1 - high), 1.0)
+    padded = np.pad(foreground, ((0, 0), (1, 1), (1, 1)))
+    interior = (
+        foreground & padded[:, :-2, 1:-1] & padded[:, 2:, 1:-1]
+        & padded[:, 1:-1, :-2] & padded[:, 1:-1, 2:]
+    )
+    solidity = interior.reshape(count, -1).sum(axis=1) / np.maximum(fg_count, 1)
+    silhouette = np.where(has_both, in_range * solidity, 0.0)
+
+    return {
+        'colors': colors,
+        'edges': edges,
+        'separation': separation,
+        'silhouette': silhouette
+    }
+
+
+def _background(image: Image.Image, pixels: np.ndarray) -> np.ndarray:
+    """Background mask of a sprite: transparent pixels, or the border-keyed area."""
+    if image.mode == 'RGBA':
+        return np.asarray(image.getchannel('A')) < ALPHA_THRESHOLD
+    return background_mask(pixels)
+
+
+def _has_alpha(images: List[Image.Image]) -> np.ndarray:
+    return np.array([image.mode == 'RGBA' for image in images])
@@ -0,0 +1,166 @@
+from typing import Callable, Dict, List, Sequence, Tuple
+import numpy as np
+from PIL import Image
+
+
+# Palette colors within this per-channel distance of a swap's source color
+# are swapped too, keeping their offset, so shading ramps follow the swap
+SWAP_TOLERANCE = 24
+
+PaletteTransform = Callable[[np.ndarray], np.ndarray]
+
+
+def index_sprites(sprites: Sequence[Image.Image]) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Index the pixels of a batch of sprites into one shared RGBA palette.
+
+    Pixels are packed into uint32s and deduplicated in a single np.unique
+    over the whole batch, so recoloring N sprites costs one sort of their
+    pixels plus one table lookup, whatever the number of colors.
+
+    Args:
+        sprites: Images of any mode and size
+
+    Returns:
+        Tuple of the (K, 4) uint8 palette and, per sprite, an (h, w) array
+        of palette indices
+    """
+    arrays = [np.asarray(sprite.convert('RGBA')) for sprite in sprites]
+    flat = np.concatenate([array.reshape(-1, 4) for array in arrays]).astype(np.uint32)
+    packed = (flat[:, 0] << 24) | (flat[:, 1] << 16) | (flat[:, 2] << 8) | flat[:, 3]
+    colors, inverse = np.unique(packed, return_inverse=True)
+    palette = np.stack([(colors >> shift) & 0xFF for shift in (24, 16, 8, 0)], axis=1).astype(np.uint8)
+
+    indices = []
+    offset = 0
+    for array in arrays:
+        count = array.shape[0] * array.shape[1]
+        indices.append(inverse[offset:offset + count].reshape(array.shape[:2]))
+        offset += count
+    return palette, indices
+
+
+def recolor_sprites(sprites: Sequence[Image.Image], transform: PaletteTransform) -> List[Image.Image]:
+    """
+    Recolor sprites by transforming their shared palette and remapping every pixel through it.
+
+    Only the palette's K colors go through the transform; pixels are
+    rewritten with one fancy-indexing lookup per sprite. Fully transparent
+    colors are left alone, and sprites keep their mode (RGB or RGBA).
+
+    Args:
+        sprites: Sprites to recolor
+        transform: Maps a (K, 4) uint8 RGBA palette to a new one
+
+    Returns:
+        Recolored sprites, in order
+    """
+    if not sprites:
+        return []
+    palette, indices = index_sprites(sprites)
+    remapped = transform(palette.copy()).astype(np.uint8)
+    remapped[palette[:, 3] == 0] = palette[palette[:, 3] == 0]
+
+    recolored = []
+    for sprite, index in zip(sprites, indices):
+        pixels = remapped[index]
+        if sprite.mode == 'RGBA':
+            recolored.append(Image.fromarray(pixels, 'RGBA'))
+        else:
+            recolored.append(Image.fromarray(np.ascontiguousarray(pixels[..., :3]), 'RGB'))
+    return recolored
+
+
+def swap_colors(swaps: Dict[Tuple[int, int, int], Tuple[int, int, int]], tolerance: int = SWAP_TOLERANCE) -> PaletteTransform:
+    """
+    Palette transform replacing colors near each swap's source with its target.
+
+    Args:
+        swaps: Source RGB color mapped to target RGB color
+        tolerance: Largest per-channel difference from a source color still swapped
+
+    Returns:
+        Palette transform; a color near several sources takes the nearest
+    """
+    sources = np.array(list(swaps), dtype=np.int16).reshape(-1, 3)
+    targets = np.array(list(swaps.values()), dtype=np.int16).reshape(-1, 3)
+
+    def transform(palette: np.ndarray) -> np.ndarray:
+        rgb = palette[:, :3].astype(np.int16)
+        # (K, S) largest channel difference between each color and each source
+        distance = np.abs(rgb[:, None, :] - sources[None, :, :]).max(axis=2)
+        nearest = distance.argmin(axis=1)
+        hit = distance[np.arange(len(rgb)), nearest] <= tolerance
+        shifted = rgb + targets[nearest] - sources[nearest]
+        palette[hit, :3] = np.clip(shifted[hit], 0, 255)
+        return palette
+    return transform
+
+
+def shift_hue(degrees: float) -> PaletteTransform:
+    """
+    Palette transform rotating every color's hue.
+
+    Args:
+        degrees: Hue rotation; saturation and value are kept
+
+    Returns:
+        Palette transform
+    """
+    def transform(palette: np.ndarray) -> np.ndarray:
+        # In float, so a full turn gives back the exact colors
+        rgb = palette[:, :3] / 255.0
+        value = rgb.max(axis=1)
+        chroma = value - rgb.min(axis=1)
+        saturation = np.divide(chroma, value, out=np.zeros_like(value), where=value > 0)
+        r, g, b = ((value[:, None] - rgb) / np.where(chroma > 0, chroma, 1)[:, None]).T
+        hue = np.select([rgb[:, 0] == value, rgb[:, 1] == value], [b - g, 2 + r - b], 4 + g - r) / 6
+        hue = (np.where(chroma > 0, hue, 0) + degrees / 360.0) % 1.0
+
+        sector = np.floor(hue * 6).astype(int) % 6
+        f = hue * 6 - np.floor(hue * 6)
+        p = value * (1 - saturation)
+        q = value * (1 - saturation * f)
+        t = value * (1 - saturation * (1 - f))
+        channels = [
+            np.choose(sector, [value, q, p, p, t, value]),
+            np.choose(sector, [t, value, value, q, p, p]),
+            np.choose(sector, [p, p, t, value, value, q]),
+        ]
+        palette[:, :3] = np.round(np.stack(channels, axis=1) * 255)
+        return palette
+    return transform
+
+
+def lock_to_palette(colors: np.ndarray) -> PaletteTransform:
+    """
+    Palette transform replacing every color with the nearest of a fixed set.
+
+    Args:
+        colors: (M, 3) or (M, 4) target colors; only RGB is used
+
+    Returns:
+        Palette transform
+    """
+    targets = np.asarray(colors)[:, :3].astype(np.int32)
+
+    def transform(palette: np.ndarray) -> np.ndarray:
+        rgb = palette[:, :3].astype(np.int32)
+        distance = ((rgb[:, None, :] - targets[None, :, :]) ** 2).sum(axis=2)
+        palette[:, :3] = targets[distance.argmin(axis=1)]
+        return palette
+    return transform
+
+
+def sprite_colors(sprite: Image.Image) -> np.ndarray:
+    """
+    Opaque colors of a sprite, for locking other sprites to its palette.
+
+    Args:
+        sprite: Any image
+
+    Returns:
+        (M, 3) uint8 array of distinct RGB colors of its visible pixels
+    """
+    palette, _ = index_sprites([sprite])
+    return np.unique(palette[palette[:, 3] > 0, :3], axis=0)
@@ -1,13 +1,67 @@
 #!/usr/bin/env python3
+import fcntl
+import io
 import os
 import json
 import mimetypes
+import sqlite3
+import stat
+import tempfile
+import time
+from functools import lru_cache
 from pathlib import Path
-from flask import Flask, render_template_string, send_file, abort
+from flask import Flask, Response, jsonify, render_template, request, send_file, abort, g
+from PIL import Image
+from src.processors.pixel_art import create_pixel_grid
+from src.utils.cache import LRUCache
+from src.utils import metrics
+from src.utils.catalog import SessionCatalog, parse_hex_color
 
 app = Flask(__name__)
 
-OUTPUT_DIR = "/app/output"
+OUTPUT_DIR = os.environ.get('UI_OUTPUT_DIR', "/app/output")
+
+# Rendered grid previews, keyed by (path, mtime, scale, grid)
+PREVIEW_CACHE = LRUCache(
+    max_entries=int(os.environ.get('UI_PREVIEW_CACHE_ENTRIES', 512)),
+    max_bytes=int(os.environ.get('UI_PREVIEW_CACHE_BYTES', 64 * 1024 * 1024))
+)
+PREVIEW_MAX_SCALE = 64
+PREVIEW_MAX_SIDE = 4096
+
+# Directory listings come from the SQLite catalog kept in the output directory
+CATALOG_PATH = os.environ.get('UI_CATALOG_PATH')
+CATALOG_RESCAN_INTERVAL = float(os.environ.get('UI_CATALOG_RESCAN_INTERVAL', 30))
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+_catalog = None
+# Held by the one gunicorn worker that runs the background rescan
+_rescan_lock = None
+
+
+# Pretty-printed JSON views, keyed by (path, mtime, size)
+JSON_CACHE = LRUCache(
+    max_entries=int(os.environ.get('UI_JSON_CACHE_ENTRIES', 256)),
+    max_bytes=int(os.environ.get('UI_JSON_CACHE_BYTES', 16 * 1024 * 1024))
+)
+
+# Prometheus metrics; gunicorn workers publish snapshots to a shared directory
+METRICS_DIR = os.environ.get('UI_METRICS_DIR')
+METRICS_SNAPSHOT_INTERVAL = float(os.environ.get('UI_METRICS_SNAPSHOT_INTERVAL', 2))
+UI_REQUESTS = metrics.REGISTRY.counter(
+    'pixels_ui_requests_total', 'UI requests by endpoint and status', ['endpoint', 'status'])
+UI_LATENCY = metrics.REGISTRY.histogram(
+    'pixels_ui_request_duration_seconds', 'UI request handling time', ['endpoint'])
+CACHE_HITS = metrics.REGISTRY.counter('pixels_cache_hits_total', 'UI cache hits', ['cache'])
+CACHE_MISSES = metrics.REGISTRY.counter('pixels_cache_misses_total', 'UI cache misses', ['cache'])
+CACHE_HIT_RATIO = metrics.REGISTRY.gauge('pixels_cache_hit_ratio', 'UI cache hits / lookups', ['cache'])
+CACHE_ENTRIES = metrics.REGISTRY.gauge('pixels_cache_entries', 'Entries held by a UI cache', ['cache'])
+
+for cache_name, cache in (('preview', PREVIEW_CACHE), ('json', JSON_CACHE)):
+    CACHE_HITS.labels(cache_name).set_function(lambda c=cache: c.hits)
+    CACHE_MISSES.labels(cache_name).set_function(lambda c=cache: c.misses)
+    CACHE_HIT_RATIO.labels(cache_name).set_function(lambda c=cache: c.hits / max(c.hits + c.misses, 1))
+    CACHE_ENTRIES.labels(cache_name).set_function(lambda c=cache: len(c))
 
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -50,7 +104,8 @@ HTML_TEMPLATE = """
         {% if is_file %}
             {% if is_image %}
                 <div class="text-center">
-                    <img src="{{ file_url }}" class="image-preview" alt="{{ filename }}">
+                    <img src="{{ preview_url }}" class="image-preview" alt="{{ filename }}">
+                    <div><a href="{{ file_url }}">Original</a></div>
                 </div>
             {% elif is_json %}
                 <h3>{{ filename }}</h3>
@@ -64,6 +119,17 @@ HTML_TEMPLATE = """
             {% endif %}
         {% else %}
             <!-- Directory Listing -->
+            {% if total %}
+            <div class="d-flex justify-content-between align-items-center mb-2">
+                <small class="text-muted">{{ total }} entries</small>
+                <div class="btn-group btn-group-sm">
+                    {% for key, label in [('name', 'Name'), ('date', 'Date'), ('size', 'Size')] %}
+                    <a href="?sort={{ key }}&order={{ 'desc' if sort == key and order == 'asc' else 'asc' }}&per_page={{ per_page }}"
+                       class="btn btn-outline-secondary {% if sort == key %}active{% endif %}">{{ label }}</a>
+                    {% endfor %}
+                </div>
+            </div>
+            {% endif %}
             <div class="list-group">
                 {% if path != '/' %}
                 <a href="{{ parent_url }}" class="list-group-item list-group-item-action">
@@ -85,6 +151,20 @@ HTML_TEMPLATE = """
                 {% endfor %}
             </div>
             
+            {% if pages > 1 %}
+            <nav class="mt-3">
+                <ul class="pagination">
+                    <li class="page-item {% if page <= 1 %}disabled{% endif %}">
+                        <a class="page-link" href="?page={{ page - 1 }}&sort={{ sort }}&order={{ order }}&per_page={{ per_page }}">Previous</a>
+                    </li>
+                    <li class="page-item disabled"><span class="page-link">Page {{ page }} of {{ pages }}</span></li>
+                    <li class="page-item {% if page >= pages %}disabled{% endif %}">
+                        <a class="page-link" href="?page={{ page + 1 }}&sort={{ sort }}&order={{ order }}&per_page={{ per_page }}">Next</a>
+                    </li>
+                </ul>
+            </nav>
+            {% endif %}
+            
             {% if not items and path == '/' %}
             <div class="alert alert-info mt-3">
                 No output files found. Run the image generator to create some content!
@@ -98,6 +178,9 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# Compiled once at import instead of re-parsed on every request
+BROWSER_TEMPLATE = app.jinja_env.from_string(HTML_TEMPLATE)
+
 def get_breadcrumb(path):
     """Generate breadcrumb navigation data"""
     if path == '/':
@@ -116,6 +199,93 @@ def get_breadcrumb(path):
     
     return breadcrumb
 
+def get_catalog():
+    """Return the shared session catalog, opening it on first use"""
+    global _catalog
+    if _catalog is None:
+        _catalog = SessionCatalog(os.path.realpath(OUTPUT_DIR), CATALOG_PATH)
+    return _catalog
+
+@lru_cache(maxsize=8)
+def real_output_dir(output_dir):
+    """Resolve the output directory once rather than on every request"""
+    return os.path.realpath(output_dir)
+
+def resolve_output_path(filepath):
+    """Resolve a request path to a real path inside OUTPUT_DIR, aborting otherwise"""
+    root = real_output_dir(OUTPUT_DIR)
+    full_path = os.path.join(root, filepath)
+    
+    # Security check - ensure we're within OUTPUT_DIR
+    try:
+        full_path = os.path.realpath(full_path)
+        if full_path != root and not full_path.startswith(root + os.sep):
+            abort(403)
+    except OSError:
+        abort(404)
+    
+    return full_path
+
+def stat_output_path(filepath):
+    """Resolve a request path and stat it with a single syscall, aborting if missing"""
+    full_path = resolve_output_path(filepath)
+    try:
+        return full_path, os.stat(full_path)
+    except OSError:
+        abort(404)
+
+def make_etag(file_stat, *parts):
+    """Build an ETag from a file's identity and any extra variant parts"""
+    return '-'.join(str(p) for p in (file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size) + parts)
+
+def not_modified(etag):
+    """Return a 304 response if the client already holds this ETag, else None"""
+    if etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+def load_json_view(full_path, file_stat):
+    """Return a pretty-printed JSON file, parsing it only when it changed"""
+    key = (full_path, file_stat.st_mtime_ns, file_stat.st_size)
+    
+    def parse():
+        try:
+            with open(full_path, 'r') as f:
+                return json.dumps(json.load(f), indent=2)
+        except (OSError, ValueError):
+            return 'Error reading JSON file'
+    
+    return JSON_CACHE.get_or_create(key, parse)
+
+def render_cached_page(etag, **context):
+    """Render the browser template with an ETag that clients revalidate against"""
+    response = app.make_response(render_template(BROWSER_TEMPLATE, **context))
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+def render_preview(full_path, scale, grid_width):
+    """Render a pixel-grid preview of an image file and return it as PNG bytes"""
+    try:
+        with Image.open(full_path) as image:
+            side = max(image.size)
+            # Shrink the scale (and finally drop the grid) for large sources
+            while scale > 1 and side * scale + (side + 1) * grid_width > PREVIEW_MAX_SIDE:
+                scale -= 1
+            if side * scale + (side + 1) * grid_width > PREVIEW_MAX_SIDE:
+                grid_width = 0
+            if side * scale > PREVIEW_MAX_SIDE:
+                abort(400, description='Image too large for a grid preview')
+            preview = create_pixel_grid(image, pixel_size=scale, grid_width=grid_width)
+    except (OSError, Image.DecompressionBombError):
+        abort(415)
+    
+    buffer = io.BytesIO()
+    preview.save(buffer, 'PNG')
+    return buffer.getvalue()
+
 def format_size(size):
     """Format file size in human readable format"""
     for unit in ['B', 'KB', 'MB', 'GB']:
@@ -124,6 +294,51 @@ def format_size(size):
         size /= 1024.0
     return f"{size:.1f} TB"
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or 'unmatched'
+    UI_REQUESTS.labels(endpoint, response.status_code).inc()
+    UI_LATENCY.labels(endpoint).observe(time.perf_counter() - g.request_start)
+    return response
+
+@app.route('/metrics')
+def serve_metrics():
+    """Prometheus metrics, merged across gunicorn workers"""
+    return Response(metrics.REGISTRY.exposition(METRICS_DIR), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/api/search')
+def search():
+    """Search indexed sprites; see SessionCatalog.search for the filters"""
+    success = request.args.get('success')
+    try:
+        color = request.args.get('color')
+        results = get_catalog().search(
+            text=request.args.get('q'),
+            provider=request.args.get('provider'),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            success=None if success is None else success.lower() in ('1', 'true', 'yes'),
+            color=parse_hex_color(color) if color else None,
+            color_distance=request.args.get('distance', 48.0, type=float),
+            min_share=request.args.get('min_share', 0.1, type=float),
+            limit=min(max(request.args.get('limit', 50, type=int), 1), MAX_PAGE_SIZE),
+            offset=max(request.args.get('offset', 0, type=int), 0)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except sqlite3.Error:
+        abort(500)
+    
+    for result in results:
+        result['url'] = f"/raw/{result['path']}"
+        result['preview_url'] = f"/preview/{result['path']}?scale=20&grid=1"
+    
+    return jsonify({'results': results, 'count': len(results)})
+
 @app.route('/')
 @app.route('/<path:filepath>')
 def browse(filepath=''):
@@ -132,21 +347,28 @@ def browse(filepath=''):
     if filepath:
         filepath = filepath.strip('/')
     
-    full_path = os.path.join(OUTPUT_DIR, filepath)
+    full_path, file_stat = stat_output_path(filepath)
     
-    # Security check - ensure we're within OUTPUT_DIR
-    try:
-        full_path = os.path.realpath(full_path)
-        if not full_path.startswith(os.path.realpath(OUTPUT_DIR)):
-            abort(403)
-    except:
-        abort(404)
-    
-    if not os.path.exists(full_path):
-        abort(404)
+    # File pages only change when the file does, so revalidation is a stat.
+    # Listings come from the catalog, so they are tagged with its generation,
+    # which every recorded write advances (children rewritten in place too)
+    query = request.query_string.decode('latin-1')
+    is_file = stat.S_ISREG(file_stat.st_mode)
+    if is_file:
+        etag = make_etag(file_stat, query)
+    else:
+        catalog = get_catalog()
+        rel_dir = catalog.relative(full_path)
+        # Re-lists only if the directory changed since it was indexed; an
+        # unchanged one costs the stat above and one lookup
+        catalog.rescan(rel_dir, recursive=False)
+        etag = make_etag(file_stat, catalog.generation(), query)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
     
     # Handle file display
-    if os.path.isfile(full_path):
+    if is_file:
         mime_type, _ = mimetypes.guess_type(full_path)
         is_image = mime_type and mime_type.startswith('image/')
         is_json = full_path.endswith('.json')
@@ -155,6 +377,7 @@ def browse(filepath=''):
             'is_file': True,
             'filename': os.path.basename(full_path),
             'file_url': f'/raw/{filepath}',
+            'preview_url': f'/preview/{filepath}?scale=20&grid=1',
             'path': f'/{filepath}',
             'breadcrumb': get_breadcrumb(filepath),
             'is_image': is_image,
@@ -163,44 +386,31 @@ def browse(filepath=''):
         }
         
         if is_json:
-            try:
-                with open(full_path, 'r') as f:
-                    json_data = json.load(f)
-                    context['json_content'] = json.dumps(json_data, indent=2)
-            except:
-                context['json_content'] = 'Error reading JSON file'
+            context['json_content'] = load_json_view(full_path, file_stat)
         
-        return render_template_string(HTML_TEMPLATE, **context)
+        return render_cached_page(etag, **context)
+    
+    # Handle directory listing from the catalog instead of walking the directory
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    sort = request.args.get('sort', 'name')
+    order = request.args.get('order', 'asc')
     
-    # Handle directory listing
-    items = []
     try:
-        for item in sorted(os.listdir(full_path)):
-            if item.startswith('.'):
-                continue
-                
-            item_path = os.path.join(full_path, item)
-            item_url = f'/{filepath}/{item}' if filepath else f'/{item}'
-            
-            item_data = {
-                'name': item,
-                'url': item_url,
-                'is_dir': os.path.isdir(item_path)
-            }
-            
-            if os.path.isfile(item_path):
-                try:
-                    size = os.path.getsize(item_path)
-                    item_data['size'] = format_size(size)
-                except:
-                    pass
-            
-            items.append(item_data)
-    except:
+        entries, total = catalog.list_entries(rel_dir, page, per_page, sort, order == 'desc')
+    except sqlite3.Error:
         abort(500)
     
-    # Sort directories first, then files
-    items.sort(key=lambda x: (not x['is_dir'], x['name'].lower()))
+    items = []
+    for entry in entries:
+        item_data = {
+            'name': entry['name'],
+            'url': f'/{filepath}/{entry["name"]}' if filepath else f'/{entry["name"]}',
+            'is_dir': bool(entry['is_dir'])
+        }
+        if entry['size'] is not None:
+            item_data['size'] = format_size(entry['size'])
+        items.append(item_data)
     
     parent_url = '/' + '/'.join(filepath.split('/')[:-1]) if filepath else '/'
     
@@ -209,32 +419,132 @@ def browse(filepath=''):
         'items': items,
         'path': f'/{filepath}' if filepath else '/',
         'parent_url': parent_url,
-        'breadcrumb': get_breadcrumb(filepath)
+        'breadcrumb': get_breadcrumb(filepath),
+        'page': page,
+        'pages': max((total + per_page - 1) // per_page, 1),
+        'per_page': per_page,
+        'sort': sort,
+        'order': order,
+        'total': total
     }
     
-    return render_template_string(HTML_TEMPLATE, **context)
+    return render_cached_page(etag, **context)
 
 @app.route('/raw/<path:filepath>')
 def serve_file(filepath):
     """Serve raw file content"""
-    full_path = os.path.join(OUTPUT_DIR, filepath)
+    full_path, file_stat = stat_output_path(filepath)
     
-    # Security check
-    try:
-        full_path = os.path.realpath(full_path)
-        if not full_path.startswith(os.path.realpath(OUTPUT_DIR)):
-            abort(403)
-    except:
+    if not stat.S_ISREG(file_stat.st_mode):
         abort(404)
     
-    if not os.path.exists(full_path) or not os.path.isfile(full_path):
+    # send_file answers If-None-Match / If-Modified-Since with 304 and honours Range.
+    # Paths can be rewritten in place (dedupe links, re-saves), so clients
+    # revalidate every time; an unchanged file costs a stat and a 304
+    mime_type, _ = mimetypes.guess_type(full_path)
+    response = send_file(
+        full_path,
+        mimetype=mime_type,
+        etag=make_etag(file_stat),
+        last_modified=file_stat.st_mtime,
+        conditional=True
+    )
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/preview/<path:filepath>')
+def serve_preview(filepath):
+    """Serve an enlarged pixel-grid preview, rendered on demand and cached"""
+    full_path, file_stat = stat_output_path(filepath)
+    
+    if not stat.S_ISREG(file_stat.st_mode):
         abort(404)
     
-    return send_file(full_path)
+    scale = min(max(request.args.get('scale', 20, type=int), 1), PREVIEW_MAX_SCALE)
+    grid_width = 1 if request.args.get('grid', 1, type=int) else 0
+    
+    etag = make_etag(file_stat, scale, grid_width)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    
+    # Keying on mtime means a rewritten source never serves a stale preview
+    key = (full_path, file_stat.st_mtime_ns, scale, grid_width)
+    data = PREVIEW_CACHE.get(key)
+    if data is None:
+        data = render_preview(full_path, scale, grid_width)
+        PREVIEW_CACHE.put(key, data)
+    
+    # Revalidated like /raw, since the source may be replaced at the same path
+    response = send_file(io.BytesIO(data), mimetype='image/png', etag=etag)
+    response.cache_control.no_cache = True
+    return response
+
+def claim_catalog_rescan(lock_dir):
+    """
+    Take the server-wide rescan lock, returning True if this process got it.
+    
+    The lock is held until the process exits, so when the rescanning worker
+    dies the next worker gunicorn starts in its place picks the job up.
+    """
+    global _rescan_lock
+    if _rescan_lock is not None:
+        return True
+    lock = open(os.path.join(lock_dir, 'catalog-rescan.lock'), 'w')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return False
+    _rescan_lock = lock
+    return True
+
+def start_worker_services():
+    """Start the per-worker metrics writer and, in one worker only, the catalog rescan"""
+    metrics.start_snapshot_writer(METRICS_DIR, METRICS_SNAPSHOT_INTERVAL)
+    if claim_catalog_rescan(METRICS_DIR):
+        get_catalog().start_background_rescan(CATALOG_RESCAN_INTERVAL)
+
+def run_production(port, workers, threads):
+    """
+    Serve the app with gunicorn: pre-forked workers, each with a thread pool.
+    
+    gunicorn hands files returned by send_file to the kernel via sendfile(2),
+    so image bytes never pass through Python. The catalog rescan runs in
+    whichever worker holds the rescan lock, never in the master, whose threads
+    would not survive the fork. Each worker writes its metrics to METRICS_DIR
+    so whichever worker answers /metrics can report all of them.
+    """
+    from gunicorn.app.base import BaseApplication
+    
+    global METRICS_DIR
+    if METRICS_DIR is None:
+        METRICS_DIR = tempfile.mkdtemp(prefix='16pixels-metrics-')
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    # Counters from a previous server run would otherwise be summed in
+    for stale in Path(METRICS_DIR).glob('*.json'):
+        stale.unlink()
+    
+    class StandaloneApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'0.0.0.0:{port}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('keepalive', 5)
+            self.cfg.set('accesslog', os.environ.get('UI_ACCESS_LOG'))
+            self.cfg.set('post_worker_init', lambda worker: start_worker_services())
+            self.cfg.set('worker_exit', lambda server, worker: metrics.REGISTRY.write_snapshot(METRICS_DIR))
+        
+        def load(self):
+            return app
+    
+    StandaloneApplication().run()
 
 if __name__ == '__main__':
     port = int(os.environ.get('UI_PORT', 8080))
-    print(f"Starting 16-Pixels UI server on port {port}")
+    server = os.environ.get('UI_SERVER', 'production')
+    print(f"Starting 16-Pixels UI server on port {port} ({server} mode)")
     print(f"Output directory: {OUTPUT_DIR}")
     
     # Check if output directory exists
@@ -242,4 +552,13 @@ if __name__ == '__main__':
         os.makedirs(OUTPUT_DIR)
         print(f"Created output directory: {OUTPUT_DIR}")
     
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    if server == 'dev':
+        # Keep the catalog in sync with changes made outside the generator
+        get_catalog().start_background_rescan(CATALOG_RESCAN_INTERVAL)
+        app.run(host='0.0.0.0', port=port, debug=False)
+    else:
+        run_production(
+            port,
+            workers=int(os.environ.get('UI_WORKERS', 2 * (os.cpu_count() or 1) + 1)),
+            threads=int(os.environ.get('UI_THREADS', 4))
+        )
@@ -0,0 +1,646 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+from PIL import Image
+from ..processors.pixel_art import analysis_sample, analyze_pixel_art
+from .dedupe import hash_to_hex, sprite_hash
+
+
+CATALOG_FILENAME = ".catalog.db"
+
+# Bumped whenever the schema changes; older catalogs are rebuilt by a rescan
+SCHEMA_VERSION = 5
+
+SORT_COLUMNS = {
+    'name': 'name COLLATE NOCASE',
+    'date': 'mtime',
+    'size': 'size',
+}
+
+VARIATION_PATTERN = re.compile(r'^variation_(\d+)\.png$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    size INTEGER,
+    mtime REAL NOT NULL,
+    PRIMARY KEY (parent, name)
+);
+CREATE INDEX IF NOT EXISTS idx_entries_mtime ON entries (parent, mtime);
+
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    name TEXT PRIMARY KEY,
+    created TEXT,
+    query TEXT,
+    image_description TEXT,
+    total_images INTEGER NOT NULL DEFAULT 0,
+    metadata TEXT
+);
+
+CREATE TABLE IF NOT EXISTS providers (
+    session TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    variations_requested INTEGER,
+    variations_generated INTEGER,
+    success INTEGER,
+    errors TEXT,
+    template TEXT,
+    scored INTEGER NOT NULL DEFAULT 0,
+    score_sum REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (session, provider)
+);
+
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    session TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    variation INTEGER NOT NULL,
+    size INTEGER,
+    mtime REAL,
+    unique_colors INTEGER,
+    phash TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_images_session ON images (session, provider);
+CREATE INDEX IF NOT EXISTS idx_images_provider ON images (provider);
+
+CREATE TABLE IF NOT EXISTS image_colors (
+    path TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    r INTEGER NOT NULL,
+    g INTEGER NOT NULL,
+    b INTEGER NOT NULL,
+    share REAL NOT NULL,
+    PRIMARY KEY (path, rank)
+);
+CREATE INDEX IF NOT EXISTS idx_image_colors_rgb ON image_colors (r, g, b);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS sessions_fts USING fts5(name UNINDEXED, query, image_description);
+
+-- Bumped by every change to the index, so listings can be revalidated
+-- without touching the filesystem
+CREATE TABLE IF NOT EXISTS generation (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO generation (id, value) VALUES (0, 0);
+"""
+
+
+def parse_hex_color(value: str) -> Tuple[int, int, int]:
+    """Parse '#ff0000', 'ff0000' or '#f00' into an RGB tuple."""
+    digits = value.strip().lstrip('#')
+    if len(digits) == 3:
+        digits = ''.join(c * 2 for c in digits)
+    if len(digits) != 6:
+        raise ValueError(f"Invalid hex color: {value}")
+    return tuple(int(digits[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def _fts_query(text: str) -> str:
+    """Quote every word so user input is matched literally (all words required)."""
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+class SessionCatalog:
+    """
+    SQLite-backed index of the output tree.
+
+    Keeps one row per directory entry plus session, provider and image
+    records so listings and summaries never have to walk the filesystem.
+    Writers (OutputManager) record changes as they happen; a rescan picks
+    up anything that changed outside the application.
+    """
+
+    def __init__(self, base_dir: Union[str, Path], db_path: Optional[Union[str, Path]] = None):
+        """
+        Initialize the catalog.
+
+        Args:
+            base_dir: Root of the output tree being indexed
+            db_path: Optional database location (defaults to base_dir/.catalog.db)
+        """
+        self.base_dir = Path(base_dir)
+        self.db_path = Path(db_path) if db_path else self.base_dir / CATALOG_FILENAME
+        self.logger = logging.getLogger(__name__)
+        self._local = threading.local()
+        self._rescan_thread: Optional[threading.Thread] = None
+        self._stop_rescan = threading.Event()
+
+        # Use a throwaway connection so the constructing thread (for example a
+        # pre-fork server master) never holds one of its own
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            # Checked and migrated in one write transaction, so a process that
+            # read the old version can't drop tables another has just created
+            # (executescript would commit in between)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                    self._drop_all(conn)
+                    for statement in SCHEMA.split(';'):
+                        if statement.strip():
+                            conn.execute(statement)
+                    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _drop_all(conn: sqlite3.Connection) -> None:
+        """Drop every table of an outdated catalog; the next rescan rebuilds it."""
+        tables = [
+            row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+                "AND name NOT LIKE 'sessions_fts_%'"
+            )
+        ]
+        for table in tables:
+            conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection) -> None:
+        """Advance the generation inside the transaction that changed the index."""
+        conn.execute("UPDATE generation SET value = value + 1 WHERE id = 0")
+
+    def generation(self) -> int:
+        """
+        Counter advanced by every write to the index, from any process.
+
+        Returns:
+            Current generation; equal values mean nothing was recorded in between
+        """
+        row = self._connect().execute("SELECT value FROM generation WHERE id = 0").fetchone()
+        return row[0] if row else 0
+
+    def relative(self, path: Union[str, Path]) -> str:
+        """Return path relative to the output root, '/'-separated ('' for the root)."""
+        rel = os.path.relpath(Path(path), self.base_dir)
+        return '' if rel == '.' else rel.replace(os.sep, '/')
+
+    def record_path(self, path: Union[str, Path], analysis: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Record a file or directory (and any missing parents) after it was written.
+
+        Args:
+            path: Path that was written
+            analysis: Optional analyze_pixel_art() result for a generated image,
+                stored as its searchable color features (plus a 'phash' hex
+                sprite hash, if present)
+        """
+        rel = self.relative(path)
+        if not rel or rel.startswith('..'):
+            return
+
+        with self._connect() as conn:
+            parts = rel.split('/')
+            for depth in range(1, len(parts) + 1):
+                entry_rel = '/'.join(parts[:depth])
+                self._upsert_entry(conn, entry_rel, self.base_dir / entry_rel)
+            if analysis is not None:
+                self._store_features(conn, rel, analysis)
+            self._bump(conn)
+
+    def record_metadata(self, session_path: Union[str, Path], metadata: Dict[str, Any]) -> None:
+        """Record a session's metadata.json contents."""
+        session = self.relative(session_path)
+        classification = metadata.get('classification') or {}
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions "
+                "(name, created, query, image_description, total_images, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    session,
+                    metadata.get('timestamp'),
+                    metadata.get('query'),
+                    classification.get('image_description'),
+                    metadata.get('total_images_generated', 0),
+                    json.dumps(metadata),
+                )
+            )
+            conn.execute("DELETE FROM sessions_fts WHERE name = ?", (session,))
+            conn.execute(
+                "INSERT INTO sessions_fts (name, query, image_description) VALUES (?, ?, ?)",
+                (session, metadata.get('query') or '', classification.get('image_description') or '')
+            )
+            # Sprite quality scores per provider, for template_stats()
+            scores: Dict[str, List[float]] = {}
+            for entry in metadata.get('quality') or []:
+                scores.setdefault(entry.get('provider'), []).append(entry.get('score', 0.0))
+            conn.execute("DELETE FROM providers WHERE session = ?", (session,))
+            conn.executemany(
+                "INSERT INTO providers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        session,
+                        provider,
+                        info.get('variations_requested'),
+                        info.get('variations_generated'),
+                        int(bool(info.get('success'))),
+                        json.dumps(info.get('errors', [])),
+                        info.get('template'),
+                        len(scores.get(provider, [])),
+                        sum(scores.get(provider, [])),
+                    )
+                    for provider, info in metadata.get('providers', {}).items()
+                ]
+            )
+            self._bump(conn)
+
+    def _upsert_entry(self, conn: sqlite3.Connection, rel: str, full_path: Path) -> None:
+        """Insert or refresh a single entry from a stat of the filesystem."""
+        try:
+            stat = full_path.stat()
+        except OSError:
+            self._delete_entry(conn, rel)
+            return
+
+        parent, _, name = rel.rpartition('/')
+        is_dir = full_path.is_dir()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (parent, name, is_dir, size, mtime) VALUES (?, ?, ?, ?, ?)",
+            (parent, name, int(is_dir), None if is_dir else stat.st_size, stat.st_mtime)
+        )
+
+        # session/provider/variation_N.png is a generated image
+        parts = rel.split('/')
+        match = VARIATION_PATTERN.match(name)
+        if not is_dir and match and len(parts) == 3:
+            # Keep computed features unless the file itself changed
+            conn.execute(
+                "INSERT INTO images (path, session, provider, variation, size, mtime) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET "
+                "unique_colors = CASE WHEN images.size = excluded.size AND images.mtime = excluded.mtime "
+                "THEN images.unique_colors END, "
+                "phash = CASE WHEN images.size = excluded.size AND images.mtime = excluded.mtime "
+                "THEN images.phash END, "
+                "size = excluded.size, mtime = excluded.mtime",
+                (rel, parts[0], parts[1], int(match.group(1)), stat.st_size, stat.st_mtime)
+            )
+
+    def _store_features(self, conn: sqlite3.Connection, rel: str, analysis: Dict[str, Any]) -> None:
+        """Store an image's dominant colors, their share of the pixels and its perceptual hash."""
+        # Shares are of the sprite itself, not its transparent background
+        total = (analysis['total_pixels'] - analysis.get('transparent_pixels', 0)) or 1
+        conn.execute(
+            "UPDATE images SET unique_colors = ?, phash = ? WHERE path = ?",
+            (analysis['unique_colors'], analysis.get('phash'), rel)
+        )
+        conn.execute("DELETE FROM image_colors WHERE path = ?", (rel,))
+        conn.executemany(
+            "INSERT INTO image_colors (path, rank, r, g, b, share) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (rel, rank, int(color[0]), int(color[1]), int(color[2]), count / total)
+                for rank, (color, count) in enumerate(
+                    zip(analysis['dominant_colors'], analysis['color_counts'])
+                )
+            ]
+        )
+
+    def _index_missing_features(self, conn: sqlite3.Connection, rel_dir: str) -> None:
+        """Analyze images in a directory that have no color features yet."""
+        rows = conn.execute(
+            "SELECT path FROM images WHERE unique_colors IS NULL AND substr(path, 1, ?) = ?",
+            (len(rel_dir) + 1, rel_dir + '/')
+        ).fetchall()
+        for row in rows:
+            try:
+                with Image.open(self.base_dir / row['path']) as image:
+                    has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+                    sample = analysis_sample(image)
+                    analysis = analyze_pixel_art(sample.convert('RGBA' if has_alpha else 'RGB'))
+                    analysis['phash'] = hash_to_hex(sprite_hash(sample))
+            except OSError as e:
+                self.logger.warning(f"Cannot analyze {row['path']}: {e}")
+                continue
+            self._store_features(conn, row['path'], analysis)
+
+    def _delete_entry(self, conn: sqlite3.Connection, rel: str) -> None:
+        """Remove an entry and everything indexed beneath it."""
+        parent, _, name = rel.rpartition('/')
+        prefix = (len(rel) + 1, rel + '/')
+        conn.execute("DELETE FROM entries WHERE parent = ? AND name = ?", (parent, name))
+        conn.execute("DELETE FROM entries WHERE parent = ? OR substr(parent, 1, ?) = ?", (rel, *prefix))
+        conn.execute("DELETE FROM dirs WHERE path = ? OR substr(path, 1, ?) = ?", (rel, *prefix))
+        conn.execute("DELETE FROM images WHERE path = ? OR substr(path, 1, ?) = ?", (rel, *prefix))
+        conn.execute("DELETE FROM image_colors WHERE path = ? OR substr(path, 1, ?) = ?", (rel, *prefix))
+        if '/' not in rel:
+            conn.execute("DELETE FROM sessions WHERE name = ?", (rel,))
+            conn.execute("DELETE FROM sessions_fts WHERE name = ?", (rel,))
+            conn.execute("DELETE FROM providers WHERE session = ?", (rel,))
+
+    def is_indexed(self, rel_dir: str) -> bool:
+        """Check whether a directory has been scanned at least once."""
+        row = self._connect().execute("SELECT 1 FROM dirs WHERE path = ?", (rel_dir,)).fetchone()
+        return row is not None
+
+    def rescan(self, rel_dir: str = '', recursive: bool = True) -> int:
+        """
+        Bring the index in line with the filesystem.
+
+        Only directories whose mtime changed since the last scan are re-listed;
+        unchanged directories cost a single stat.
+
+        Args:
+            rel_dir: Directory to scan, relative to the output root
+            recursive: Whether to descend into subdirectories
+
+        Returns:
+            Number of directories that were re-listed
+        """
+        full_dir = self.base_dir / rel_dir if rel_dir else self.base_dir
+        try:
+            mtime_ns = full_dir.stat().st_mtime_ns
+        except OSError:
+            if rel_dir:
+                with self._connect() as conn:
+                    self._delete_entry(conn, rel_dir)
+                    self._bump(conn)
+            return 0
+
+        conn = self._connect()
+        row = conn.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (rel_dir,)).fetchone()
+        relisted = 0
+
+        if row is None or row['mtime_ns'] != mtime_ns:
+            self._relist(conn, rel_dir, full_dir, mtime_ns)
+            relisted += 1
+
+        if recursive:
+            subdirs = conn.execute(
+                "SELECT name FROM entries WHERE parent = ? AND is_dir = 1", (rel_dir,)
+            ).fetchall()
+            for subdir in subdirs:
+                child = f"{rel_dir}/{subdir['name']}" if rel_dir else subdir['name']
+                relisted += self.rescan(child, recursive=True)
+
+        return relisted
+
+    def _relist(self, conn: sqlite3.Connection, rel_dir: str, full_dir: Path, mtime_ns: int) -> None:
+        """Replace the entries of one directory with a fresh listing."""
+        try:
+            with os.scandir(full_dir) as it:
+                children = [entry for entry in it if not entry.name.startswith('.')]
+        except OSError as e:
+            self.logger.warning(f"Catalog rescan failed for {full_dir}: {e}")
+            return
+
+        with conn:
+            known = {
+                row['name'] for row in
+                conn.execute("SELECT name FROM entries WHERE parent = ?", (rel_dir,))
+            }
+            present = set()
+            for entry in children:
+                rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                present.add(entry.name)
+                self._upsert_entry(conn, rel, Path(entry.path))
+                if entry.name == 'metadata.json' and '/' not in rel_dir and rel_dir:
+                    self._load_metadata_file(conn, rel_dir, Path(entry.path))
+
+            for name in known - present:
+                self._delete_entry(conn, f"{rel_dir}/{name}" if rel_dir else name)
+
+            if rel_dir.count('/') == 1:
+                self._index_missing_features(conn, rel_dir)
+
+            conn.execute("INSERT OR REPLACE INTO dirs (path, mtime_ns) VALUES (?, ?)", (rel_dir, mtime_ns))
+            self._bump(conn)
+
+    def _load_metadata_file(self, conn: sqlite3.Connection, session: str, path: Path) -> None:
+        """Index a metadata.json that was written outside the application."""
+        try:
+            with open(path, 'r') as f:
+                metadata = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Skipping unreadable metadata {path}: {e}")
+            return
+        self.record_metadata(self.base_dir / session, metadata)
+
+    def start_background_rescan(self, interval: float = 30.0) -> threading.Thread:
+        """Rescan the whole tree every `interval` seconds on a daemon thread."""
+        if self._rescan_thread and self._rescan_thread.is_alive():
+            return self._rescan_thread
+
+        def loop():
+            while not self._stop_rescan.is_set():
+                try:
+                    self.rescan()
+                except sqlite3.Error as e:
+                    self.logger.warning(f"Background catalog rescan failed: {e}")
+                self._stop_rescan.wait(interval)
+
+        self._stop_rescan.clear()
+        self._rescan_thread = threading.Thread(target=loop, name='catalog-rescan', daemon=True)
+        self._rescan_thread.start()
+        return self._rescan_thread
+
+    def stop_background_rescan(self) -> None:
+        """Stop the background rescan thread."""
+        self._stop_rescan.set()
+
+    def list_entries(
+        self,
+        rel_dir: str = '',
+        page: int = 1,
+        per_page: int = 100,
+        sort: str = 'name',
+        descending: bool = False
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        List the entries of a directory, directories first.
+
+        Args:
+            rel_dir: Directory relative to the output root
+            page: 1-based page number
+            per_page: Entries per page
+            sort: One of 'name', 'date' or 'size'
+            descending: Reverse the sort order
+
+        Returns:
+            Tuple of (entries on the page, total entry count)
+        """
+        column = SORT_COLUMNS.get(sort, SORT_COLUMNS['name'])
+        direction = 'DESC' if descending else 'ASC'
+        conn = self._connect()
+
+        total = conn.execute("SELECT COUNT(*) FROM entries WHERE parent = ?", (rel_dir,)).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT name, is_dir, size, mtime FROM entries WHERE parent = ? "
+            f"ORDER BY is_dir DESC, {column} {direction}, name ASC LIMIT ? OFFSET ?",
+            (rel_dir, per_page, (max(page, 1) - 1) * per_page)
+        ).fetchall()
+
+        return [dict(row) for row in rows], total
+
+    def provider_image_counts(self, session: str) -> Dict[str, int]:
+        """Count indexed images per provider for a session."""
+        rows = self._connect().execute(
+            "SELECT provider, COUNT(*) AS images FROM images WHERE session = ? "
+            "GROUP BY provider ORDER BY provider",
+            (session,)
+        ).fetchall()
+        return {row['provider']: row['images'] for row in rows}
+
+    def template_stats(self) -> Dict[str, Dict[str, Tuple[int, float]]]:
+        """
+        Sprite quality per prompt template, across all sessions.
+
+        Returns:
+            provider -> template -> (sprites scored, mean score)
+        """
+        rows = self._connect().execute(
+            "SELECT provider, template, SUM(scored), SUM(score_sum) FROM providers "
+            "WHERE template IS NOT NULL AND scored > 0 GROUP BY provider, template"
+        ).fetchall()
+        stats: Dict[str, Dict[str, Tuple[int, float]]] = {}
+        for provider, template, scored, score_sum in rows:
+            stats.setdefault(provider, {})[template] = (scored, score_sum / scored)
+        return stats
+
+    def image_hashes(self, session: Optional[str] = None) -> List[Tuple[str, int]]:
+        """
+        Perceptual hashes of indexed images, oldest session first.
+
+        Args:
+            session: Optional session to restrict the listing to
+
+        Returns:
+            (relative path, hash) pairs for every image with a hash
+        """
+        sql = "SELECT path, phash FROM images WHERE phash IS NOT NULL"
+        params: List[Any] = []
+        if session is not None:
+            sql += " AND session = ?"
+            params.append(session)
+        rows = self._connect().execute(sql + " ORDER BY session, provider, variation", params).fetchall()
+        return [(row['path'], int(row['phash'], 16)) for row in rows]
+
+    def get_session(self, session: str) -> Optional[Dict[str, Any]]:
+        """Return the indexed record for a session, if any."""
+        row = self._connect().execute("SELECT * FROM sessions WHERE name = ?", (session,)).fetchone()
+        return dict(row) if row else None
+
+    def search(
+        self,
+        text: Optional[str] = None,
+        provider: Optional[str] = None,
+        since: Optional[Union[str, datetime]] = None,
+        until: Optional[Union[str, datetime]] = None,
+        success: Optional[bool] = None,
+        color: Optional[Tuple[int, int, int]] = None,
+        color_distance: float = 48.0,
+        min_share: float = 0.1,
+        limit: int = 50,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Search generated sprites using the indexed metadata and color features.
+
+        Args:
+            text: Words that must all appear in the session query or image description
+            provider: Only images from this provider
+            since: Only sessions created at or after this time
+            until: Only sessions created before this time
+            success: Only providers that did (True) or did not (False) finish without errors
+            color: RGB color one of the sprite's dominant colors must be near
+            color_distance: Maximum Euclidean RGB distance for a color match
+            min_share: Minimum share of pixels a dominant color must cover to count
+            limit: Maximum number of results
+            offset: Number of results to skip
+
+        Returns:
+            Matching images with their session details, closest color first when
+            a color is given, otherwise newest session first
+        """
+        columns = [
+            "i.path", "i.session", "i.provider", "i.variation", "i.unique_colors",
+            "s.query", "s.image_description", "s.created", "p.success"
+        ]
+        where = []
+        params: List[Any] = []
+        select_params: List[Any] = []
+        order = "i.session DESC, i.provider, i.variation"
+
+        if text and text.strip():
+            where.append("i.session IN (SELECT name FROM sessions_fts WHERE sessions_fts MATCH ?)")
+            params.append(_fts_query(text))
+        if provider:
+            where.append("i.provider = ?")
+            params.append(provider)
+        if since:
+            where.append("s.created >= ?")
+            params.append(since.isoformat() if isinstance(since, datetime) else since)
+        if until:
+            where.append("s.created < ?")
+            params.append(until.isoformat() if isinstance(until, datetime) else until)
+        if success is not None:
+            where.append("p.success = ?")
+            params.append(int(success))
+        if color is not None:
+            r, g, b = color
+            d = int(color_distance)
+            # The bounding box lets SQLite use the RGB index before the exact distance test
+            distance = "((c.r - ?) * (c.r - ?) + (c.g - ?) * (c.g - ?) + (c.b - ?) * (c.b - ?))"
+            match = (
+                f"FROM image_colors c WHERE c.path = i.path AND c.share >= ? "
+                f"AND c.r BETWEEN ? AND ? AND c.g BETWEEN ? AND ? AND c.b BETWEEN ? AND ? "
+                f"AND {distance} <= ?"
+            )
+            color_params = [
+                min_share, r - d, r + d, g - d, g + d, b - d, b + d,
+                r, r, g, g, b, b, color_distance * color_distance
+            ]
+            columns.append(f"(SELECT MIN({distance}) {match}) AS color_distance")
+            select_params = [r, r, g, g, b, b] + color_params
+            where.append(f"EXISTS (SELECT 1 {match})")
+            params.extend(color_params)
+            order = "color_distance, i.session DESC"
+
+        sql = (
+            f"SELECT {', '.join(columns)} FROM images i "
+            f"LEFT JOIN sessions s ON s.name = i.session "
+            f"LEFT JOIN providers p ON p.session = i.session AND p.provider = i.provider "
+            f"{'WHERE ' + ' AND '.join(where) if where else ''} "
+            f"ORDER BY {order} LIMIT ? OFFSET ?"
+        )
+        rows = self._connect().execute(sql, select_params + params + [limit, offset]).fetchall()
+
+        results = []
+        for row in rows:
+            result = dict(row)
+            if result.get('color_distance') is not None:
+                result['color_distance'] = round(result['color_distance'] ** 0.5, 1)
+            if result['success'] is not None:
+                result['success'] = bool(result['success'])
+            results.append(result)
+        return results
@@ -0,0 +1,219 @@
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+
+
+# aHash and dHash are HASH_SIZE x HASH_SIZE grids of comparisons;
+# sprite_hash concatenates the two
+HASH_SIZE = 8
+HASH_BITS = 2 * HASH_SIZE * HASH_SIZE
+
+# dHash only sets a bit for a clear step in brightness. Pixel art is mostly
+# flat areas whose neighbors differ by noise alone, which flips plain dHash
+# bits between otherwise identical sprites
+DHASH_MARGIN = 8
+
+# Sprites at most this many differing bits apart count as near-duplicates.
+# On sprites of random scenes, unrelated pairs were 15+ bits apart and noisy,
+# shifted or re-lit copies of one scene mostly within 10
+DUPLICATE_DISTANCE = 10
+
+# Transparent pixels are hashed as this gray so backgrounds compare equal
+TRANSPARENT_GRAY = 128
+
+
+def _grayscale(image: Image.Image, width: int, height: int) -> np.ndarray:
+    """Area-averaged luminance at the hash resolution, with alpha flattened."""
+    if 'A' in image.getbands() or 'transparency' in image.info:
+        background = Image.new('RGBA', image.size, (TRANSPARENT_GRAY,) * 3 + (255,))
+        image = Image.alpha_composite(background, image.convert('RGBA'))
+    gray = image.convert('L').resize((width, height), Image.Resampling.BOX)
+    return np.asarray(gray, dtype=np.int16)
+
+
+def _to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+def dhash(image: Image.Image) -> int:
+    """
+    Difference hash: one bit per pixel, set where it is clearly brighter than its left neighbor.
+
+    Args:
+        image: Sprite or any PIL image
+
+    Returns:
+        64-bit hash as an unsigned integer
+    """
+    gray = _grayscale(image, HASH_SIZE + 1, HASH_SIZE)
+    return _to_int(gray[:, 1:] - gray[:, :-1] > DHASH_MARGIN)
+
+
+def ahash(image: Image.Image) -> int:
+    """
+    Average hash: one bit per pixel, set where it is brighter than the mean.
+
+    Args:
+        image: Sprite or any PIL image
+
+    Returns:
+        64-bit hash as an unsigned integer
+    """
+    gray = _grayscale(image, HASH_SIZE, HASH_SIZE)
+    return _to_int(gray > gray.mean())
+
+
+def sprite_hash(image: Image.Image) -> int:
+    """
+    Perceptual hash used for deduplication: aHash followed by dHash.
+
+    aHash captures the overall light/dark layout and dHash the edges; either
+    alone confuses some unrelated sprites or misses some near-copies.
+
+    Args:
+        image: Sprite or any PIL image
+
+    Returns:
+        128-bit hash as an unsigned integer
+    """
+    return (ahash(image) << (HASH_SIZE * HASH_SIZE)) | dhash(image)
+
+
+def hash_to_hex(value: int) -> str:
+    """Fixed-width hex form of a sprite hash, as stored in the catalog."""
+    return f"{value:0{HASH_BITS // 4}x}"
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return (a ^ b).bit_count()
+
+
+class HashIndex:
+    """
+    Multi-index hashing over sprite hashes for Hamming-distance range queries.
+
+    Hashes are split into max_distance + 1 chunks, each with its own exact
+    lookup table. Two hashes at most max_distance bits apart must agree on
+    at least one chunk (pigeonhole), so a query only compares against the
+    entries sharing a chunk with it. Perceptual hashes sit around HASH_BITS/2
+    bits apart, which makes metric trees (BK-trees) visit nearly every node,
+    whereas chunk lookups stay proportional to the number of real candidates.
+    From HASH_BITS on there are not enough bits for the chunks, and every
+    hash matches anyway, so searches fall back to a linear scan.
+    """
+
+    def __init__(self, items: Iterable[Tuple[int, Any]] = (), max_distance: int = DUPLICATE_DISTANCE):
+        """
+        Initialize the index.
+
+        Args:
+            items: Optional (hash, item) pairs to add
+            max_distance: Largest distance searches can use
+        """
+        self.max_distance = max_distance
+        # (shift, mask) of each chunk; none means a linear scan
+        self._chunks: List[Tuple[int, int]] = []
+        if max_distance < HASH_BITS:
+            chunks = max_distance + 1
+            bounds = [HASH_BITS * i // chunks for i in range(chunks + 1)]
+            self._chunks = [(start, (1 << (end - start)) - 1) for start, end in zip(bounds, bounds[1:])]
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in self._chunks]
+        self._hashes: List[int] = []
+        self._items: List[Any] = []
+        for value, item in items:
+            self.add(value, item)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, value: int, item: Any) -> None:
+        """Index `item` under hash `value`."""
+        index = len(self._items)
+        self._hashes.append(value)
+        self._items.append(item)
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            table.setdefault((value >> shift) & mask, []).append(index)
+
+    def search(self, value: int, max_distance: Optional[int] = None) -> List[Tuple[int, Any]]:
+        """
+        Find every indexed item within `max_distance` bits of a hash.
+
+        Args:
+            value: Hash to look up
+            max_distance: Search radius, at most the index's max_distance
+
+        Returns:
+            (distance, item) pairs, closest first, oldest first on ties
+        """
+        if max_distance is None:
+            max_distance = self.max_distance
+        if max_distance > self.max_distance:
+            raise ValueError(f"Index built for distances up to {self.max_distance}, not {max_distance}")
+
+        if not self._chunks:
+            candidates = range(len(self._hashes))
+        else:
+            candidates = set()
+            for table, (shift, mask) in zip(self._tables, self._chunks):
+                candidates.update(table.get((value >> shift) & mask, ()))
+
+        matches = []
+        for index in sorted(candidates):
+            distance = hamming_distance(value, self._hashes[index])
+            if distance <= max_distance:
+                matches.append((distance, index))
+        matches.sort()
+        return [(distance, self._items[index]) for distance, index in matches]
+
+    def nearest(self, value: int, max_distance: Optional[int] = None) -> Optional[Tuple[int, Any]]:
+        """Closest item within `max_distance` bits (oldest on ties), or None."""
+        matches = self.search(value, max_distance)
+        return matches[0] if matches else None
+
+
+def find_duplicates(
+    hashes: Iterable[Tuple[Any, int]],
+    max_distance: int = DUPLICATE_DISTANCE
+) -> Dict[Any, Tuple[Any, int]]:
+    """
+    Group items by perceptual similarity, keeping the first of each group.
+
+    Args:
+        hashes: (item, hash) pairs in priority order, e.g. oldest first
+        max_distance: Largest Hamming distance counted as a duplicate
+
+    Returns:
+        Mapping of each duplicate item to (the item it duplicates, distance)
+    """
+    index = HashIndex(max_distance=max_distance)
+    duplicates = {}
+    for item, value in hashes:
+        match = index.nearest(value)
+        if match is None:
+            index.add(value, item)
+        else:
+            distance, original = match
+            duplicates[item] = (original, distance)
+    return duplicates
+
+
+def replace_with_link(path: Path, original: Path) -> bool:
+    """
+    Replace a file with a hard link to another, atomically.
+
+    Args:
+        path: Duplicate file to replace (need not exist yet)
+        original: File the duplicate should share storage with
+
+    Returns:
+        True if linked, False if the two are already the same file
+    """
+    if path.exists() and os.path.samefile(path, original):
+        return False
+    temp_path = path.with_name(f".{path.name}.link")
+    os.link(original, temp_path)
+    os.replace(temp_path, path)
+    return True
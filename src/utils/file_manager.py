@@ -1,27 +1,116 @@
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from PIL import Image
 import json
 import logging
+import sqlite3
+from .catalog import SessionCatalog, VARIATION_PATTERN
+from .dedupe import DUPLICATE_DISTANCE, HashIndex, hash_to_hex, replace_with_link, sprite_hash
+from .metrics import DISK_WRITE_BYTES, DISK_WRITE_LATENCY
+from .tracing import traced
+from ..processors.pixel_art import analysis_sample, analyze_pixel_art
+
+
+IMAGE_WRITE_LATENCY = DISK_WRITE_LATENCY.labels('image')
+IMAGE_WRITE_BYTES = DISK_WRITE_BYTES.labels('image')
+METADATA_WRITE_LATENCY = DISK_WRITE_LATENCY.labels('metadata')
+METADATA_WRITE_BYTES = DISK_WRITE_BYTES.labels('metadata')
+
+# What save_image does with a near-duplicate of an existing sprite
+DEDUPE_MODES = ('skip', 'link')
+
+
+class DuplicateImageError(Exception):
+    """Raised by save_image when a near-duplicate is skipped instead of stored."""
+    
+    def __init__(self, path: Path, original: Path, distance: int):
+        super().__init__(f"{path.name} is a near-duplicate of {original} ({distance} bits apart)")
+        self.path = path
+        self.original = original
+        self.distance = distance
 
 
 class OutputManager:
-    def __init__(self, base_dir: str = "./output"):
+    def __init__(
+        self,
+        base_dir: str = "./output",
+        catalog: Optional[SessionCatalog] = None,
+        dedupe: Optional[str] = None,
+        dedupe_distance: int = DUPLICATE_DISTANCE
+    ):
+        """
+        Initialize the output manager.
+        
+        Args:
+            base_dir: Root of the output tree
+            catalog: Optional catalog to record writes in (defaults to one in base_dir)
+            dedupe: None to store every sprite, 'skip' to drop near-duplicates of
+                existing sprites or 'link' to hard-link them to the existing file
+            dedupe_distance: Largest sprite hash distance counted as a duplicate
+        """
+        if dedupe is not None and dedupe not in DEDUPE_MODES:
+            raise ValueError(f"Unknown dedupe mode: {dedupe}")
         self.base_dir = Path(base_dir)
         self.base_dir.mkdir(parents=True, exist_ok=True)
         self.logger = logging.getLogger(__name__)
         self.current_session: Optional[Path] = None
+        self.catalog = catalog or SessionCatalog(self.base_dir)
+        self.dedupe = dedupe
+        self.dedupe_distance = dedupe_distance
+        self._hashes: Optional[HashIndex] = None
+    
+    def _record(
+        self,
+        path: Path,
+        metadata: Optional[Dict[str, Any]] = None,
+        analysis: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Update the catalog after a write; a catalog failure never fails the write."""
+        try:
+            self.catalog.record_path(path, analysis)
+            if metadata is not None:
+                self.catalog.record_metadata(path.parent, metadata)
+        except sqlite3.Error as e:
+            self.logger.warning(f"Failed to update catalog for {path}: {e}")
+    
+    def _find_duplicate(self, value: int) -> Optional[Tuple[Path, int]]:
+        """Return the closest existing sprite within the dedupe distance, if any."""
+        if self._hashes is None:
+            # Built once per manager from the catalog, then kept up to date by save_image
+            try:
+                self.catalog.rescan()
+                hashes = self.catalog.image_hashes()
+            except sqlite3.Error as e:
+                self.logger.warning(f"Catalog unavailable, deduplicating this run only: {e}")
+                hashes = []
+            self._hashes = HashIndex(((value, rel) for rel, value in hashes), self.dedupe_distance)
+        
+        for distance, rel in self._hashes.search(value, self.dedupe_distance):
+            original = self.base_dir / rel
+            if original.exists():
+                return original, distance
+        return None
     
     def create_session_folder(self) -> Path:
-        """Create a new timestamped session folder."""
+        """Create a new timestamped session folder, suffixed -2, -3... if the name is taken."""
         timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-        session_path = self.base_dir / timestamp
-        session_path.mkdir(parents=True, exist_ok=True)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        # mkdir is atomic, so concurrent sessions (e.g. pool workers) never share a folder
+        suffix = 1
+        while True:
+            session_path = self.base_dir / (timestamp if suffix == 1 else f"{timestamp}-{suffix}")
+            try:
+                session_path.mkdir()
+                break
+            except FileExistsError:
+                suffix += 1
         self.current_session = session_path
+        self._record(session_path)
         self.logger.info(f"Created session folder: {session_path}")
         return session_path
     
+    @traced('OutputManager.save_image')
     def save_image(
         self, 
         image: Image.Image, 
@@ -32,6 +121,10 @@ class OutputManager:
         """
         Save an image to the appropriate provider folder.
         
+        With deduplication enabled, a sprite within the dedupe distance of
+        one already in the output tree is skipped (DuplicateImageError) or
+        hard-linked to it instead of being written again.
+        
         Args:
             image: PIL Image to save
             provider: Name of the image generation provider
@@ -40,6 +133,9 @@ class OutputManager:
             
         Returns:
             Path to the saved image
+            
+        Raises:
+            DuplicateImageError: In 'skip' mode, if the image is a near-duplicate
         """
         if session_path is None:
             session_path = self.current_session
@@ -50,27 +146,144 @@ class OutputManager:
         # Create provider subdirectory
         provider_path = session_path / provider
         provider_path.mkdir(exist_ok=True)
-        
-        # Save the image
         image_filename = f"variation_{variation_num}.png"
         image_path = provider_path / image_filename
-        image.save(image_path, "PNG")
         
-        # Also save a preview with pixel grid
-        from ..processors.pixel_art import create_pixel_grid
-        preview = create_pixel_grid(image)
-        preview_path = provider_path / f"variation_{variation_num}_preview.png"
-        preview.save(preview_path, "PNG")
+        sample = analysis_sample(image)
+        value = sprite_hash(sample)
+        duplicate = self._find_duplicate(value) if self.dedupe else None
+        if duplicate is not None and self.dedupe == 'skip':
+            raise DuplicateImageError(image_path, *duplicate)
+        
+        if duplicate is not None and self._link(image_path, duplicate[0]):
+            self.logger.info(f"Linked near-duplicate {image_path} to {duplicate[0]}")
+        else:
+            # Save the image
+            with IMAGE_WRITE_LATENCY.time():
+                image.save(image_path, "PNG")
+            IMAGE_WRITE_BYTES.inc(image_path.stat().st_size)
+            self.logger.info(f"Saved image: {image_path}")
+        
+        if self._hashes is not None:
+            self._hashes.add(value, self.catalog.relative(image_path))
+        
+        # Grid previews are rendered on demand by the UI server (/preview/...)
+        # Color features are indexed now, while the image is still in memory
+        analyzed = sample if sample.mode in ('RGB', 'RGBA') else sample.convert('RGB')
+        analysis = analyze_pixel_art(analyzed)
+        analysis['phash'] = hash_to_hex(value)
+        self._record(image_path, analysis=analysis)
         
-        self.logger.info(f"Saved image: {image_path}")
         return image_path
     
+    def _link(self, image_path: Path, original: Path) -> bool:
+        """Hard-link a duplicate to its original; False if it has to be written instead."""
+        try:
+            replace_with_link(image_path, original)
+            return True
+        except OSError as e:
+            self.logger.warning(f"Cannot link {image_path} to {original}, saving a copy: {e}")
+            return False
+    
+    def save_sprite_sizes(
+        self,
+        sprites: Dict[int, Image.Image],
+        provider: str,
+        variation_num: int,
+        session_path: Optional[Path] = None,
+        primary_size: Optional[int] = None
+    ) -> List[Path]:
+        """
+        Save one variation at several sprite sizes side by side.
+        
+        The primary size is saved as variation_N.png, like a single-size run,
+        so it alone is counted and indexed; the others are saved next to it
+        as variation_N_WxH.png.
+        
+        Args:
+            sprites: Sprite size mapped to its image
+            provider: Name of the image generation provider
+            variation_num: Variation number (1-based)
+            session_path: Optional session path (uses current if not provided)
+            primary_size: Size saved as the variation itself (defaults to the smallest)
+            
+        Returns:
+            Paths of the saved images, primary first
+        """
+        if session_path is None:
+            session_path = self.current_session
+            
+        if session_path is None:
+            raise ValueError("No session folder created.")
+        
+        if primary_size is None:
+            primary_size = min(sprites)
+        
+        paths = [self.save_image(sprites[primary_size], provider, variation_num, session_path)]
+        provider_path = paths[0].parent
+        
+        for size, sprite in sprites.items():
+            if size == primary_size:
+                continue
+            width, height = sprite.size
+            sprite_path = provider_path / f"variation_{variation_num}_{width}x{height}.png"
+            with IMAGE_WRITE_LATENCY.time():
+                sprite.save(sprite_path, "PNG")
+            IMAGE_WRITE_BYTES.inc(sprite_path.stat().st_size)
+            self._record(sprite_path)
+            paths.append(sprite_path)
+        
+        self.logger.info(f"Saved {len(paths) - 1} more sizes of {paths[0]}")
+        return paths
+    
+    def save_source(
+        self,
+        image: Image.Image,
+        provider: str,
+        variation_num: int,
+        session_path: Optional[Path] = None
+    ) -> Path:
+        """
+        Archive a full-resolution generator image next to its sprite.
+        
+        Args:
+            image: Source image as returned by the provider
+            provider: Name of the provider
+            variation_num: Variation number
+            session_path: Optional session path (uses current if not provided)
+            
+        Returns:
+            Path to the saved source image
+        """
+        if session_path is None:
+            session_path = self.current_session
+            
+        if session_path is None:
+            raise ValueError("No session folder created.")
+        
+        provider_path = session_path / provider
+        provider_path.mkdir(exist_ok=True)
+        
+        source_path = provider_path / f"source_{variation_num}.png"
+        with IMAGE_WRITE_LATENCY.time():
+            image.save(source_path, "PNG")
+        IMAGE_WRITE_BYTES.inc(source_path.stat().st_size)
+        self._record(source_path)
+        
+        self.logger.info(f"Saved source image: {source_path}")
+        return source_path
+    
     def save_metadata(
         self,
         query: str,
         classification: Dict[str, Any],
         results: Dict[str, Any],
-        session_path: Optional[Path] = None
+        session_path: Optional[Path] = None,
+        timings: Optional[List[Dict[str, Any]]] = None,
+        sizes: Optional[List[int]] = None,
+        quality: Optional[List[Dict[str, Any]]] = None,
+        seed: Optional[int] = None,
+        source: Optional[Dict[str, Any]] = None
     ) -> Path:
         """
         Save session metadata to JSON file.
@@ -80,6 +293,13 @@ class OutputManager:
             classification: Query classification results
             results: Generation results from all providers
             session_path: Optional session path (uses current if not provided)
+            timings: Optional span summaries from the run's tracer
+            sizes: Optional sprite sizes saved per variation, primary first
+            quality: Optional per-variation quality scores and whether each was kept
+            seed: Optional session seed; variation N was generated with seed + N - 1
+                by the providers marked 'seeded'
+            source: Optional description of the sprites the session was made
+                from, for regenerated and recolored sessions
             
         Returns:
             Path to the metadata file
@@ -107,12 +327,39 @@ class OutputManager:
                 'errors': provider_results.get('errors', []),
                 'success': len(provider_results.get('errors', [])) == 0
             }
+            if provider_results.get('settings'):
+                metadata['providers'][provider]['settings'] = provider_results['settings']
+            if provider_results.get('template'):
+                metadata['providers'][provider]['template'] = provider_results['template']
+            if seed is not None:
+                metadata['providers'][provider]['seeded'] = provider_results.get('seeded', False)
+            if provider_results.get('cost') is not None:
+                metadata['providers'][provider]['cost'] = round(provider_results['cost'], 6)
+                metadata['total_cost'] = round(metadata.get('total_cost', 0) + provider_results['cost'], 6)
             metadata['total_images_generated'] += provider_results.get('variations_generated', 0)
         
+        if seed is not None:
+            metadata['seed'] = seed
+        
+        if source is not None:
+            metadata['source'] = source
+        
+        if sizes is not None:
+            metadata['sizes'] = sizes
+        
+        if quality is not None:
+            metadata['quality'] = quality
+        
+        if timings is not None:
+            metadata['timings'] = timings
+        
         # Save metadata
         metadata_path = session_path / "metadata.json"
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
+        with METADATA_WRITE_LATENCY.time():
+            with open(metadata_path, 'w') as f:
+                json.dump(metadata, f, indent=2)
+        METADATA_WRITE_BYTES.inc(metadata_path.stat().st_size)
+        self._record(metadata_path, metadata)
         
         self.logger.info(f"Saved metadata: {metadata_path}")
         return metadata_path
@@ -137,13 +384,22 @@ class OutputManager:
         summary_lines = [f"Session: {session_path.name}"]
         summary_lines.append("-" * 40)
         
+        # The catalog is updated on every save, so no directory walk is needed
+        try:
+            counts = self.catalog.provider_image_counts(self.catalog.relative(session_path))
+        except sqlite3.Error as e:
+            self.logger.warning(f"Catalog unavailable, counting files instead: {e}")
+            counts = {
+                provider_dir.name: sum(1 for path in provider_dir.iterdir() if VARIATION_PATTERN.match(path.name))
+                for provider_dir in sorted(session_path.iterdir())
+                if provider_dir.is_dir()
+            }
+        
         total_images = 0
-        for provider_dir in session_path.iterdir():
-            if provider_dir.is_dir() and provider_dir.name != "__pycache__":
-                image_count = len(list(provider_dir.glob("variation_*.png")))
-                if image_count > 0:
-                    summary_lines.append(f"{provider_dir.name}: {image_count} images")
-                    total_images += image_count
+        for provider, image_count in counts.items():
+            if image_count > 0:
+                summary_lines.append(f"{provider}: {image_count} images")
+                total_images += image_count
         
         summary_lines.append("-" * 40)
         summary_lines.append(f"Total: {total_images} images")
@@ -0,0 +1,102 @@
+import time
+from typing import Any, Optional
+import httpx
+from .metrics import HTTP_BYTES, HTTP_ERRORS, HTTP_LATENCY, HTTP_REQUESTS
+from .tracing import Span, Tracer, get_tracer
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport recording every request as an 'http' span and in the HTTP metrics.
+
+    Timing stops once the response body has been read or closed, so it
+    covers the download as well as the time to first byte.
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None, provider: str = 'unknown', **attributes: Any):
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self._provider = provider
+        self._attributes = attributes
+        # Bind metric children once; the per-request path only increments them
+        self._requests = HTTP_REQUESTS.labels(provider)
+        self._errors = HTTP_ERRORS.labels(provider)
+        self._latency = HTTP_LATENCY.labels(provider)
+        self._bytes = HTTP_BYTES.labels(provider)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._requests.inc()
+        start = time.perf_counter()
+        tracer = get_tracer()
+        current = None
+        if tracer is not None:
+            current = tracer.start_span(
+                'http',
+                method=request.method,
+                url=f"{request.url.scheme}://{request.url.host}{request.url.path}",
+                provider=self._provider,
+                **self._attributes
+            )
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException as e:
+            self._errors.inc()
+            self._latency.observe(time.perf_counter() - start)
+            if current is not None:
+                tracer.finish_span(current, e)
+            raise
+
+        if response.status_code >= 400:
+            self._errors.inc()
+        if current is not None:
+            current.attributes['status'] = response.status_code
+
+        if isinstance(response.stream, httpx.ByteStream):
+            # Body already in memory (mock transports); nothing left to time
+            self._finish(start, len(response.content), tracer, current)
+        else:
+            response.stream = _InstrumentedStream(response.stream, self, start, tracer, current)
+        return response
+
+    def _finish(self, start: float, size: int, tracer: Optional[Tracer], current: Optional[Span]) -> None:
+        self._latency.observe(time.perf_counter() - start)
+        self._bytes.inc(size)
+        if current is not None:
+            current.attributes['bytes'] = size
+            tracer.finish_span(current)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class _InstrumentedStream(httpx.AsyncByteStream):
+    """Response stream that records its request once the body is consumed."""
+
+    def __init__(
+        self,
+        stream: httpx.AsyncByteStream,
+        transport: InstrumentedTransport,
+        start: float,
+        tracer: Optional[Tracer],
+        current: Optional[Span]
+    ):
+        self._stream = stream
+        self._transport = transport
+        self._start = start
+        self._tracer = tracer
+        self._span = current
+        self._size = 0
+        self._finished = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._size += len(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._finished:
+                self._finished = True
+                self._transport._finish(self._start, self._size, self._tracer, self._span)
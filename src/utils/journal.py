@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+JOURNAL_FILENAME = "journal.jsonl"
+
+# Decisions that settle a provider/variation pair; anything else is missing
+SETTLED_EVENTS = ('image', 'skipped')
+
+
+@dataclass
+class JournalState:
+    """What a session's journal says was asked for and what got done."""
+    start: Optional[Dict[str, Any]] = None
+    # Latest completion event per provider
+    providers: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # Settling event per (provider, variation)
+    variations: Dict[Tuple[str, int], Dict[str, Any]] = field(default_factory=dict)
+    finished: bool = False
+
+    def missing(self) -> Dict[str, List[int]]:
+        """
+        Provider/variation pairs that were requested but never saved or skipped.
+
+        Returns:
+            Missing variation numbers per provider, in order; providers with
+            nothing missing are left out
+        """
+        if self.start is None:
+            return {}
+        missing = {}
+        for provider in self.start['providers']:
+            numbers = [
+                n for n in range(1, self.start['variations'] + 1)
+                if (provider, n) not in self.variations
+            ]
+            if numbers:
+                missing[provider] = numbers
+        return missing
+
+    def results(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-provider results in the shape save_metadata expects, images aside.
+
+        Returns:
+            Provider name -> requested/generated counts, errors, settings,
+            template and cost
+        """
+        results = {}
+        for provider in (self.start or {}).get('providers', []):
+            event = self.providers.get(provider, {})
+            settled = [key for key in self.variations if key[0] == provider]
+            results[provider] = {
+                'service': provider,
+                'variations_requested': self.start['variations'],
+                'variations_generated': len(settled),
+                'settings': event.get('settings'),
+                'template': event.get('template'),
+                'seeded': event.get('seeded', False),
+                'cost': event.get('cost'),
+                'images': [],
+                'errors': event.get('errors', ['did not finish'] if not settled else [])
+            }
+        return results
+
+    def quality(self) -> List[Dict[str, Any]]:
+        """Quality entries of every scored variation, in provider/variation order."""
+        return [
+            event['quality'] for _, event in sorted(self.variations.items())
+            if event.get('quality') is not None
+        ]
+
+
+class SessionJournal:
+    """
+    Append-only, crash-safe log of a session's progress (journal.jsonl).
+
+    Each event is one JSON line, flushed and fsynced before the call returns,
+    so whatever a killed process managed to do is on disk: the request
+    ('start'), each provider finishing ('provider') and each variation saved
+    ('image') or deliberately not saved ('skipped'). load() tolerates a last
+    line cut short by a crash.
+    """
+
+    def __init__(self, session_path: Path):
+        """
+        Initialize the journal.
+
+        Args:
+            session_path: Session folder the journal lives in
+        """
+        self.path = Path(session_path) / JOURNAL_FILENAME
+        self.logger = logging.getLogger(__name__)
+
+    def record(self, event: str, **fields: Any) -> None:
+        """
+        Append one event and make it durable.
+
+        Args:
+            event: Event type, e.g. 'start', 'provider', 'image', 'skipped', 'finish'
+            **fields: JSON-serializable event data
+        """
+        line = json.dumps({'event': event, 'time': datetime.now().isoformat(), **fields}, default=str)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    @classmethod
+    def load(cls, session_path: Path) -> JournalState:
+        """
+        Replay a session's journal.
+
+        Args:
+            session_path: Session folder
+
+        Returns:
+            The replayed state; empty if the session has no journal
+        """
+        state = JournalState()
+        path = Path(session_path) / JOURNAL_FILENAME
+        if not path.exists():
+            return state
+
+        with open(path, encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.getLogger(__name__).warning(f"Ignoring unreadable line {number} of {path}")
+                    continue
+                event = entry.get('event')
+                if event == 'start':
+                    state.start = entry
+                elif event == 'provider':
+                    # Spend adds up across the original run and resumes
+                    previous = state.providers.get(entry['provider'], {}).get('cost')
+                    if previous is not None:
+                        entry['cost'] = previous + (entry.get('cost') or 0)
+                    state.providers[entry['provider']] = entry
+                elif event in SETTLED_EVENTS:
+                    state.variations[(entry['provider'], entry['variation'])] = entry
+                elif event == 'finish':
+                    state.finished = True
+                elif event == 'resume':
+                    state.finished = False
+        return state
@@ -0,0 +1,305 @@
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+
+LEDGER_FILENAME = ".ledger.db"
+
+# Budgets cap spend over this many days, rolling. Overridable with LEDGER_WINDOW_DAYS
+WINDOW_DAYS = 30.0
+
+# Reservations left by a process that died mid-generation stop counting
+# against budgets after this long
+RESERVATION_TTL = 3600.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS charges (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    provider TEXT NOT NULL,
+    requests INTEGER NOT NULL DEFAULT 0,
+    images INTEGER NOT NULL DEFAULT 0,
+    sprites INTEGER NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    cost REAL NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_charges_provider_time ON charges(provider, timestamp);
+
+CREATE TABLE IF NOT EXISTS reservations (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    provider TEXT NOT NULL,
+    cost REAL NOT NULL
+);
+"""
+
+
+def budget_limits(overrides: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """
+    Per-provider spend caps in USD: BUDGET_<PROVIDER> environment variables, then overrides.
+
+    Args:
+        overrides: Optional caps taking precedence over the environment
+
+    Returns:
+        USD per budget window per provider; providers left out are uncapped
+    """
+    budgets = {
+        key[len('BUDGET_'):].lower(): float(value)
+        for key, value in os.environ.items()
+        if key.startswith('BUDGET_') and value
+    }
+    budgets.update(overrides or {})
+    return budgets
+
+
+@dataclass
+class Allocation:
+    """Variations each provider may generate within its budget."""
+    counts: Dict[str, int]
+    # Why a provider got fewer variations than asked for
+    notes: Dict[str, str] = field(default_factory=dict)
+    # Reservation row per provider, released once its generation finishes
+    reservations: Dict[str, int] = field(default_factory=dict)
+
+
+class CostLedger:
+    """
+    Per-provider spend, usage and budgets, in a SQLite database next to the catalog.
+
+    Every generation adds a charge row (requests, images, failures and
+    estimated cost) and every save adds the sprites it kept, so the report
+    can divide one by the other. Budgets cap spend per provider over a
+    rolling window. Allocations reserve the estimated cost of the variations
+    they grant inside one transaction, so processes sharing the output
+    directory cannot all spend the same remaining budget at once.
+    """
+
+    def __init__(
+        self,
+        base_dir: Union[str, Path],
+        budgets: Optional[Dict[str, float]] = None,
+        window_days: Optional[float] = None
+    ):
+        """
+        Initialize the ledger tables.
+
+        Args:
+            base_dir: Output directory shared by the cooperating processes
+            budgets: USD per window per provider; others are uncapped
+            window_days: Days budgets are counted over (default WINDOW_DAYS)
+        """
+        self.db_path = Path(base_dir) / LEDGER_FILENAME
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.budgets = dict(budgets or {})
+        if window_days is None:
+            window_days = float(os.getenv('LEDGER_WINDOW_DAYS', WINDOW_DAYS))
+        self.window = window_days * 86400
+        self.logger = logging.getLogger(__name__)
+
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; allocations open their own BEGIN IMMEDIATE transaction
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def record(
+        self,
+        provider: str,
+        requests: int = 0,
+        images: int = 0,
+        sprites: int = 0,
+        failures: int = 0,
+        cost: float = 0.0
+    ) -> None:
+        """
+        Add one charge: a generation call, or sprites saved from earlier calls.
+
+        Args:
+            provider: Provider name
+            requests: Images requested
+            images: Images received
+            sprites: Sprites saved
+            failures: Calls that failed
+            cost: Estimated USD spent
+        """
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO charges (timestamp, provider, requests, images, sprites, failures, cost) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), provider, requests, images, sprites, failures, cost)
+            )
+        finally:
+            conn.close()
+
+    def _committed(self, conn: sqlite3.Connection, provider: str, now: float) -> float:
+        """Spend in the window plus live reservations."""
+        spent = conn.execute(
+            "SELECT COALESCE(SUM(cost), 0) FROM charges WHERE provider = ? AND timestamp >= ?",
+            (provider, now - self.window)
+        ).fetchone()[0]
+        reserved = conn.execute(
+            "SELECT COALESCE(SUM(cost), 0) FROM reservations WHERE provider = ? AND timestamp >= ?",
+            (provider, now - RESERVATION_TTL)
+        ).fetchone()[0]
+        return spent + reserved
+
+    def remaining(self, provider: str) -> Optional[float]:
+        """
+        Budget a provider has left, net of reservations.
+
+        Args:
+            provider: Provider name
+
+        Returns:
+            USD left in the window, or None if the provider is uncapped
+        """
+        if provider not in self.budgets:
+            return None
+        conn = self._connect()
+        try:
+            return self.budgets[provider] - self._committed(conn, provider, time.time())
+        finally:
+            conn.close()
+
+    def allocate(
+        self,
+        counts: Dict[str, int],
+        prices: Dict[str, Optional[float]],
+        redistribute: bool = False,
+        max_per_provider: Optional[int] = None
+    ) -> Allocation:
+        """
+        Fit requested variations into each provider's remaining budget and reserve their cost.
+
+        Args:
+            counts: Variations requested per provider
+            prices: Estimated USD per image per provider; unknown prices are
+                never capped
+            redistribute: Hand variations a provider can't afford to other
+                requested providers with budget left, cheapest first and
+                unknown prices last
+            max_per_provider: Most variations redistribution may bring a
+                provider up to, e.g. the per-call limit; default unlimited
+
+        Returns:
+            Allocation with the granted counts, the reason for every cut and
+            the reservations to release after generating
+        """
+        allocation = Allocation(counts=dict(counts))
+        capped = [name for name in counts if name in self.budgets and prices.get(name)]
+        if not capped:
+            return allocation
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            conn.execute("DELETE FROM reservations WHERE timestamp < ?", (now - RESERVATION_TTL,))
+            # Variations each provider can still afford; None is unlimited
+            room: Dict[str, Optional[int]] = {name: None for name in counts}
+            for name in capped:
+                left = self.budgets[name] - self._committed(conn, name, now)
+                room[name] = max(0, int(left / prices[name] + 1e-9))
+                if room[name] < counts[name]:
+                    allocation.counts[name] = room[name]
+                    allocation.notes[name] = (
+                        f"budget of ${self.budgets[name]:.2f} has ${max(left, 0):.4f} left, "
+                        f"enough for {room[name]} of {counts[name]} images"
+                    )
+
+            shortfall = sum(counts.values()) - sum(allocation.counts.values())
+            if redistribute and shortfall:
+                takers = sorted(
+                    (name for name in counts if counts[name] and name not in allocation.notes),
+                    key=lambda name: (prices.get(name) is None, prices.get(name) or 0)
+                )
+                while shortfall and takers:
+                    for name in list(takers):
+                        if shortfall == 0:
+                            break
+                        full = max_per_provider is not None and allocation.counts[name] >= max_per_provider
+                        if full or (room[name] is not None and allocation.counts[name] >= room[name]):
+                            takers.remove(name)
+                            continue
+                        allocation.counts[name] += 1
+                        shortfall -= 1
+
+            for name in capped:
+                if allocation.counts[name]:
+                    cursor = conn.execute(
+                        "INSERT INTO reservations (timestamp, provider, cost) VALUES (?, ?, ?)",
+                        (now, name, allocation.counts[name] * prices[name])
+                    )
+                    allocation.reservations[name] = cursor.lastrowid
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return allocation
+
+    def release(self, reservation: int) -> None:
+        """
+        Drop a reservation once the spend it covered has been recorded.
+
+        Args:
+            reservation: Row id from Allocation.reservations
+        """
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM reservations WHERE id = ?", (reservation,))
+        finally:
+            conn.close()
+
+    def report(self, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Usage and spend per provider.
+
+        Args:
+            since: Optional Unix time to count charges from (default all)
+
+        Returns:
+            One entry per provider with requests, images, sprites, failures,
+            cost, cost per image and per sprite, and budget state if capped
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT provider, SUM(requests), SUM(images), SUM(sprites), SUM(failures), SUM(cost) "
+                "FROM charges WHERE timestamp >= ? GROUP BY provider ORDER BY provider",
+                (since or 0,)
+            ).fetchall()
+            report = []
+            for provider, requests, images, sprites, failures, cost in rows:
+                entry = {
+                    'provider': provider,
+                    'requests': requests,
+                    'images': images,
+                    'sprites': sprites,
+                    'failures': failures,
+                    'cost': round(cost, 6),
+                    'cost_per_image': round(cost / images, 6) if images else None,
+                    'cost_per_sprite': round(cost / sprites, 6) if sprites else None,
+                }
+                if provider in self.budgets:
+                    entry['budget'] = self.budgets[provider]
+                    entry['remaining'] = round(self.budgets[provider] - self._committed(conn, provider, now), 6)
+                report.append(entry)
+            return report
+        finally:
+            conn.close()
@@ -0,0 +1,471 @@
+import glob
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class _Shards:
+    """
+    Per-thread value cells.
+
+    Each thread increments only its own cell, so updates need no lock; the
+    lock is taken once per thread to register the cell and when collecting.
+    """
+
+    def __init__(self, width: int):
+        self._width = width
+        self._local = threading.local()
+        self._cells: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def cell(self) -> List[float]:
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = [0.0] * self._width
+            with self._lock:
+                self._cells.append(cell)
+            self._local.cell = cell
+            return cell
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            cells = list(self._cells)
+        return [sum(cell[i] for cell in cells) for i in range(self._width)]
+
+
+class _Child:
+    """One labelled time series of a metric."""
+
+    def __init__(self, width: int):
+        self._shards = _Shards(width)
+        self._function: Optional[Callable[[], float]] = None
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Report function() at collection time instead of recorded values."""
+        self._function = function
+
+    def _values(self) -> List[float]:
+        if self._function is not None:
+            return [float(self._function())]
+        return self._shards.totals()
+
+
+class CounterChild(_Child):
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._shards.cell()[0] += amount
+
+    def get(self) -> float:
+        return self._values()[0]
+
+
+class GaugeChild(_Child):
+    # Gauges change rarely and set() must override earlier inc()/dec(), so
+    # they keep one locked value instead of per-thread shards
+    def __init__(self):
+        super().__init__(1)
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    def _values(self) -> List[float]:
+        if self._function is not None:
+            return [float(self._function())]
+        with self._lock:
+            return [self._value]
+
+
+class HistogramChild(_Child):
+    def __init__(self, buckets: Sequence[float]):
+        # One cell per bucket, one for +Inf, then sum and count
+        super().__init__(len(buckets) + 3)
+        self._buckets = buckets
+
+    def observe(self, value: float) -> None:
+        cell = self._shards.cell()
+        cell[bisect_left(self._buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the duration of the enclosed block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Metric:
+    """A named metric family with optional labels."""
+
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], _Child] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self) -> _Child:
+        raise NotImplementedError
+
+    def labels(self, *values: Any) -> Any:
+        """
+        Return the child for these label values, creating it on first use.
+
+        Bind children once (at import or construction time) on hot paths.
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def collect(self) -> Dict[str, Any]:
+        with self._lock:
+            children = list(self._children.items())
+        return {
+            'type': self.type,
+            'help': self.documentation,
+            'labelnames': list(self.labelnames),
+            'samples': [[list(key), child._values()] for key, child in children],
+        }
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def _new_child(self) -> CounterChild:
+        return CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def _new_child(self) -> GaugeChild:
+        return GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._default.set_function(function)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> HistogramChild:
+        return HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def collect(self) -> Dict[str, Any]:
+        collected = super().collect()
+        collected['buckets'] = list(self.buckets)
+        return collected
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Re-imports (tests, reloads) get the already registered family
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} already registered with a different shape")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current values of every metric as JSON-serializable data."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.collect() for metric in metrics}
+
+    def write_snapshot(self, directory: str) -> str:
+        """Atomically write this process's snapshot to directory/<pid>.json."""
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+        return path
+
+    def exposition(self, directory: Optional[str] = None) -> str:
+        """
+        Render metrics in the Prometheus text format.
+
+        Args:
+            directory: Optional snapshot directory shared by worker processes;
+                when given, this process's snapshot is refreshed and all
+                processes' snapshots are merged.
+
+        Returns:
+            Exposition text
+        """
+        if directory is None:
+            return render(self.snapshot())
+        self.write_snapshot(directory)
+        return render(merge_snapshots(read_snapshots(directory)))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_snapshots(directory: str) -> List[Tuple[int, Dict[str, Dict[str, Any]]]]:
+    """Load every process snapshot in a directory."""
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            pid = int(os.path.basename(path)[:-len('.json')])
+            with open(path) as f:
+                snapshots.append((pid, json.load(f)))
+        except (ValueError, OSError):
+            continue
+    return snapshots
+
+
+def merge_snapshots(snapshots: List[Tuple[int, Dict[str, Dict[str, Any]]]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Combine per-process snapshots.
+
+    Counters and histograms are summed, including those of exited processes
+    so totals never go backwards. Gauges describe a live process, so they
+    gain a 'pid' label and are dropped once that process has exited.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for pid, snapshot in sorted(snapshots):
+        gauges_live = _pid_alive(pid)
+        for name, metric in snapshot.items():
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = {**metric, 'samples': {}}
+                if metric['type'] == 'gauge':
+                    target['labelnames'] = metric['labelnames'] + ['pid']
+
+            for labels, values in metric['samples']:
+                if metric['type'] == 'gauge':
+                    if gauges_live:
+                        target['samples'][tuple(labels) + (str(pid),)] = values
+                    continue
+                key = tuple(labels)
+                previous = target['samples'].get(key)
+                target['samples'][key] = values if previous is None else [a + b for a, b in zip(previous, values)]
+
+    for metric in merged.values():
+        metric['samples'] = [[list(key), values] for key, values in metric['samples'].items()]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def render(snapshot: Dict[str, Dict[str, Any]]) -> str:
+    """Render a snapshot in the Prometheus text exposition format."""
+    lines = []
+    for name in sorted(snapshot):
+        metric = snapshot[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        names = metric['labelnames']
+        for labels, values in sorted(metric['samples']):
+            if metric['type'] != 'histogram':
+                lines.append(f"{name}{_format_labels(names, labels)} {_format_value(values[0])}")
+                continue
+            cumulative = 0.0
+            bounds = [_format_value(b) for b in metric['buckets']] + ['+Inf']
+            for bound, count in zip(bounds, values):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{_format_labels(names, labels, le)} {_format_value(cumulative)}")
+            lines.append(f"{name}_sum{_format_labels(names, labels)} {_format_value(values[-2])}")
+            lines.append(f"{name}_count{_format_labels(names, labels)} {_format_value(values[-1])}")
+    return '\n'.join(lines) + '\n'
+
+
+def start_snapshot_writer(directory: str, interval: float = 5.0, registry: Optional[MetricsRegistry] = None):
+    """Periodically write this process's snapshot for another process to serve."""
+    registry = registry or REGISTRY
+
+    def run():
+        while True:
+            try:
+                registry.write_snapshot(directory)
+            except OSError:
+                pass
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='metrics-snapshot', daemon=True)
+    thread.start()
+    return thread
+
+
+def start_metrics_server(
+    port: int,
+    host: str = '0.0.0.0',
+    registry: Optional[MetricsRegistry] = None
+) -> ThreadingHTTPServer:
+    """
+    Serve /metrics from a background thread, for long-running workers without a web app.
+
+    Args:
+        port: Port to listen on (0 picks a free one; see server.server_address)
+        host: Interface to bind
+        registry: Registry to expose (defaults to the process-wide one)
+
+    Returns:
+        The running server; call shutdown() to stop it
+    """
+    registry = registry or REGISTRY
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.exposition().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
+
+
+REGISTRY = MetricsRegistry()
+
+# Metrics shared by the generation pipeline
+PROVIDER_REQUESTS = REGISTRY.counter(
+    'pixels_provider_requests_total', 'Generation calls per provider', ['provider'])
+PROVIDER_ERRORS = REGISTRY.counter(
+    'pixels_provider_errors_total', 'Failed generation calls per provider', ['provider'])
+PROVIDER_LATENCY = REGISTRY.histogram(
+    'pixels_provider_duration_seconds', 'Wall time of a provider generation call', ['provider'])
+PROVIDER_IMAGES = REGISTRY.counter(
+    'pixels_provider_images_total', 'Images returned per provider', ['provider'])
+HTTP_REQUESTS = REGISTRY.counter(
+    'pixels_http_requests_total', 'HTTP requests made to provider APIs and CDNs', ['provider'])
+HTTP_ERRORS = REGISTRY.counter(
+    'pixels_http_errors_total', 'HTTP requests that failed or returned status >= 400', ['provider'])
+HTTP_LATENCY = REGISTRY.histogram(
+    'pixels_http_request_duration_seconds', 'HTTP request time including the response body', ['provider'])
+HTTP_BYTES = REGISTRY.counter(
+    'pixels_http_response_bytes_total', 'Response body bytes received', ['provider'])
+CONVERSION_LATENCY = REGISTRY.histogram(
+    'pixels_conversion_duration_seconds', 'Time spent in convert_to_pixel_art')
+DISK_WRITE_LATENCY = REGISTRY.histogram(
+    'pixels_disk_write_duration_seconds', 'Time spent writing output files', ['kind'])
+DISK_WRITE_BYTES = REGISTRY.counter(
+    'pixels_disk_write_bytes_total', 'Bytes written to output files', ['kind'])
+SINGLE_FLIGHT_RESULTS = REGISTRY.counter(
+    'pixels_single_flight_results_total', 'Generations run by this process or shared from another', ['source'])
+RATE_LIMIT_WAIT = REGISTRY.counter(
+    'pixels_rate_limit_wait_seconds_total', 'Time spent waiting for shared provider quota', ['provider'])
+CONVERSION_HANDOFFS = REGISTRY.counter(
+    'pixels_conversion_handoffs_total', 'Images sent to conversion workers, by transport', ['transport'])
+PROVIDER_COST = REGISTRY.counter(
+    'pixels_provider_cost_dollars_total', 'Estimated USD spent on provider images', ['provider'])
+BUDGET_CUTS = REGISTRY.counter(
+    'pixels_budget_cut_variations_total', 'Variations not requested from a provider over its budget', ['provider'])
@@ -0,0 +1,160 @@
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+
+PSTATS_FILENAME = "profile.pstats"
+SUMMARY_FILENAME = "profile.txt"
+
+
+class StageMemory:
+    """Allocation statistics accumulated over every call of one pipeline stage."""
+
+    def __init__(self):
+        self.calls = 0
+        self.peak_bytes = 0
+        self.net_bytes = 0
+        # (filename, lineno) -> [size_diff, count_diff]
+        self.sites: Dict[Tuple[str, int], List[int]] = defaultdict(lambda: [0, 0])
+
+
+class Profiler:
+    """
+    CPU and memory profiler for one CLI run.
+
+    cProfile covers everything on the event loop thread; time a coroutine
+    spends suspended in an await is attributed to the event loop's select
+    call, so provider latency shows up there rather than in the generators.
+    tracemalloc is started for the whole run but only diffed around the
+    stages wrapped with stage().
+    """
+
+    def __init__(self, top: int = 30, frames: int = 10):
+        """
+        Initialize the profiler.
+
+        Args:
+            top: Number of entries in each section of the summary
+            frames: Traceback depth recorded by tracemalloc
+        """
+        self.top = top
+        self.frames = frames
+        self.stages: Dict[str, StageMemory] = {}
+        self._profile = cProfile.Profile()
+        self._started = 0.0
+        self._elapsed = 0.0
+        self._running = False
+
+    def start(self) -> None:
+        tracemalloc.start(self.frames)
+        self._started = time.perf_counter()
+        self._running = True
+        self._profile.enable()
+
+    def stop(self) -> None:
+        self._profile.disable()
+        self._running = False
+        self._elapsed = time.perf_counter() - self._started
+        tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Record allocations made inside the block under `name`."""
+        if not tracemalloc.is_tracing():
+            yield
+            return
+
+        memory = self.stages.setdefault(name, StageMemory())
+        with self._paused():
+            before = tracemalloc.take_snapshot()
+        start_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            end_bytes, peak = tracemalloc.get_traced_memory()
+            with self._paused():
+                self._record(memory, before, start_bytes, end_bytes, peak)
+
+    @contextmanager
+    def _paused(self) -> Iterator[None]:
+        """Keep the profiler's own snapshot work out of the CPU profile."""
+        if self._running:
+            self._profile.disable()
+        try:
+            yield
+        finally:
+            if self._running:
+                self._profile.enable()
+
+    def _record(
+        self,
+        memory: StageMemory,
+        before: tracemalloc.Snapshot,
+        start_bytes: int,
+        end_bytes: int,
+        peak: int
+    ) -> None:
+        after = tracemalloc.take_snapshot()
+        memory.calls += 1
+        memory.peak_bytes = max(memory.peak_bytes, peak - start_bytes)
+        memory.net_bytes += end_bytes - start_bytes
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        for diff in after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno'):
+            frame = diff.traceback[0]
+            site = memory.sites[(frame.filename, frame.lineno)]
+            site[0] += diff.size_diff
+            site[1] += diff.count_diff
+
+    def summary(self) -> str:
+        """Human-readable top-N report of CPU time and stage allocations."""
+        out = io.StringIO()
+        out.write(f"Profiled run: {self._elapsed:.2f}s wall time\n\n")
+
+        stats = pstats.Stats(self._profile, stream=out).strip_dirs()
+        out.write(f"=== Top {self.top} functions by cumulative time ===\n")
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        out.write(f"=== Top {self.top} functions by internal time ===\n")
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top)
+
+        out.write("=== Memory by stage (tracemalloc) ===\n")
+        if not self.stages:
+            out.write("No stages recorded\n")
+        for name, memory in self.stages.items():
+            out.write(
+                f"\n{name}: {memory.calls} calls, peak {_mib(memory.peak_bytes)} in one call, "
+                f"net {_mib(memory.net_bytes)} retained\n"
+            )
+            sites = sorted(memory.sites.items(), key=lambda item: abs(item[1][0]), reverse=True)
+            for (filename, lineno), (size, count) in sites[:self.top]:
+                if size == 0:
+                    continue
+                out.write(f"  {size / 1024:+12.1f} KiB {count:+8d} blocks  {filename}:{lineno}\n")
+        return out.getvalue()
+
+    def write(self, directory: Path) -> Tuple[Path, Path]:
+        """
+        Write the raw profile and the summary into a directory.
+
+        Args:
+            directory: Usually the session folder, next to metadata.json
+
+        Returns:
+            Paths of the pstats file (for snakeviz, `python -m pstats`) and the summary
+        """
+        directory = Path(directory)
+        pstats_path = directory / PSTATS_FILENAME
+        summary_path = directory / SUMMARY_FILENAME
+        self._profile.dump_stats(str(pstats_path))
+        summary_path.write_text(self.summary())
+        return pstats_path, summary_path
+
+
+def _mib(size: int) -> str:
+    return f"{size / (1024 * 1024):.2f} MiB"
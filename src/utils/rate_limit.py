@@ -0,0 +1,120 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from typing import Dict, Optional
+
+
+# Requests per minute allowed per provider when nothing else is configured.
+# Kept below the providers' entry-tier quotas; override with
+# RATE_LIMIT_<PROVIDER> (e.g. RATE_LIMIT_OPENAI=100) or --rate-limit
+DEFAULT_RATE_LIMITS: Dict[str, float] = {
+    'openai': 50,
+    'freepik': 60,
+    'replicate': 300,
+    'stability': 600,
+}
+
+# Bucket capacity in seconds of quota: how far a provider may burst after idling
+BURST_SECONDS = 2.0
+
+
+def rate_limits(overrides: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """
+    Per-provider requests per minute: defaults, then environment, then overrides.
+
+    Args:
+        overrides: Optional limits taking precedence over everything else
+
+    Returns:
+        Requests per minute per provider
+    """
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for provider in DEFAULT_RATE_LIMITS:
+        value = os.getenv(f'RATE_LIMIT_{provider.upper()}')
+        if value:
+            limits[provider] = float(value)
+    limits.update(overrides or {})
+    return limits
+
+
+class SharedRateLimiter:
+    """
+    Per-provider token buckets in shared memory, enforced across processes.
+
+    Create it in the supervising process and pass it to worker processes
+    when starting them; every copy then draws from the same buckets, so the
+    workers together stay within each provider's quota. Bucket state is two
+    doubles per provider (tokens, last refill) guarded by one lock, and the
+    lock is only held for the arithmetic, never while waiting.
+    """
+
+    def __init__(self, limits: Dict[str, float], burst_seconds: float = BURST_SECONDS):
+        """
+        Initialize the buckets, full.
+
+        Args:
+            limits: Requests per minute per provider; others are unlimited
+            burst_seconds: Bucket capacity, in seconds of quota (at least one request)
+        """
+        for provider, limit in limits.items():
+            if limit <= 0:
+                raise ValueError(f"Rate limit for {provider} must be positive, got {limit}")
+        self.providers = {provider: index for index, provider in enumerate(sorted(limits))}
+        self.rates = [limits[provider] / 60.0 for provider in sorted(limits)]
+        self.capacities = [max(1.0, rate * burst_seconds) for rate in self.rates]
+        self._lock = multiprocessing.Lock()
+        # tokens, last refill (time.monotonic, which is system-wide on Linux and macOS)
+        self._state = multiprocessing.RawArray('d', 2 * len(self.rates))
+        now = time.monotonic()
+        for index, capacity in enumerate(self.capacities):
+            self._state[2 * index] = capacity
+            self._state[2 * index + 1] = now
+
+    def try_acquire(self, provider: str) -> float:
+        """
+        Take one request's token if available.
+
+        Args:
+            provider: Provider name
+
+        Returns:
+            0 if a token was taken, else seconds until one will be available
+        """
+        index = self.providers.get(provider)
+        if index is None:
+            return 0.0
+        rate = self.rates[index]
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(
+                self.capacities[index],
+                self._state[2 * index] + (now - self._state[2 * index + 1]) * rate
+            )
+            self._state[2 * index + 1] = now
+            if tokens >= 1.0:
+                self._state[2 * index] = tokens - 1.0
+                return 0.0
+            self._state[2 * index] = tokens
+            return (1.0 - tokens) / rate
+
+    async def acquire(self, provider: str, count: int = 1) -> float:
+        """
+        Wait until `count` requests to a provider are allowed.
+
+        Args:
+            provider: Provider name
+            count: Number of requests about to be made
+
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        for _ in range(count):
+            while True:
+                delay = self.try_acquire(provider)
+                if delay == 0.0:
+                    break
+                await asyncio.sleep(delay)
+                waited += delay
+        return waited
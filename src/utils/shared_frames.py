@@ -0,0 +1,172 @@
+import queue
+import struct
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+import numpy as np
+from PIL import Image
+
+
+# Image modes a slot can hold, by mode code; other modes are converted first
+SLOT_MODES = ('L', 'RGB', 'RGBA')
+
+# How each mode is laid out in a slot. RGB is padded to RGBA: Pillow keeps
+# RGB images 4 bytes per pixel, so RGB pixels copy into an RGBA frame as they
+# are, where packing them to 3 bytes would need an intermediate buffer
+STORAGE_MODES = {'L': 'L', 'RGB': 'RGBA', 'RGBA': 'RGBA'}
+STORAGE_CHANNELS = {'L': 1, 'RGBA': 4}
+
+# Per-slot header: height, width, mode code
+HEADER = struct.Struct('3i')
+
+# Frames start on a cache line boundary
+FRAME_ALIGN = 64
+
+
+def slot_image(image: Image.Image) -> Image.Image:
+    """Return the image in a mode a slot can hold, keeping any transparency."""
+    if image.mode in STORAGE_MODES:
+        return image
+    if image.mode in ('LA', 'PA') or 'transparency' in image.info:
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+class FrameRing:
+    """
+    Fixed-size image slots in one shared memory segment.
+    
+    The owning process writes images into free slots and hands slot numbers
+    to other processes, which attach to the segment by name and read the
+    pixels as NumPy views. Only the slot number crosses the process boundary,
+    so a frame is copied once, straight from the image into the slot, instead
+    of being serialized, pickled, written to a pipe, read back and rebuilt.
+    
+    Slots are handed out and returned by the owner: a reader signals it is
+    done through whatever channel carried the slot number (e.g. a finished
+    future), and the owner then releases the slot for reuse.
+    """
+    
+    def __init__(self, slots: int, max_side: int, name: Optional[str] = None):
+        """
+        Create a ring, or attach to an existing one when a name is given.
+        
+        Args:
+            slots: Number of frames the ring holds at once
+            max_side: Largest width or height a slot can hold
+            name: Shared memory name of an existing ring to attach to
+        """
+        self.slots = slots
+        self.max_side = max_side
+        self.slot_bytes = max_side * max_side * STORAGE_CHANNELS['RGBA']
+        self.frames_offset = -(-slots * HEADER.size // FRAME_ALIGN) * FRAME_ALIGN
+        self.owner = name is None
+        if self.owner:
+            self._memory = shared_memory.SharedMemory(
+                create=True, size=self.frames_offset + slots * self.slot_bytes
+            )
+            self._free: Optional[queue.Queue] = queue.Queue()
+            for slot in range(slots):
+                self._free.put(slot)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+            self._free = None
+    
+    @property
+    def spec(self) -> Tuple[str, int, int]:
+        """Arguments for FrameRing.attach in another process."""
+        return (self._memory.name, self.slots, self.max_side)
+    
+    @classmethod
+    def attach(cls, name: str, slots: int, max_side: int) -> 'FrameRing':
+        """Attach to a ring created by another process."""
+        return cls(slots, max_side, name=name)
+    
+    def fits(self, image: Image.Image) -> bool:
+        """Whether the image is small enough for a slot."""
+        return image.width <= self.max_side and image.height <= self.max_side
+    
+    def put(self, image: Image.Image, timeout: Optional[float] = None) -> int:
+        """
+        Copy an image into a free slot, waiting for one if all are in use.
+        
+        Args:
+            image: Image no larger than max_side on either side
+            timeout: Seconds to wait for a free slot (None waits forever)
+            
+        Returns:
+            The slot number
+            
+        Raises:
+            ValueError: If the image does not fit a slot
+            TimeoutError: If no slot was freed in time
+        """
+        if not self.fits(image):
+            raise ValueError(f"{image.width}x{image.height} image does not fit {self.max_side}px slots")
+        image = slot_image(image)
+        try:
+            slot = self._free.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No free slot within {timeout}s") from None
+        HEADER.pack_into(self._memory.buf, slot * HEADER.size, image.height, image.width, SLOT_MODES.index(image.mode))
+        image.load()
+        # The core paste copies pixels of the same size as-is; Image.paste
+        # would first convert RGB to RGBA in a temporary image
+        self._frame(slot, image.mode, image.size).im.paste(image.im, (0, 0) + image.size)
+        return slot
+    
+    def release(self, slot: int) -> None:
+        """Return a slot to the free list once its reader is done with it."""
+        self._free.put(slot)
+    
+    def free_slots(self) -> int:
+        """Number of slots not currently handed out."""
+        return self._free.qsize()
+    
+    def view(self, slot: int) -> np.ndarray:
+        """
+        The frame in a slot as a NumPy view of shared memory (no copy).
+        
+        Returns:
+            Array of shape (height, width) for 'L' frames, else (height, width, channels)
+        """
+        height, width, mode = self._header(slot)
+        storage = STORAGE_MODES[mode]
+        channels = STORAGE_CHANNELS[storage]
+        shape = (height, width) if channels == 1 else (height, width, channels)
+        frame = np.ndarray(shape, dtype=np.uint8, buffer=self._memory.buf,
+                           offset=self.frames_offset + slot * self.slot_bytes)
+        return frame[..., :3] if mode == 'RGB' else frame
+    
+    def image(self, slot: int) -> Image.Image:
+        """
+        The frame in a slot as a PIL image.
+        
+        'L' and 'RGBA' frames map the shared memory directly; 'RGB' frames
+        are converted out of their padding, which copies them once locally.
+        """
+        height, width, mode = self._header(slot)
+        frame = self._frame(slot, mode, (width, height))
+        return frame.convert('RGB') if mode == 'RGB' else frame
+    
+    def _header(self, slot: int) -> Tuple[int, int, str]:
+        height, width, code = HEADER.unpack_from(self._memory.buf, slot * HEADER.size)
+        return height, width, SLOT_MODES[code]
+    
+    def _frame(self, slot: int, mode: str, size: Tuple[int, int]) -> Image.Image:
+        """A PIL image mapped onto a slot's memory, in the mode's storage layout."""
+        storage = STORAGE_MODES[mode]
+        start = self.frames_offset + slot * self.slot_bytes
+        end = start + size[0] * size[1] * STORAGE_CHANNELS[storage]
+        return Image.frombuffer(storage, size, self._memory.buf[start:end], 'raw', storage, 0, 1)
+    
+    def close(self) -> None:
+        """Detach from the segment, and free it if this process created it."""
+        self._memory.close()
+        if self.owner:
+            self._memory.unlink()
+    
+    def __enter__(self) -> 'FrameRing':
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,252 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+from PIL import Image
+from .metrics import SINGLE_FLIGHT_RESULTS
+
+
+FLIGHTS_FILENAME = ".inflight.db"
+
+# How often a waiting process checks whether the leader has finished
+POLL_INTERVAL = 0.25
+
+# The leader refreshes its heartbeat this often while generating
+HEARTBEAT_INTERVAL = 5.0
+
+# A flight whose heartbeat is older than this is abandoned (the leader
+# crashed or was killed) and the next caller takes it over
+STALE_AFTER = 30.0
+
+# Finished results are kept this long, so waiters polling as the leader
+# finishes still find them. Only callers that opt in (seeded runs, whose
+# results are reproducible anyway) reuse them after the flight has landed.
+# Overridable with SINGLE_FLIGHT_TTL
+RESULT_TTL = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flights (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    heartbeat REAL NOT NULL,
+    finished REAL,
+    results TEXT
+);
+
+CREATE TABLE IF NOT EXISTS flight_images (
+    key TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    png BLOB NOT NULL,
+    PRIMARY KEY (key, provider, idx)
+);
+"""
+
+Results = Dict[str, Dict[str, Any]]
+
+
+class SingleFlight:
+    """
+    Cross-process single-flight for generation results.
+
+    Processes sharing an output directory coordinate through an in-flight
+    table in a SQLite database next to the catalog. The first caller for a
+    key becomes its leader and generates; callers arriving while it runs
+    wait for the leader's results and decode them instead of calling the
+    providers again. Callers arriving after it finished generate afresh
+    unless they ask to reuse finished results. Images travel through the
+    database as PNGs.
+    """
+
+    def __init__(
+        self,
+        base_dir: Union[str, Path],
+        ttl: Optional[float] = None,
+        poll_interval: float = POLL_INTERVAL
+    ):
+        """
+        Initialize the in-flight table.
+
+        Args:
+            base_dir: Output directory shared by the cooperating processes
+            ttl: Seconds finished results are kept (default RESULT_TTL)
+            poll_interval: Seconds between checks while waiting on a leader
+        """
+        self.db_path = Path(base_dir) / FLIGHTS_FILENAME
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl if ttl is not None else float(os.getenv('SINGLE_FLIGHT_TTL', RESULT_TTL))
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{id(self)}"
+        self.logger = logging.getLogger(__name__)
+
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; claims open their own BEGIN IMMEDIATE transaction
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    async def run(
+        self,
+        key: str,
+        generate: Callable[[], Awaitable[Results]],
+        reuse_finished: bool = False
+    ) -> Results:
+        """
+        Return the results for key, generating them only if no other process is.
+
+        Args:
+            key: Identifies the generation, e.g. GeneratorRegistry.flight_key()
+            generate: Coroutine function producing the results when leading
+            reuse_finished: Also take results of a flight that finished before
+                this call arrived, for as long as they are kept; otherwise
+                only a flight still running is shared
+
+        Returns:
+            Results as returned by GeneratorRegistry.generate_all
+        """
+        # SQLite calls can block for up to the connection timeout on a busy
+        # database, so they run on a thread instead of stalling the event loop
+        waited = False
+        while True:
+            role, results = await asyncio.to_thread(self._claim, key, reuse_finished or waited)
+            if role == 'done':
+                SINGLE_FLIGHT_RESULTS.labels('shared').inc()
+                self.logger.info(f"Reusing results of a concurrent run for flight {key[:12]}")
+                return results
+            if role == 'lead':
+                break
+            if not waited:
+                self.logger.info(f"Waiting for a concurrent run of flight {key[:12]}")
+                waited = True
+            await asyncio.sleep(self.poll_interval)
+
+        SINGLE_FLIGHT_RESULTS.labels('generated').inc()
+        heartbeat = asyncio.create_task(self._heartbeat(key))
+        try:
+            results = await generate()
+        except BaseException:
+            # Let a waiting process take over rather than share a failure.
+            # Synchronous, as this also runs while the task is being cancelled
+            self._release(key)
+            raise
+        finally:
+            heartbeat.cancel()
+        await asyncio.to_thread(self._publish, key, results)
+        return results
+
+    def _claim(self, key: str, take_finished: bool) -> Tuple[str, Optional[Results]]:
+        """Atomically become the leader, find finished results, or learn to wait."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._purge(conn, now)
+                row = conn.execute(
+                    "SELECT owner, heartbeat, finished, results FROM flights WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[2] is not None and take_finished:
+                    results = json.loads(row[3])
+                    images = conn.execute(
+                        "SELECT provider, png FROM flight_images WHERE key = ? ORDER BY provider, idx", (key,)
+                    ).fetchall()
+                    conn.execute("COMMIT")
+                    return 'done', self._decode(results, images)
+                if row is not None and row[2] is None and row[1] >= now - STALE_AFTER:
+                    conn.execute("COMMIT")
+                    return 'wait', None
+                if row is not None and row[2] is None:
+                    self.logger.warning(f"Taking over flight {key[:12]} abandoned by {row[0]}")
+                conn.execute("DELETE FROM flight_images WHERE key = ?", (key,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO flights (key, owner, heartbeat) VALUES (?, ?, ?)",
+                    (key, self.owner, now)
+                )
+                conn.execute("COMMIT")
+                return 'lead', None
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def _purge(self, conn: sqlite3.Connection, now: float) -> None:
+        """Drop finished flights older than the TTL."""
+        expired = now - self.ttl
+        conn.execute(
+            "DELETE FROM flight_images WHERE key IN "
+            "(SELECT key FROM flights WHERE finished IS NOT NULL AND finished < ?)", (expired,)
+        )
+        conn.execute("DELETE FROM flights WHERE finished IS NOT NULL AND finished < ?", (expired,))
+
+    async def _heartbeat(self, key: str) -> None:
+        """Keep the flight marked as alive while the leader generates."""
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            await asyncio.to_thread(self._touch, key)
+
+    def _touch(self, key: str) -> None:
+        """Refresh the leader's heartbeat."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE flights SET heartbeat = ? WHERE key = ? AND owner = ?",
+                (time.time(), key, self.owner)
+            )
+        finally:
+            conn.close()
+
+    def _publish(self, key: str, results: Results) -> None:
+        """Store the leader's results for the waiting processes."""
+        stripped = {}
+        rows = []
+        for provider, provider_results in results.items():
+            stripped[provider] = {name: value for name, value in provider_results.items() if name != 'images'}
+            for idx, image in enumerate(provider_results.get('images', [])):
+                buffer = io.BytesIO()
+                # Speed over size: the PNG only lives for the TTL
+                image.save(buffer, format='PNG', compress_level=1)
+                rows.append((key, provider, idx, buffer.getvalue()))
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM flight_images WHERE key = ?", (key,))
+            conn.executemany("INSERT INTO flight_images (key, provider, idx, png) VALUES (?, ?, ?, ?)", rows)
+            conn.execute(
+                "UPDATE flights SET finished = ?, results = ? WHERE key = ? AND owner = ?",
+                (time.time(), json.dumps(stripped), key, self.owner)
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _release(self, key: str) -> None:
+        """Give up leadership of an unfinished flight."""
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM flights WHERE key = ? AND owner = ? AND finished IS NULL", (key, self.owner))
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _decode(results: Results, images) -> Results:
+        """Put decoded images back into stored results."""
+        for provider_results in results.values():
+            provider_results['images'] = []
+        for provider, png in images:
+            image = Image.open(io.BytesIO(png))
+            image.load()
+            results[provider]['images'].append(image)
+        return results
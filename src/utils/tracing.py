@@ -0,0 +1,239 @@
+import asyncio
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+
+@dataclass
+class Span:
+    """A timed, named unit of work."""
+    name: str
+    span_id: int
+    parent_id: Optional[int]
+    track: str
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return (end - self.start_ns) / 1e6
+
+
+class Tracer:
+    """
+    Collects spans for one pipeline run.
+
+    Spans nest through a context variable, so parent links survive awaits
+    and asyncio tasks. Each asyncio task (or thread) gets its own track so
+    concurrent provider calls render side by side in trace viewers.
+    """
+
+    def __init__(self, service_name: str = '16pixels'):
+        self.service_name = service_name
+        self.spans: List[Span] = []
+        self._origin_ns = time.perf_counter_ns()
+        self._wall_origin_ns = time.time_ns()
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._trace_id = os.urandom(16).hex()
+
+    def start_span(self, name: str, **attributes: Any) -> Span:
+        """Open a span under the current one; pair with finish_span."""
+        parent = _current_span.get()
+        with self._lock:
+            span_id = self._next_id
+            self._next_id += 1
+        return Span(
+            name=name,
+            span_id=span_id,
+            parent_id=parent.span_id if parent else None,
+            track=_track_name(),
+            start_ns=time.perf_counter_ns(),
+            attributes=attributes,
+        )
+
+    def finish_span(self, span: Span, error: Optional[BaseException] = None) -> None:
+        """Close a span and record it."""
+        span.end_ns = time.perf_counter_ns()
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Time the enclosed block as a child of the current span."""
+        current = self.start_span(name, **attributes)
+        token = _current_span.set(current)
+        try:
+            yield current
+        except BaseException as e:
+            self.finish_span(current, e)
+            raise
+        else:
+            self.finish_span(current)
+        finally:
+            _current_span.reset(token)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Spans as plain dictionaries in start order, for metadata.json."""
+        return [
+            {
+                'name': span.name,
+                'id': span.span_id,
+                'parent': span.parent_id,
+                'start_ms': round((span.start_ns - self._origin_ns) / 1e6, 3),
+                'duration_ms': round(span.duration_ms, 3),
+                **({'attributes': span.attributes} if span.attributes else {}),
+                **({'error': span.error} if span.error else {}),
+            }
+            for span in sorted(self.spans, key=lambda s: s.start_ns)
+        ]
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Spans in Chrome trace event format (chrome://tracing, Perfetto, speedscope)."""
+        tracks: Dict[str, int] = {}
+        events = []
+        for span in sorted(self.spans, key=lambda s: s.start_ns):
+            tid = tracks.setdefault(span.track, len(tracks) + 1)
+            args = dict(span.attributes)
+            if span.error:
+                args['error'] = span.error
+            events.append({
+                'name': span.name,
+                'cat': span.name.split('.')[0],
+                'ph': 'X',
+                'ts': (span.start_ns - self._origin_ns) / 1e3,
+                'dur': (span.end_ns - span.start_ns) / 1e3,
+                'pid': os.getpid(),
+                'tid': tid,
+                'args': args,
+            })
+        for track, tid in tracks.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': track}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Spans as OpenTelemetry OTLP/JSON (the body of an /v1/traces export)."""
+        def wall(ns: int) -> str:
+            return str(self._wall_origin_ns + ns - self._origin_ns)
+
+        def attribute(key: str, value: Any) -> Dict[str, Any]:
+            if isinstance(value, bool):
+                return {'key': key, 'value': {'boolValue': value}}
+            if isinstance(value, int):
+                return {'key': key, 'value': {'intValue': str(value)}}
+            if isinstance(value, float):
+                return {'key': key, 'value': {'doubleValue': value}}
+            return {'key': key, 'value': {'stringValue': str(value)}}
+
+        spans = []
+        for span in self.spans:
+            otlp_span = {
+                'traceId': self._trace_id,
+                'spanId': f"{span.span_id:016x}",
+                'name': span.name,
+                'kind': 1,
+                'startTimeUnixNano': wall(span.start_ns),
+                'endTimeUnixNano': wall(span.end_ns),
+                'attributes': [attribute(k, v) for k, v in span.attributes.items()],
+                'status': {'code': 2, 'message': span.error} if span.error else {'code': 1},
+            }
+            if span.parent_id is not None:
+                otlp_span['parentSpanId'] = f"{span.parent_id:016x}"
+            spans.append(otlp_span)
+
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [attribute('service.name', self.service_name)]},
+                'scopeSpans': [{'scope': {'name': self.service_name}, 'spans': spans}],
+            }]
+        }
+
+    def export(self, path: Union[str, Path], fmt: str = 'chrome') -> Path:
+        """
+        Write the trace to a file.
+
+        Args:
+            path: Output file
+            fmt: 'chrome' for Chrome trace events or 'otlp' for OpenTelemetry JSON
+
+        Returns:
+            Path to the written file
+        """
+        data = self.to_otlp() if fmt == 'otlp' else self.to_chrome_trace()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(data, f)
+        return path
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar('current_span', default=None)
+_active_tracer: ContextVar[Optional[Tracer]] = ContextVar('active_tracer', default=None)
+
+
+def _track_name() -> str:
+    """Name of the asyncio task (or thread) a span runs on."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return task.get_name()
+    return threading.current_thread().name
+
+
+def start_tracing(service_name: str = '16pixels') -> Tracer:
+    """Activate a new tracer for the current context (and tasks created from it)."""
+    tracer = Tracer(service_name)
+    _active_tracer.set(tracer)
+    return tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Return the active tracer, if tracing was started in this context."""
+    return _active_tracer.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time the enclosed block on the active tracer; a no-op when tracing is off."""
+    tracer = _active_tracer.get()
+    if tracer is None:
+        yield None
+        return
+    with tracer.span(name, **attributes) as current:
+        yield current
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator recording each call of a sync or async function as a span."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
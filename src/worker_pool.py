@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import multiprocessing
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from .utils.logger import setup_logger
+from .utils.metrics import start_metrics_server
+from .utils.rate_limit import SharedRateLimiter
+
+
+logger = setup_logger('16pixels.pool')
+
+
+def run_pool(
+    queries: List[str],
+    workers: int,
+    concurrency: int,
+    options: Dict[str, Any],
+    limiter: Optional[SharedRateLimiter] = None,
+    metrics_port: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Generate one session per query on a pool of worker processes.
+
+    Each worker has its own GeneratorRegistry and event loop and runs up to
+    `concurrency` sessions at once, so network waits overlap within a worker
+    while conversion work spreads over the workers' cores. Workers pull
+    queries from a shared queue, so a slow session never holds up the rest.
+    A shared rate limiter keeps their combined provider traffic within quota.
+
+    Args:
+        queries: One generation query per session
+        workers: Number of worker processes
+        concurrency: Sessions each worker runs at once
+        options: Keyword arguments for async_main (output_dir, variations,
+            sizes and the other generate options)
+        limiter: Optional rate limiter shared by all workers
+        metrics_port: Optional first port for Prometheus metrics; worker N
+            serves /metrics on metrics_port + N
+
+    Returns:
+        One result per query, in query order: the query, its 'status'
+        ('ok' or 'failed', with an 'error'), the 'session' folder when one
+        was created, the 'worker' that ran it and the 'seconds' it took
+    """
+    jobs = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    for index, query in enumerate(queries):
+        jobs.put((index, query))
+    # One stop marker per session slot
+    for _ in range(workers * concurrency):
+        jobs.put(None)
+
+    processes = [
+        multiprocessing.Process(
+            target=_worker, args=(number, jobs, results, concurrency, options, limiter, metrics_port),
+            name=f"16pixels-worker-{number}", daemon=True
+        )
+        for number in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f"Started {workers} workers x {concurrency} sessions for {len(queries)} queries")
+
+    collected: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+    remaining = len(queries)
+    while remaining:
+        try:
+            result = results.get(timeout=1.0)
+        except queue.Empty:
+            # A worker that died takes its in-flight sessions with it
+            if not any(process.is_alive() for process in processes):
+                break
+            continue
+        collected[result['index']] = result
+        remaining -= 1
+
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+
+    return [
+        result or {'index': index, 'query': query, 'status': 'failed', 'error': 'worker exited'}
+        for index, (query, result) in enumerate(zip(queries, collected))
+    ]
+
+
+def _worker(
+    number: int,
+    jobs: multiprocessing.Queue,
+    results: multiprocessing.Queue,
+    concurrency: int,
+    options: Dict[str, Any],
+    limiter: Optional[SharedRateLimiter],
+    metrics_port: Optional[int] = None
+) -> None:
+    """Worker process entry point: run sessions until the queue says stop."""
+    if metrics_port is not None:
+        try:
+            start_metrics_server(metrics_port + number)
+        except OSError as e:
+            logger.warning(f"Worker {number} cannot serve metrics on port {metrics_port + number}: {e}")
+    asyncio.run(_work(number, jobs, results, concurrency, options, limiter))
+
+
+async def _work(
+    number: int,
+    jobs: multiprocessing.Queue,
+    results: multiprocessing.Queue,
+    concurrency: int,
+    options: Dict[str, Any],
+    limiter: Optional[SharedRateLimiter]
+) -> None:
+    # Imported here so the supervisor does not need the generator stack
+    from .generators.registry import GeneratorRegistry
+    from .main import async_main
+
+    # Lanes share its connections and rate limiter; async_main gives each
+    # session its own copy for its templates, sizes and ledger
+    registry = GeneratorRegistry()
+    registry.set_rate_limiter(limiter)
+    loop = asyncio.get_running_loop()
+    # Queue.get blocks, so each lane waits for it on its own thread
+    getters = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='queue')
+
+    async def lane() -> None:
+        while True:
+            job = await loop.run_in_executor(getters, jobs.get)
+            if job is None:
+                return
+            index, query = job
+            result = {'index': index, 'query': query, 'worker': number}
+            started = time.perf_counter()
+            try:
+                session_path = await async_main(query, registry=registry, **options)
+                result.update(status='ok', session=str(session_path))
+            except SystemExit as e:
+                # async_main reports rejected queries and errors, then exits
+                result.update(status='failed', error=f"exit status {e.code}")
+            except Exception as e:
+                logging.getLogger(__name__).error(f"Session for '{query}' failed: {e}")
+                result.update(status='failed', error=str(e))
+            result['seconds'] = round(time.perf_counter() - started, 3)
+            results.put(result)
+
+    try:
+        await asyncio.gather(*(lane() for _ in range(concurrency)))
+    finally:
+        getters.shutdown(wait=False)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+from src.processors.conversion_pool import ConversionPool, convert_sprites
+from src.utils.shared_frames import FrameRing
+
+
+def sample_image(size, mode='RGB'):
+    image = Image.new('RGB', (size, size), 'white')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((size // 4, size // 4, 3 * size // 4, 3 * size // 4), fill=(200, 40, 40))
+    draw.ellipse((size // 3, size // 3, size // 2, size // 2), fill=(30, 30, 160))
+    return image.convert(mode)
+
+
+class TestConversionPool:
+    """Integration tests for the shared-memory conversion handoff."""
+
+    def test_frame_ring_round_trip(self):
+        """Test that frames read back as views of exactly what was written, in every slot mode."""
+        with FrameRing(slots=2, max_side=64) as ring:
+            transparent = sample_image(48, 'RGBA')
+            transparent.putpixel((0, 0), (0, 0, 0, 0))
+            images = [sample_image(64), sample_image(32, 'L'), transparent, sample_image(40, 'P')]
+
+            for image in images:
+                slot = ring.put(image, timeout=1)
+                reader = FrameRing.attach(*ring.spec)
+                expected = np.asarray(image.convert('RGB') if image.mode == 'P' else image)
+                assert np.array_equal(reader.view(slot), expected)
+                assert np.array_equal(np.asarray(reader.image(slot)), expected)
+                reader.close()
+                ring.release(slot)
+
+            first, second = ring.put(images[0]), ring.put(images[1])
+            assert ring.free_slots() == 0
+            with pytest.raises(TimeoutError):
+                ring.put(images[0], timeout=0.01)
+            ring.release(first)
+            ring.release(second)
+            with pytest.raises(ValueError):
+                ring.put(sample_image(65))
+
+    def test_pool_matches_in_process_conversion(self):
+        """Test that workers produce the same sprites as converting in-process, including oversized images."""
+        images = [sample_image(128), sample_image(128, 'RGBA'), sample_image(256)]
+        with ConversionPool(workers=2, slots=1, max_side=128) as pool:
+            single = [pool.submit(image, (16,)) for image in images]
+            multi = [pool.submit(image, (16, 32), transparent=True) for image in images]
+
+            for image, pending in zip(images, single):
+                assert pending.result(timeout=30)[16].tobytes() == convert_sprites(image, (16,))[16].tobytes()
+            for image, pending in zip(images, multi):
+                sprites = pending.result(timeout=30)
+                expected = convert_sprites(image, (16, 32), transparent=True)
+                assert sorted(sprites) == [16, 32]
+                assert all(sprites[size].tobytes() == expected[size].tobytes() for size in expected)
+            assert pool.ring.free_slots() == 1
@@ -0,0 +1,112 @@
+import os
+import random
+import numpy as np
+import pytest
+from click.testing import CliRunner
+from PIL import Image, ImageDraw
+from src.main import main, save_results
+from src.utils.dedupe import HashIndex, hamming_distance, sprite_hash
+from src.utils.file_manager import DuplicateImageError, OutputManager
+from src.utils.journal import SessionJournal
+
+
+def sprite(seed, noise=0):
+    """A 16x16 sprite of random shapes, optionally with pixel noise."""
+    rng = np.random.default_rng(seed)
+    image = Image.new('RGB', (16, 16), tuple(int(c) for c in rng.integers(0, 256, 3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(3):
+        x, y = (int(v) for v in rng.integers(0, 10, 2))
+        draw.rectangle((x, y, x + 6, y + 6), fill=tuple(int(c) for c in rng.integers(0, 256, 3)))
+    if noise:
+        pixels = np.asarray(image).astype(np.int16) + np.random.default_rng(99).integers(-noise, noise + 1, (16, 16, 3))
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return image
+
+
+class TestDedupe:
+    """Integration tests for perceptual-hash deduplication of sprites."""
+
+    def test_hash_index_matches_brute_force(self):
+        """Test that multi-index range queries return exactly the brute-force matches."""
+        rng = random.Random(0)
+        hashes = [rng.getrandbits(128) for _ in range(300)]
+        # Near copies with a few flipped bits
+        hashes += [value ^ (1 << rng.randrange(128)) ^ (1 << rng.randrange(128)) for value in hashes[:50]]
+        index = HashIndex(((value, i) for i, value in enumerate(hashes)), max_distance=10)
+
+        assert len(index) == len(hashes)
+        for query in hashes[:60] + [rng.getrandbits(128) for _ in range(20)]:
+            expected = sorted(
+                (hamming_distance(query, value), i) for i, value in enumerate(hashes)
+                if hamming_distance(query, value) <= 10
+            )
+            assert index.search(query) == expected
+            assert index.search(query, 3) == [match for match in expected if match[0] <= 3]
+
+        # Too wide for the pigeonhole chunks; every hash is within 128 bits
+        wide = HashIndex(((value, i) for i, value in enumerate(hashes)), max_distance=128)
+        assert len(wide.search(hashes[0])) == len(hashes)
+
+    def test_near_duplicates_hash_close(self):
+        """Test that noisy copies hash close and different sprites far apart."""
+        assert hamming_distance(sprite_hash(sprite(1)), sprite_hash(sprite(1, noise=3))) <= 10
+        assert hamming_distance(sprite_hash(sprite(1)), sprite_hash(sprite(2))) > 10
+
+    def test_save_image_skips_or_links(self, temp_output_dir):
+        """Test that save_image skips or hard-links near-duplicates of earlier sprites."""
+        for session in ('session-a', 'session-b', 'session-c'):
+            (temp_output_dir / session).mkdir()
+        OutputManager(str(temp_output_dir)).save_image(
+            sprite(1), 'openai', 1, temp_output_dir / 'session-a'
+        )
+        original = temp_output_dir / 'session-a' / 'openai' / 'variation_1.png'
+
+        skipping = OutputManager(str(temp_output_dir), dedupe='skip')
+        with pytest.raises(DuplicateImageError) as error:
+            skipping.save_image(sprite(1, noise=3), 'stability', 1, temp_output_dir / 'session-b')
+        assert error.value.original == original
+        assert not (temp_output_dir / 'session-b' / 'stability' / 'variation_1.png').exists()
+        # Different sprites are still saved
+        assert skipping.save_image(sprite(2), 'stability', 2, temp_output_dir / 'session-b').exists()
+
+        linking = OutputManager(str(temp_output_dir), dedupe='link')
+        linked = linking.save_image(sprite(1, noise=3), 'replicate', 1, temp_output_dir / 'session-c')
+        assert os.path.samefile(linked, original)
+        assert "Total: 1 images" in linking.create_session_summary(temp_output_dir / 'session-c')
+
+    def test_skipped_duplicates_keep_no_source(self, temp_output_dir):
+        """Test that --keep-source only archives sources of sprites that were stored."""
+        manager = OutputManager(str(temp_output_dir), dedupe='skip')
+        session = manager.create_session_folder()
+        source = sprite(1).resize((128, 128), Image.Resampling.NEAREST)
+        results = {'openai': {'images': [source, source.copy()], 'errors': []}}
+
+        saved = save_results(results, manager, session, SessionJournal(session), keep_source=True)
+
+        assert saved == 1
+        assert sorted(path.name for path in (session / 'openai').iterdir()) == ['source_1.png', 'variation_1.png']
+
+    def test_dedupe_command(self, temp_output_dir):
+        """Test bulk deduplication of an existing output tree."""
+        manager = OutputManager(str(temp_output_dir))
+        for session, seed, noise in (('s1', 1, 0), ('s2', 1, 3), ('s3', 2, 0)):
+            (temp_output_dir / session).mkdir()
+            manager.save_image(sprite(seed, noise), 'openai', 1, temp_output_dir / session)
+        (temp_output_dir / 's2' / 'openai' / 'variation_1_32x32.png').write_bytes(b'')
+        runner = CliRunner()
+
+        report = runner.invoke(main, ['dedupe', '-o', str(temp_output_dir)])
+        assert report.exit_code == 0, report.output
+        assert "s2/openai/variation_1.png ~ s1/openai/variation_1.png" in report.output
+
+        linked = runner.invoke(main, ['dedupe', '-o', str(temp_output_dir), '--action', 'link'])
+        assert linked.exit_code == 0, linked.output
+        assert os.path.samefile(temp_output_dir / 's2/openai/variation_1.png', temp_output_dir / 's1/openai/variation_1.png')
+        assert "already linked" in runner.invoke(main, ['dedupe', '-o', str(temp_output_dir)]).output
+
+        deleted = runner.invoke(main, ['dedupe', '-o', str(temp_output_dir), '--action', 'delete'])
+        assert deleted.exit_code == 0, deleted.output
+        assert not (temp_output_dir / 's2/openai/variation_1.png').exists()
+        assert not (temp_output_dir / 's2/openai/variation_1_32x32.png').exists()
+        assert (temp_output_dir / 's3/openai/variation_1.png').exists()
@@ -0,0 +1,179 @@
+import asyncio
+import base64
+import io
+import httpx
+import pytest
+from PIL import Image
+from src.generators.base import ImageGenerator
+from src.generators.replicate_generator import ReplicateGenerator
+from src.utils.file_manager import OutputManager
+
+
+class StubGenerator(ImageGenerator):
+    def get_service_name(self) -> str:
+        return 'stub'
+    
+    def is_available(self) -> bool:
+        return True
+    
+    async def generate(self, prompt, variations=1, seeds=None):
+        return []
+
+
+def png_bytes(size):
+    buffer = io.BytesIO()
+    Image.new('RGB', (size, size), 'orange').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class TestImageDownload:
+    """Integration tests for streamed provider image downloads."""
+    
+    @pytest.mark.asyncio
+    async def test_download_reduces_to_working_size(self):
+        """Test that downloads are decoded and shrunk to the working size."""
+        payload = png_bytes(1024)
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, content=payload))
+        generator = StubGenerator()
+        generator.working_size = 128
+        
+        async with httpx.AsyncClient(transport=transport) as client:
+            image = await generator.download_image(client, 'https://cdn.example.com/a.png')
+        
+        assert image.size == (128, 128)
+        assert image.getpixel((5, 5)) == (255, 165, 0)
+    
+    @pytest.mark.asyncio
+    async def test_full_resolution_kept_without_working_size(self):
+        """Test that sources stay full size when they are kept."""
+        payload = png_bytes(300)
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, content=payload))
+        
+        async with httpx.AsyncClient(transport=transport) as client:
+            image = await StubGenerator().download_image(client, 'https://cdn.example.com/a.png')
+        
+        assert image.size == (300, 300)
+    
+    @pytest.mark.asyncio
+    async def test_download_size_limit(self):
+        """Test that oversized and failed downloads are refused."""
+        payload = png_bytes(512)
+        
+        async def chunks():
+            # No Content-Length, so the limit is enforced while streaming
+            for start in range(0, len(payload), 1000):
+                yield payload[start:start + 1000]
+        
+        def handler(request):
+            if request.url.path == '/missing.png':
+                return httpx.Response(404)
+            return httpx.Response(200, content=chunks())
+        
+        generator = StubGenerator()
+        generator.max_download_bytes = len(payload) // 2
+        
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            with pytest.raises(Exception, match="byte limit"):
+                await generator.download_image(client, 'https://cdn.example.com/big.png')
+            with pytest.raises(Exception, match="status 404"):
+                await generator.download_image(client, 'https://cdn.example.com/missing.png')
+    
+    def test_inline_payloads_decoded(self):
+        """Test that base64 payloads and data: URIs decode without a download."""
+        encoded = base64.b64encode(png_bytes(512)).decode('ascii')
+        generator = StubGenerator()
+        generator.working_size = 64
+        
+        assert generator.decode_image(encoded).size == (64, 64)
+        assert generator.decode_image(f"data:image/png;base64,{encoded}").size == (64, 64)
+        
+        generator.max_download_bytes = 100
+        with pytest.raises(Exception, match="byte limit"):
+            generator.decode_image(encoded)
+        generator.max_download_bytes = 1 << 20
+        with pytest.raises(Exception, match="Invalid base64"):
+            generator.decode_image("not*base64")
+    
+    @pytest.mark.asyncio
+    async def test_downloads_overlap_and_keep_order(self):
+        """Test that pending downloads resolve concurrently, in variation order."""
+        in_flight = 0
+        peak = 0
+        
+        async def handler(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.05)
+            in_flight -= 1
+            size = int(request.url.path.strip('/').split('.')[0])
+            return httpx.Response(200, content=png_bytes(size))
+        
+        generator = StubGenerator()
+        inline = generator.decode_image(base64.b64encode(png_bytes(8)).decode('ascii'))
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            pending = [
+                asyncio.create_task(generator.fetch_image(client, 'https://cdn.example.com/30.png')),
+                inline,
+                asyncio.create_task(generator.fetch_image(client, 'https://cdn.example.com/20.png')),
+            ]
+            images = await generator.collect_images(pending)
+        
+        assert [image.size for image in images] == [(30, 30), (8, 8), (20, 20)]
+        assert peak == 2
+    
+    @pytest.mark.asyncio
+    async def test_downloads_cancelled_when_a_later_request_fails(self, monkeypatch):
+        """Test that downloads started before a failed prediction are cancelled, not left running."""
+        predictions = 0
+        download_started = asyncio.Event()
+        download_cancelled = False
+        
+        async def handler(request):
+            nonlocal predictions, download_cancelled
+            if request.url.path.endswith('/predictions'):
+                predictions += 1
+                if predictions == 1:
+                    return httpx.Response(201, json={'status': 'succeeded', 'output': ['https://cdn.example.com/16.png']})
+                # Fail only once the first download is in flight
+                await download_started.wait()
+                return httpx.Response(500, text='boom')
+            download_started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                download_cancelled = True
+                raise
+            return httpx.Response(200, content=png_bytes(16))
+        
+        generator = ReplicateGenerator(api_key='test-token')
+        monkeypatch.setattr(generator, 'http_client', lambda **kwargs: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        
+        with pytest.raises(Exception, match='status 500'):
+            await generator.generate('a cat', variations=2)
+        
+        assert download_cancelled
+        assert [task for task in asyncio.all_tasks() if task is not asyncio.current_task()] == []
+    
+    def test_sources_not_counted_as_sprites(self, temp_output_dir):
+        """Test that archived sources sit beside sprites without being counted."""
+        manager = OutputManager(str(temp_output_dir))
+        session_path = manager.create_session_folder()
+        manager.save_source(Image.new('RGB', (512, 512), 'red'), 'openai', 1, session_path)
+        manager.save_image(Image.new('RGB', (16, 16), 'red'), 'openai', 1, session_path)
+        
+        assert (session_path / 'openai' / 'source_1.png').exists()
+        assert "Total: 1 images" in manager.create_session_summary(session_path)
+    
+    def test_sprite_sizes_saved_together(self, temp_output_dir):
+        """Test that extra sprite sizes sit beside the primary without being counted."""
+        manager = OutputManager(str(temp_output_dir))
+        session_path = manager.create_session_folder()
+        sprites = {size: Image.new('RGB', (size, size), 'red') for size in (16, 32, 64)}
+        
+        paths = manager.save_sprite_sizes(sprites, 'openai', 1, session_path, primary_size=32)
+        
+        assert [path.name for path in paths] == ['variation_1.png', 'variation_1_16x16.png', 'variation_1_64x64.png']
+        with Image.open(paths[0]) as primary:
+            assert primary.size == (32, 32)
+        assert "Total: 1 images" in manager.create_session_summary(session_path)
@@ -0,0 +1,111 @@
+import json
+from types import SimpleNamespace
+import pytest
+from PIL import Image, ImageDraw
+from src import main as cli
+from src.generators.base import ImageGenerator
+from src.generators.registry import GeneratorRegistry
+from src.utils.file_manager import OutputManager
+from src.utils.journal import JOURNAL_FILENAME, SessionJournal
+
+
+class CountingGenerator(ImageGenerator):
+    """Generator drawing numbered squares and counting the variations asked for."""
+
+    def __init__(self, name, calls):
+        super().__init__(api_key='test')
+        self.name = name
+        self.calls = calls
+
+    def get_service_name(self) -> str:
+        return self.name
+
+    def is_available(self) -> bool:
+        return True
+
+    async def generate(self, prompt, variations=1, seeds=None):
+        self.calls.append((self.name, variations))
+        images = []
+        for n in range(variations):
+            image = Image.new('RGB', (128, 128), 'white')
+            ImageDraw.Draw(image).rectangle((16 * n, 32, 16 * n + 40, 96), fill=(40 * n, 0, 200))
+            images.append(image)
+        return images
+
+
+class TestJournal:
+    """Integration tests for the session journal and resume."""
+
+    def test_load_tolerates_torn_lines(self, temp_output_dir):
+        """Test replaying a journal whose last line was cut short by a crash."""
+        journal = SessionJournal(temp_output_dir)
+        journal.record('start', query='a cat', prompt='a cat', variations=3, providers=['openai', 'stability'],
+                       classification={}, options={})
+        journal.record('provider', provider='openai', variations_generated=3, errors=[], template='game-art')
+        journal.record('image', provider='openai', variation=1, quality={'provider': 'openai', 'variation': 1, 'score': 0.5})
+        journal.record('skipped', provider='openai', variation=2, reason='duplicate', quality=None)
+        with open(temp_output_dir / JOURNAL_FILENAME, 'a') as f:
+            f.write('{"event": "image", "provider": "openai", "vari')
+
+        state = SessionJournal.load(temp_output_dir)
+        assert not state.finished
+        assert state.missing() == {'openai': [3], 'stability': [1, 2, 3]}
+        results = state.results()
+        assert results['openai']['variations_generated'] == 2
+        assert results['openai']['template'] == 'game-art'
+        assert results['stability']['errors'] == ['did not finish']
+        assert [entry['variation'] for entry in state.quality()] == [1]
+
+    @pytest.mark.asyncio
+    async def test_resume_regenerates_only_missing(self, temp_output_dir, monkeypatch):
+        """Test that resume after a crash calls only the providers whose variations were lost."""
+        calls = []
+
+        class Classifier:
+            async def classify(self, query):
+                return SimpleNamespace(
+                    is_image_request=True, confidence=1.0, image_description=query, rejection_reason=None
+                )
+
+        class Registry(GeneratorRegistry):
+            def _register_all_generators(self):
+                self.generators = {name: CountingGenerator(name, calls) for name in ('alpha', 'beta')}
+
+        monkeypatch.setattr(cli, 'QueryClassifier', Classifier)
+        monkeypatch.setattr(cli, 'GeneratorRegistry', Registry)
+
+        # Die while saving the third image (beta's first)
+        save_image = OutputManager.save_image
+        saves = []
+
+        def crashing_save(self, *args, **kwargs):
+            saves.append(args)
+            if len(saves) == 3:
+                raise KeyboardInterrupt
+            return save_image(self, *args, **kwargs)
+
+        monkeypatch.setattr(OutputManager, 'save_image', crashing_save)
+        with pytest.raises(SystemExit):
+            await cli.async_main('a blue block', 2, str(temp_output_dir), False, share=False)
+        session = next(path for path in temp_output_dir.iterdir() if path.is_dir())
+        assert not (session / 'metadata.json').exists()
+        assert SessionJournal.load(session).missing() == {'beta': [1, 2]}
+
+        monkeypatch.setattr(OutputManager, 'save_image', save_image)
+        calls.clear()
+        await cli.async_resume(session)
+
+        assert calls == [('beta', 2)]
+        assert sorted(path.name for path in (session / 'beta').iterdir()) == ['variation_1.png', 'variation_2.png']
+        metadata = json.loads((session / 'metadata.json').read_text())
+        assert metadata['query'] == 'a blue block'
+        assert metadata['providers']['beta']['variations_generated'] == 2
+        assert [(entry['provider'], entry['variation']) for entry in metadata['quality']] == [
+            ('alpha', 1), ('alpha', 2), ('beta', 1), ('beta', 2)
+        ]
+        assert SessionJournal.load(session).finished
+
+        # A finished session has nothing left to do
+        calls.clear()
+        await cli.async_resume(session)
+        assert calls == []
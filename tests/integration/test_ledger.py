@@ -0,0 +1,158 @@
+import asyncio
+import json
+from types import SimpleNamespace
+import pytest
+from click.testing import CliRunner
+from PIL import Image
+from src import main as cli
+from src.generators.base import ImageGenerator
+from src.generators.registry import GeneratorRegistry
+from src.utils.ledger import CostLedger
+
+
+class PricedGenerator(ImageGenerator):
+    """Generator that records how many images each call asked for."""
+
+    def __init__(self, name, calls):
+        super().__init__(api_key='test')
+        self.name = name
+        self.calls = calls
+
+    def get_service_name(self) -> str:
+        return self.name
+
+    def is_available(self) -> bool:
+        return True
+
+    async def generate(self, prompt, variations=1, seeds=None):
+        self.calls.append((self.name, variations))
+        return [Image.new('RGB', (64, 64), (40 * n, 120, 200)) for n in range(variations)]
+
+
+class SlowGenerator(PricedGenerator):
+    """Priced generator slow enough for a concurrent run to join its flight."""
+
+    async def generate(self, prompt, variations=1, seeds=None):
+        await asyncio.sleep(0.3)
+        return await super().generate(prompt, variations, seeds)
+
+
+def priced_registry(calls, generator=PricedGenerator):
+    class Registry(GeneratorRegistry):
+        def _register_all_generators(self):
+            self.generators = {name: generator(name, calls) for name in ('pricey', 'cheap')}
+    return Registry
+
+
+class TestCostLedger:
+    """Integration tests for cost accounting and budget-aware scheduling."""
+
+    @pytest.mark.asyncio
+    async def test_budgets_cap_and_redistribute(self, temp_output_dir, monkeypatch):
+        """Test that work a provider can't afford moves to others, and reservations stop overspending."""
+        monkeypatch.setenv('PRICE_PRICEY', '0.02')
+        monkeypatch.setenv('PRICE_CHEAP', '0.001')
+        calls = []
+        registry = priced_registry(calls)()
+        ledger = CostLedger(temp_output_dir, budgets={'pricey': 0.05})
+        registry.set_ledger(ledger)
+
+        results = await registry.generate_all('a torch', 3)
+        assert sorted(calls) == [('cheap', 4), ('pricey', 2)]
+        assert results['pricey']['cost'] == pytest.approx(0.04)
+        assert ledger.remaining('pricey') == pytest.approx(0.01)
+
+        # No provider is asked for more than one call's worth of variations
+        calls.clear()
+        results = await registry.generate_all('a torch', 3)
+        assert calls == [('cheap', 4)]
+        assert results['pricey']['variations_generated'] == 0
+        assert results['pricey']['errors'][0].startswith('Over budget')
+
+        # Resumes keep the variations they can afford instead of moving them
+        ledger.budgets['pricey'] = 0.10
+        calls.clear()
+        await registry.generate_some('a torch', {'pricey': 4, 'cheap': 1}, seeds={'pricey': [1, 2, 3, 4]})
+        assert sorted(calls) == [('cheap', 1), ('pricey', 3)]
+
+        # A second allocation can't spend what the first reserved
+        ledger.budgets['pricey'] = 0.20
+        first = ledger.allocate({'pricey': 4}, {'pricey': 0.02})
+        second = ledger.allocate({'pricey': 4}, {'pricey': 0.02})
+        assert (first.counts['pricey'], second.counts['pricey']) == (4, 1)
+        ledger.release(first.reservations['pricey'])
+        ledger.release(second.reservations['pricey'])
+        assert ledger.remaining('pricey') == pytest.approx(0.20 - 0.10)
+
+    def test_redistribution_prefers_known_cheap_prices(self, temp_output_dir):
+        """Test that unknown prices take redistributed work last and nobody exceeds the cap."""
+        ledger = CostLedger(temp_output_dir, budgets={'pricey': 0.0})
+        prices = {'pricey': 0.02, 'unknown': None, 'cheap': 0.001}
+        allocation = ledger.allocate({'pricey': 3, 'unknown': 1, 'cheap': 1}, prices, redistribute=True)
+        assert allocation.counts == {'pricey': 0, 'unknown': 2, 'cheap': 3}
+
+        allocation = ledger.allocate({'pricey': 4, 'unknown': 1, 'cheap': 1}, prices, True, max_per_provider=2)
+        assert allocation.counts == {'pricey': 0, 'unknown': 2, 'cheap': 2}
+
+    @pytest.mark.asyncio
+    async def test_sessions_report_cost_per_sprite(self, temp_output_dir, monkeypatch):
+        """Test that sessions charge the ledger, record their cost and show up in the costs report."""
+        monkeypatch.setenv('PRICE_PRICEY', '0.02')
+        monkeypatch.setenv('PRICE_CHEAP', '0.001')
+        calls = []
+
+        class Classifier:
+            async def classify(self, query):
+                return SimpleNamespace(
+                    is_image_request=True, confidence=1.0, image_description=query, rejection_reason=None
+                )
+
+        monkeypatch.setattr(cli, 'QueryClassifier', Classifier)
+        monkeypatch.setattr(cli, 'GeneratorRegistry', priced_registry(calls))
+
+        session = await cli.async_main(
+            'a red potion', 2, str(temp_output_dir), False, best_of=3, budgets={'pricey': 0.03}, share=False
+        )
+        # Best-of asks each provider for 2 more; pricey's cut tops cheap up to the cap
+        assert sorted(calls) == [('cheap', 4), ('pricey', 1)]
+        metadata = json.loads((session / 'metadata.json').read_text())
+        assert metadata['providers']['pricey']['cost'] == pytest.approx(0.02)
+        assert metadata['total_cost'] == pytest.approx(0.024)
+
+        result = CliRunner().invoke(cli.main, ['costs', '--output-dir', str(temp_output_dir), '--json'])
+        assert result.exit_code == 0, result.output
+        report = {entry['provider']: entry for entry in json.loads(result.output)}
+        assert report['pricey']['images'] == 1 and report['cheap']['images'] == 4
+        assert report['pricey']['sprites'] + report['cheap']['sprites'] == 3
+        assert report['cheap']['requests'] == 4
+        total = sum(entry['cost'] for entry in report.values())
+        assert total == pytest.approx(0.024)
+        sprites = report['cheap']['sprites']
+        assert report['cheap']['cost_per_sprite'] == pytest.approx(0.004 / sprites)
+
+        result = CliRunner().invoke(cli.main, ['costs', '--output-dir', str(temp_output_dir)])
+        assert 'per sprite' in result.output and 'pricey' in result.output
+
+    @pytest.mark.asyncio
+    async def test_shared_results_cost_nothing(self, temp_output_dir, monkeypatch):
+        """Test that a session reusing another run's results doesn't count their cost again."""
+        monkeypatch.setenv('PRICE_PRICEY', '0.02')
+        monkeypatch.setenv('PRICE_CHEAP', '0.001')
+        calls = []
+
+        class Classifier:
+            async def classify(self, query):
+                return SimpleNamespace(
+                    is_image_request=True, confidence=1.0, image_description=query, rejection_reason=None
+                )
+
+        monkeypatch.setattr(cli, 'QueryClassifier', Classifier)
+        monkeypatch.setattr(cli, 'GeneratorRegistry', priced_registry(calls, SlowGenerator))
+
+        sessions = await asyncio.gather(*(
+            cli.async_main('a blue shield', 1, str(temp_output_dir), False, seed=7) for _ in range(2)
+        ))
+        assert sorted(calls) == [('cheap', 1), ('pricey', 1)]
+        totals = sorted(json.loads((session / 'metadata.json').read_text())['total_cost'] for session in sessions)
+        assert totals == [0.0, pytest.approx(0.021)]
+        assert sum(entry['cost'] for entry in CostLedger(temp_output_dir).report()) == pytest.approx(0.021)
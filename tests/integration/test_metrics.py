@@ -0,0 +1,93 @@
+import os
+import threading
+import httpx
+import pytest
+from src.utils.metrics import MetricsRegistry, merge_snapshots, render, start_metrics_server
+
+
+class TestMetrics:
+    """Integration tests for the metrics registry."""
+    
+    def test_counters_sum_thread_shards(self):
+        """Test that per-thread counter shards add up without losing increments."""
+        registry = MetricsRegistry()
+        requests = registry.counter('test_requests_total', 'Requests', ['provider']).labels('openai')
+        
+        def work():
+            for _ in range(10000):
+                requests.inc()
+        
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert 'test_requests_total{provider="openai"} 80000' in registry.exposition()
+    
+    def test_gauge_set_overrides_increments(self):
+        """Test that set() replaces the value built up by inc() and dec()."""
+        registry = MetricsRegistry()
+        entries = registry.gauge('test_entries', 'Entries', ['cache']).labels('preview')
+        entries.inc(3)
+        entries.set(5)
+        entries.dec()
+        
+        assert 'test_entries{cache="preview"} 4' in registry.exposition()
+    
+    def test_histogram_exposition(self):
+        """Test cumulative buckets, sum and count in the text format."""
+        registry = MetricsRegistry()
+        latency = registry.histogram('test_seconds', 'Latency', buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            latency.observe(value)
+        
+        text = registry.exposition()
+        
+        assert '# TYPE test_seconds histogram' in text
+        assert 'test_seconds_bucket{le="0.1"} 2' in text
+        assert 'test_seconds_bucket{le="1"} 3' in text
+        assert 'test_seconds_bucket{le="+Inf"} 4' in text
+        assert 'test_seconds_sum 3.65' in text
+        assert 'test_seconds_count 4' in text
+    
+    def test_merge_across_processes(self):
+        """Test that counters are summed and gauges kept per live process."""
+        registry = MetricsRegistry()
+        registry.counter('test_total', 'Total').inc(3)
+        registry.gauge('test_entries', 'Entries').set(7)
+        snapshot = registry.snapshot()
+        
+        dead_pid = 2 ** 22 + 12345
+        text = render(merge_snapshots([(os.getpid(), snapshot), (dead_pid, snapshot)]))
+        
+        assert 'test_total 6' in text
+        assert f'test_entries{{pid="{os.getpid()}"}} 7' in text
+        assert f'pid="{dead_pid}"' not in text
+    
+    def test_registration_is_idempotent(self):
+        """Test that re-registering returns the same family and shape changes fail."""
+        registry = MetricsRegistry()
+        first = registry.counter('test_total', 'Total', ['provider'])
+        
+        assert registry.counter('test_total', 'Total', ['provider']) is first
+        with pytest.raises(ValueError):
+            registry.counter('test_total', 'Total', ['status'])
+        with pytest.raises(ValueError):
+            first.labels('openai', 'extra')
+    
+    def test_standalone_metrics_server(self):
+        """Test the /metrics server used by long-running workers."""
+        registry = MetricsRegistry()
+        registry.counter('test_jobs_total', 'Jobs').inc(2)
+        server = start_metrics_server(0, host='127.0.0.1', registry=registry)
+        try:
+            port = server.server_address[1]
+            response = httpx.get(f'http://127.0.0.1:{port}/metrics')
+            missing = httpx.get(f'http://127.0.0.1:{port}/other')
+        finally:
+            server.shutdown()
+        
+        assert response.status_code == 200
+        assert 'test_jobs_total 2' in response.text
+        assert missing.status_code == 404
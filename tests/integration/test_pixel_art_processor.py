@@ -1,11 +1,14 @@
 import pytest
-from PIL import Image
+from PIL import Image, ImageDraw
 import numpy as np
 from src.processors.pixel_art import (
     convert_to_pixel_art, 
+    convert_to_pixel_art_sizes,
     enhance_pixel_art_prompt,
     create_pixel_grid,
-    analyze_pixel_art
+    analysis_sample,
+    analyze_pixel_art,
+    remove_background
 )
 
 
@@ -62,7 +65,7 @@ class TestPixelArtProcessor:
         # Test with prompt that already mentions pixel art
         prompt2 = "a pixel art dragon sprite"
         enhanced2 = enhance_pixel_art_prompt(prompt2)
-        assert enhanced2 == prompt2  # Should not add redundant keywords
+        assert enhanced2 == f"{prompt2}, 16-bit"  # Only fragments the prompt lacks
     
     def test_create_pixel_grid(self):
         """Test pixel grid preview creation."""
@@ -76,6 +79,20 @@ class TestPixelArtProcessor:
         expected_size = 4 * 10 + 5 * 1
         assert preview.size == (expected_size, expected_size)
     
+    def test_create_pixel_grid_pixel_placement(self):
+        """Test that grid lines and enlarged pixels land in the right places."""
+        test_image = Image.new('RGB', (2, 2), color=(0, 0, 0))
+        test_image.putpixel((1, 0), (255, 0, 0))
+        
+        preview = create_pixel_grid(test_image, pixel_size=3, grid_color=(9, 9, 9), grid_width=1)
+        
+        assert preview.getpixel((0, 0)) == (9, 9, 9)
+        assert preview.getpixel((1, 1)) == (0, 0, 0)
+        assert preview.getpixel((4, 1)) == (9, 9, 9)
+        assert preview.getpixel((5, 1)) == (255, 0, 0)
+        assert preview.getpixel((7, 3)) == (255, 0, 0)
+        assert preview.getpixel((5, 5)) == (0, 0, 0)
+    
     def test_analyze_pixel_art(self):
         """Test pixel art analysis."""
         # Create a test image with known properties
@@ -96,6 +113,12 @@ class TestPixelArtProcessor:
         assert analysis['unique_colors'] == 4
         assert len(analysis['dominant_colors']) <= 5
         assert analysis['mode'] == 'RGB'
+        
+        # Full-resolution images are analyzed on a sprite-sized sample with the same colors
+        large = test_image.resize((1024, 1024), Image.Resampling.NEAREST)
+        sample = analysis_sample(large)
+        assert sample.size == (64, 64) and analysis_sample(test_image) is test_image
+        assert analyze_pixel_art(sample)['unique_colors'] == 4
     
     def test_convert_non_rgb_image(self):
         """Test conversion of non-RGB images."""
@@ -105,4 +128,68 @@ class TestPixelArtProcessor:
         pixel_art = convert_to_pixel_art(test_image, size=16)
         
         assert pixel_art.mode == 'RGB'
-        assert pixel_art.size == (16, 16)
\ No newline at end of file
+        assert pixel_art.size == (16, 16)
+    
+    def test_convert_to_multiple_sizes(self):
+        """Test multi-size conversion with a palette shared across sizes."""
+        rng = np.random.default_rng(0)
+        test_image = Image.fromarray(rng.integers(0, 256, (256, 256, 3), dtype=np.uint8))
+        
+        sprites = convert_to_pixel_art_sizes(test_image, [32, 16, 64, 16], color_palette_size=8)
+        
+        assert sorted(sprites) == [16, 32, 64]
+        assert all(sprite.size == (size, size) and sprite.mode == 'RGB' for size, sprite in sprites.items())
+        # Every size only uses colors from one palette, picked on the smallest size
+        plain = convert_to_pixel_art_sizes(test_image, [32, 16, 64], color_palette_size=8, dithering=False)
+        palette = {color for _, color in plain[16].getcolors()}
+        for size in (16, 32, 64):
+            assert {color for _, color in sprites[size].getcolors()} <= palette
+        # Dithering applies to the smallest size as well as the larger ones
+        assert all(sprites[size].tobytes() != plain[size].tobytes() for size in (16, 32, 64))
+        # The smallest sprite matches a single-size conversion at that size
+        single = convert_to_pixel_art(test_image, size=16, color_palette_size=8)
+        assert sprites[16].tobytes() == single.tobytes()
+    
+    def test_transparent_background(self):
+        """Test that the border-connected background is removed and the subject kept."""
+        rng = np.random.default_rng(0)
+        noise = rng.normal(0, 4, (256, 256, 3))
+        test_image = Image.fromarray(np.clip(240 + noise, 0, 255).astype(np.uint8))
+        draw = ImageDraw.Draw(test_image)
+        draw.ellipse((48, 48, 208, 208), fill=(200, 30, 30))
+        # Background-colored highlight inside the subject must stay opaque
+        draw.ellipse((112, 112, 144, 144), fill=(240, 240, 240))
+        
+        for pixel_art in (
+            convert_to_pixel_art(test_image, size=16, transparent=True),
+            convert_to_pixel_art_sizes(test_image, [16, 32], transparent=True)[32],
+        ):
+            alpha = np.asarray(pixel_art)[..., 3]
+            side = pixel_art.size[0]
+            assert pixel_art.mode == 'RGBA'
+            assert alpha[0, 0] == 0 and alpha[side // 2, side // 2] == 255
+            assert alpha[side // 2, side // 4] == 255
+        
+        analysis = analyze_pixel_art(pixel_art)
+        assert analysis['transparent_pixels'] == int((alpha == 0).sum())
+        # The removed background no longer counts as the dominant color
+        red, green, _ = analysis['dominant_colors'][0]
+        assert red > 150 and green < 100
+        
+        preview = create_pixel_grid(pixel_art, pixel_size=4)
+        assert preview.mode == 'RGBA'
+        assert preview.getpixel((0, 0))[3] == 255 and preview.getpixel((2, 2))[3] == 0
+    
+    def test_no_background_stays_opaque(self):
+        """Test that images without a uniform border are left fully opaque."""
+        rng = np.random.default_rng(1)
+        test_image = Image.fromarray(rng.integers(0, 256, (64, 64, 3), dtype=np.uint8))
+        
+        assert convert_to_pixel_art(test_image, size=16, transparent=True).mode == 'RGB'
+        assert np.asarray(remove_background(test_image))[..., 3].min() == 255
+        
+        # Sources that are already transparent keep their alpha
+        rgba = Image.new('RGBA', (64, 64), (0, 0, 0, 0))
+        ImageDraw.Draw(rgba).rectangle((16, 16, 47, 47), fill=(0, 0, 255, 255))
+        alpha = np.asarray(convert_to_pixel_art(rgba, size=16, transparent=True))[..., 3]
+        assert alpha[0, 0] == 0 and alpha[8, 8] == 255
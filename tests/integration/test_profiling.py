@@ -0,0 +1,42 @@
+import pstats
+from PIL import Image
+from src.processors.pixel_art import convert_to_pixel_art
+from src.utils.file_manager import OutputManager
+from src.utils.profiling import Profiler
+
+
+class TestProfiler:
+    """Integration tests for the CLI profiling mode."""
+    
+    def test_profile_written_to_session(self, temp_output_dir):
+        """Test that a profiled run leaves pstats and a summary next to metadata.json."""
+        manager = OutputManager(str(temp_output_dir))
+        session_path = manager.create_session_folder()
+        profiler = Profiler(top=10)
+        
+        profiler.start()
+        for i in range(1, 3):
+            with profiler.stage('convert_to_pixel_art'):
+                sprite = convert_to_pixel_art(Image.new('RGB', (256, 256), 'blue'))
+            with profiler.stage('save_image'):
+                manager.save_image(sprite, 'openai', i, session_path)
+        profiler.stop()
+        pstats_path, summary_path = profiler.write(session_path)
+        
+        assert pstats_path.parent == session_path
+        stats = pstats.Stats(str(pstats_path))
+        assert any(func[2] == 'convert_to_pixel_art' for func in stats.stats)
+        
+        summary = summary_path.read_text()
+        assert "Top 10 functions by cumulative time" in summary
+        assert "convert_to_pixel_art: 2 calls" in summary
+        assert "save_image: 2 calls" in summary
+    
+    def test_stage_without_tracing_is_noop(self):
+        """Test that stages outside a profiled run record nothing."""
+        profiler = Profiler()
+        
+        with profiler.stage('convert_to_pixel_art'):
+            convert_to_pixel_art(Image.new('RGB', (64, 64), 'red'))
+        
+        assert profiler.stages == {}
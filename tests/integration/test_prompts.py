@@ -0,0 +1,66 @@
+import pytest
+from src.generators.registry import GeneratorRegistry
+from src.generators.stability_generator import StabilityGenerator
+from src.processors.prompts import CONCEPT_PATTERNS, FRAGMENT_CONCEPTS, PROVIDER_TEMPLATES, PromptEngine
+from src.utils.file_manager import OutputManager
+
+
+class TestPrompts:
+    """Integration tests for the prompt template engine."""
+
+    def test_render_adds_each_concept_once(self):
+        """Test that templates only add fragments the prompt does not already express."""
+        engine = PromptEngine()
+
+        assert engine.render("a cute cat", 'stability') == "a cute cat, pixel art style, 16-bit, retro game sprite, pixelated"
+        assert engine.render("an 8-bit Pixel-Art knight", 'stability') == "an 8-bit Pixel-Art knight, retro game sprite, pixelated"
+        assert engine.render("a cat", 'openai', 'palette').endswith("retro game sprite, limited color palette")
+        # Unknown providers and template names fall back to defaults
+        assert engine.render("a cat", 'krea', 'nope') == engine.render("a cat")
+
+        for prompt in ("a robot", "a pixel art robot sprite", "a low-res 16 bit pixelated robot"):
+            for provider in PROVIDER_TEMPLATES:
+                for template in engine.templates_for(provider):
+                    added = engine.render(prompt, provider, template.name)[len(prompt) + 2:].split(', ')
+                    concepts = [FRAGMENT_CONCEPTS[fragment] for fragment in added if fragment]
+                    assert len(set(concepts)) == len(concepts)
+                    assert not any(CONCEPT_PATTERNS[concept].search(prompt) for concept in concepts)
+
+        engine.render("a cute cat", 'stability')
+        assert engine.render.cache_info().hits >= 1
+
+    def test_generators_use_chosen_template(self, monkeypatch):
+        """Test that the registry hands each generator its template."""
+        monkeypatch.setenv('STABILITY_API_KEY', 'test')
+        for key in ('OPENAI_API_KEY', 'FREEPIK_API_KEY', 'REPLICATE_API_TOKEN'):
+            monkeypatch.delenv(key, raising=False)
+        registry = GeneratorRegistry()
+        generator = registry.generators['stability']
+        assert isinstance(generator, StabilityGenerator)
+        usual_key = registry.flight_key("a cat", 1)
+
+        registry.set_prompt_templates({'stability': '8-bit'})
+        assert generator.style_prompt("a cat").endswith("8-bit, retro game sprite, pixelated, low resolution")
+        assert registry.flight_key("a cat", 1) != usual_key
+
+    def test_choose_template_from_catalog_scores(self, temp_output_dir):
+        """Test that untried templates run first, then the best-scoring one wins."""
+        engine = PromptEngine()
+        manager = OutputManager(str(temp_output_dir))
+        assert engine.choose_template('openai', manager.catalog.template_stats().get('openai')).name == 'game-art'
+
+        runs = (('game-art', [0.5, 0.6]), ('palette', [0.8, 0.9]), ('palette', [0.7]))
+        for n, (template, scores) in enumerate(runs):
+            session_path = temp_output_dir / f"session-{n}"
+            session_path.mkdir()
+            results = {'openai': {'variations_requested': len(scores), 'variations_generated': len(scores),
+                                  'errors': [], 'template': template}}
+            quality = [{'provider': 'openai', 'variation': i, 'score': score} for i, score in enumerate(scores, 1)]
+            manager.save_metadata('a cat', {'image_description': 'a cat'}, results, session_path, quality=quality)
+
+        stats = manager.catalog.template_stats()['openai']
+        assert stats['game-art'] == (2, pytest.approx(0.55))
+        assert stats['palette'] == (3, pytest.approx(0.8))
+        assert engine.choose_template('openai', stats).name == 'palette'
+        # Only the first template was tried, so the second is next
+        assert engine.choose_template('openai', {'game-art': (2, 0.9)}).name == 'palette'
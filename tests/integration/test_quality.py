@@ -0,0 +1,88 @@
+import json
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFilter
+from src import main as cli
+from src.generators.base import ImageGenerator
+from src.generators.registry import GeneratorRegistry
+from src.processors.quality import score_sprite, score_sprites, top_scores
+
+
+def clean_sprite():
+    """A readable 16x16 sprite: a shaded red ball on a plain background."""
+    image = Image.new('RGB', (16, 16), (240, 240, 240))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((3, 3, 12, 12), fill=(200, 40, 40))
+    draw.rectangle((6, 6, 8, 8), fill=(40, 40, 40))
+    return image
+
+
+def blurry_sprite():
+    return clean_sprite().resize((128, 128)).filter(ImageFilter.GaussianBlur(6)).resize((16, 16), Image.Resampling.BILINEAR)
+
+
+def noise_sprite():
+    return Image.fromarray(np.random.default_rng(0).integers(0, 256, (16, 16, 3), dtype=np.uint8))
+
+
+class CannedGenerator(ImageGenerator):
+    """Generator returning pre-made images, upscaled like provider output."""
+
+    def __init__(self, images):
+        super().__init__(api_key='test')
+        self.images = images
+
+    def get_service_name(self) -> str:
+        return 'canned'
+
+    def is_available(self) -> bool:
+        return True
+
+    async def generate(self, prompt, variations=1, seeds=None):
+        return [image.resize((128, 128), Image.Resampling.NEAREST) for image in self.images[:variations]]
+
+
+class TestQuality:
+    """Integration tests for sprite quality scoring and best-of-N selection."""
+
+    def test_scores_rank_sprites(self):
+        """Test that clean sprites outscore blurry, noisy and blank ones, in any batch."""
+        blank = Image.new('RGB', (16, 16), (90, 90, 90))
+        larger = clean_sprite().resize((32, 32), Image.Resampling.NEAREST)
+        images = [noise_sprite(), blurry_sprite(), blank, clean_sprite(), larger]
+        scores = score_sprites(images)
+
+        assert [score['score'] for score in scores] == [score_sprite(image)['score'] for image in images]
+        assert scores[3]['score'] > scores[1]['score'] > scores[0]['score'] > scores[2]['score']
+        assert all(0 <= value <= 1 for score in scores for value in score.values())
+        assert sorted(top_scores(scores, 2)) == [3, 4]
+        assert top_scores(scores, 10)[2:] == [1, 0, 2]
+
+    @pytest.mark.asyncio
+    async def test_best_of_keeps_top_sprites(self, temp_output_dir, monkeypatch):
+        """Test that --best-of saves only the top-scoring sprites and records every score."""
+        class Classifier:
+            async def classify(self, query):
+                return SimpleNamespace(
+                    is_image_request=True, confidence=1.0, image_description=query, rejection_reason=None
+                )
+
+        class Registry(GeneratorRegistry):
+            def _register_all_generators(self):
+                self.generators = {'canned': CannedGenerator([noise_sprite(), clean_sprite(), blurry_sprite()])}
+
+        monkeypatch.setattr(cli, 'QueryClassifier', Classifier)
+        monkeypatch.setattr(cli, 'GeneratorRegistry', Registry)
+
+        await cli.async_main('a red ball', 3, str(temp_output_dir), False, best_of=1)
+
+        session = next(path for path in temp_output_dir.iterdir() if path.is_dir())
+        assert sorted(path.name for path in (session / 'canned').iterdir()) == ['variation_2.png']
+        quality = json.loads((session / 'metadata.json').read_text())['quality']
+        assert [(entry['variation'], entry['kept']) for entry in quality] == [(1, False), (2, True), (3, False)]
+
+        # Best-of generates extra candidates, so one variation still has one to beat
+        session = await cli.async_main('a red ball', 1, str(temp_output_dir), False, best_of=1)
+        quality = json.loads((session / 'metadata.json').read_text())['quality']
+        assert [(entry['variation'], entry['kept']) for entry in quality] == [(1, False), (2, True)]
@@ -0,0 +1,144 @@
+import base64
+import io
+import json
+import httpx
+import numpy as np
+import pytest
+from click.testing import CliRunner
+from openai import AsyncOpenAI
+from PIL import Image
+from src import main as cli
+from src.generators.openai_generator import OpenAIGenerator
+from src.generators.registry import GeneratorRegistry
+from src.generators.stability_generator import StabilityGenerator
+from src.processors.recolor import recolor_sprites, shift_hue, swap_colors
+from src.utils.file_manager import OutputManager
+from src.utils.journal import JOURNAL_FILENAME
+
+
+RED, DARK_RED, GREEN = (200, 40, 40), (150, 30, 30), (30, 160, 60)
+
+
+def sample_sprite(size=16, mode='RGB'):
+    pixels = np.zeros((size, size, 4), dtype=np.uint8)
+    pixels[...] = GREEN + (255,)
+    pixels[size // 4:, :] = RED + (255,)
+    pixels[size // 2:, :] = DARK_RED + (255,)
+    if mode == 'RGBA':
+        pixels[0, 0] = 0
+    return Image.fromarray(pixels, 'RGBA').convert(mode)
+
+
+def png_bytes(image):
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def colors(image):
+    return {tuple(color) for color in np.asarray(image.convert('RGB')).reshape(-1, 3)}
+
+
+class TestRegenerate:
+    """Integration tests for image-to-image regeneration and local recoloring."""
+
+    def test_recolor_stored_sprites(self, temp_output_dir):
+        """Test that recoloring remaps every size of every sprite through one palette, locally."""
+        sprites = [sample_sprite(), sample_sprite(32, 'RGBA')]
+        # Dark red is within the tolerance of red, so it keeps its offset from it
+        swapped = recolor_sprites(sprites, swap_colors({RED: (40, 40, 200)}, tolerance=60))
+        assert colors(swapped[0]) == {GREEN, (40, 40, 200), (0, 30, 190)}
+        assert colors(recolor_sprites(sprites, swap_colors({RED: (40, 40, 200)}))[0]) == {GREEN, (40, 40, 200), DARK_RED}
+        assert swapped[1].mode == 'RGBA' and swapped[1].getpixel((0, 0))[3] == 0
+        assert np.array_equal(np.asarray(swapped[1])[..., 3], np.asarray(sprites[1])[..., 3])
+        rotated = recolor_sprites(sprites, shift_hue(360))
+        assert all(np.array_equal(np.asarray(a), np.asarray(b)) for a, b in zip(rotated, sprites))
+
+        manager = OutputManager(str(temp_output_dir))
+        sessions = []
+        for _ in range(2):
+            session = manager.create_session_folder()
+            manager.save_sprite_sizes({16: sample_sprite(), 32: sample_sprite(32)}, 'openai', 1, session, 16)
+            sessions.append(session.name)
+
+        result = CliRunner().invoke(cli.main, [
+            'recolor', *sessions, '--swap', '#c82828=#2828c8', '--tolerance', '60', '--palette', '#1ea03c,#2828c8,#1e1e96',
+            '--output-dir', str(temp_output_dir), '--json'
+        ])
+        assert result.exit_code == 0, result.output
+        recolored = json.loads(result.output)
+        assert [entry['path'].rsplit('/', 1)[1] for entry in recolored] == ['variation_1.png', 'variation_2.png']
+        session = temp_output_dir / recolored[0]['path'].split('/')[-3]
+        small = Image.open(session / 'openai' / 'variation_2.png')
+        large = Image.open(session / 'openai' / 'variation_2_32x32.png')
+        assert colors(small) == colors(large) == {GREEN, (40, 40, 200)}
+        metadata = json.loads((session / 'metadata.json').read_text())
+        assert len(metadata['source']['sprites']) == 2
+
+    @pytest.mark.asyncio
+    async def test_regenerate_from_sprite(self, temp_output_dir):
+        """Test that providers get the sprite as input, sprites keep its palette and resume reuses it."""
+        requests = []
+        noise = Image.fromarray(np.random.default_rng(3).integers(0, 256, (8, 8, 3), dtype=np.uint8))
+        noise = noise.resize((128, 128), Image.Resampling.NEAREST)
+        payload = base64.b64encode(png_bytes(noise)).decode('ascii')
+
+        def handler(request):
+            requests.append(request)
+            if request.url.path.endswith('/images/variations'):
+                return httpx.Response(200, json={'created': 0, 'data': [{'b64_json': payload}] * 2})
+            return httpx.Response(200, json={'artifacts': [{'base64': payload, 'finishReason': 'SUCCESS'}]})
+
+        class Registry(GeneratorRegistry):
+            def _register_all_generators(self):
+                transport = httpx.MockTransport(handler)
+                stability = StabilityGenerator(api_key='test')
+                stability.http_client = lambda **kwargs: httpx.AsyncClient(transport=transport)
+                openai = OpenAIGenerator(api_key='test')
+                openai.client = AsyncOpenAI(api_key='test', http_client=httpx.AsyncClient(transport=transport))
+                self.generators = {'stability': stability, 'openai': openai}
+
+        manager = OutputManager(str(temp_output_dir))
+        sprite_path = manager.save_image(sample_sprite(), 'stability', 1, manager.create_session_folder())
+
+        session = await cli.async_regenerate(
+            sprite_path, 'a red banner', 2, str(temp_output_dir), strength=0.6, seed=5, registry=Registry()
+        )
+        stability = [request for request in requests if 'image-to-image' in request.url.path]
+        assert len(stability) == 2
+        body = stability[0].content
+        assert b'name="image_strength"\r\n\r\n0.6' in body and b'name="seed"\r\n\r\n5' in body
+        assert b'a red banner' in body
+        upload = Image.open(io.BytesIO(body[body.index(b'\x89PNG'):]))
+        assert upload.size == (384, 384)
+
+        saved = sorted((session / 'stability').glob('variation_*.png')) + sorted((session / 'openai').glob('variation_*.png'))
+        assert len(saved) == 4
+        for path in saved:
+            assert colors(Image.open(path)) <= {GREEN, RED, DARK_RED}
+        metadata = json.loads((session / 'metadata.json').read_text())
+        assert metadata['source'] == {'sprite': str(sprite_path), 'strength': 0.6, 'lock_palette': True}
+
+        # Lose Stability's second variation; resume generates it from the sprite again
+        journal = session / JOURNAL_FILENAME
+        lines = [
+            line for line in journal.read_text().splitlines()
+            if not ('"image"' in line and '"stability"' in line and '"variation": 2' in line)
+            and '"finish"' not in line
+        ]
+        journal.write_text('\n'.join(lines) + '\n')
+        (session / 'stability' / 'variation_2.png').unlink()
+        requests.clear()
+
+        class Resumed(Registry):
+            pass
+
+        original = cli.GeneratorRegistry
+        cli.GeneratorRegistry = Resumed
+        try:
+            await cli.async_resume(session)
+        finally:
+            cli.GeneratorRegistry = original
+        assert [request.url.path.rsplit('/', 1)[1] for request in requests] == ['image-to-image']
+        assert b'name="seed"\r\n\r\n6' in requests[0].content
+        assert colors(Image.open(session / 'stability' / 'variation_2.png')) <= {GREEN, RED, DARK_RED}
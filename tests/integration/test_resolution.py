@@ -0,0 +1,35 @@
+from src.generators.resolution import RESOLUTION_TIERS, negotiate_settings
+from src.generators.stability_generator import StabilityGenerator
+
+
+class TestResolutionNegotiation:
+    """Integration tests for per-provider resolution negotiation."""
+    
+    def test_smallest_tier_for_16px_sprites(self):
+        """Test that 16x16 sprites get each provider's cheapest settings."""
+        assert negotiate_settings('openai', 16).size == '256x256'
+        assert negotiate_settings('stability', 16).size == '384x384'
+        assert negotiate_settings('stability', 16).steps == 20
+        assert negotiate_settings('replicate', 16).steps == 20
+        assert negotiate_settings('unknown', 16) is None
+    
+    def test_tiers_grow_with_sprite_size(self):
+        """Test that larger sprites never get smaller sources, and sources stay >= 4x the sprite."""
+        for provider, tiers in RESOLUTION_TIERS.items():
+            previous = None
+            for sprite_size in (8, 16, 32, 64, 128, 256):
+                settings = negotiate_settings(provider, sprite_size)
+                if previous is not None:
+                    assert settings.width >= previous.width
+                if sprite_size <= 64:
+                    assert settings.width >= 4 * sprite_size
+                previous = settings
+    
+    def test_generator_uses_sprite_size(self):
+        """Test that generators negotiate from their sprite size."""
+        generator = StabilityGenerator(api_key='test')
+        
+        generator.sprite_size = 64
+        
+        assert generator.settings.size == '512x512'
+        assert generator.settings.model == 'stable-diffusion-v1-6'
@@ -0,0 +1,134 @@
+import base64
+import io
+import json
+from types import SimpleNamespace
+import httpx
+import numpy as np
+import pytest
+from PIL import Image
+from src import main as cli
+from src.generators.base import ImageGenerator
+from src.generators.registry import GeneratorRegistry
+from src.generators.stability_generator import StabilityGenerator
+from src.processors.conversion_pool import convert_sprites
+from src.utils.journal import JOURNAL_FILENAME
+
+
+def seeded_image(seed):
+    """Blocky noise that depends only on the seed (any image when seed is None)."""
+    cells = np.random.default_rng(seed).integers(0, 256, (8, 8, 3), dtype=np.uint8)
+    return Image.fromarray(cells).resize((128, 128), Image.Resampling.NEAREST)
+
+
+def png_bytes(image):
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class SeededGenerator(ImageGenerator):
+    """Generator whose images are a function of their seeds, like a seeded provider."""
+    SUPPORTS_SEED = True
+
+    def __init__(self, calls):
+        super().__init__(api_key='test')
+        self.calls = calls
+
+    def get_service_name(self) -> str:
+        return 'seeded'
+
+    def is_available(self) -> bool:
+        return True
+
+    async def generate(self, prompt, variations=1, seeds=None):
+        self.calls.append(seeds)
+        return [seeded_image(None if seeds is None else seeds[i]) for i in range(variations)]
+
+
+class TestSeeds:
+    """Integration tests for seeded, reproducible generation."""
+
+    @pytest.mark.asyncio
+    async def test_seeds_reach_provider_requests(self, monkeypatch):
+        """Test that each variation sends its own seed and equal seeds give byte-identical sprites."""
+        requests = []
+
+        def handler(request):
+            body = json.loads(request.content)
+            requests.append(body.get('seed'))
+            payload = base64.b64encode(png_bytes(seeded_image(body.get('seed')))).decode('ascii')
+            return httpx.Response(200, json={'artifacts': [{'base64': payload, 'finishReason': 'SUCCESS'}]})
+
+        class Registry(GeneratorRegistry):
+            def _register_all_generators(self):
+                generator = StabilityGenerator(api_key='test')
+                generator.http_client = lambda **kwargs: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+                self.generators = {'stability': generator}
+
+        registry = Registry()
+        runs = []
+        for _ in range(2):
+            results = await registry.generate_all('a knight', 3, seed=7)
+            assert results['stability']['seeded']
+            runs.append([
+                [png_bytes(sprite) for sprite in convert_sprites(image, (16, 32)).values()]
+                for image in results['stability']['images']
+            ])
+        assert requests == [7, 8, 9] * 2
+        assert runs[0] == runs[1]
+        assert runs[0][0] != runs[0][1]
+
+        requests.clear()
+        results = await registry.generate_all('a knight', 1)
+        assert requests == [None]
+        assert not results['stability']['seeded']
+        assert registry.flight_key('a knight', 1, 7) != registry.flight_key('a knight', 1)
+
+    @pytest.mark.asyncio
+    async def test_seeded_sessions_reproduce(self, temp_output_dir, monkeypatch):
+        """Test that seeded sessions save identical files, record the seed and resume from it."""
+        calls = []
+
+        class Classifier:
+            async def classify(self, query):
+                return SimpleNamespace(
+                    is_image_request=True, confidence=1.0, image_description=query, rejection_reason=None
+                )
+
+        class Registry(GeneratorRegistry):
+            def _register_all_generators(self):
+                self.generators = {'seeded': SeededGenerator(calls)}
+
+        monkeypatch.setattr(cli, 'QueryClassifier', Classifier)
+        monkeypatch.setattr(cli, 'GeneratorRegistry', Registry)
+
+        sessions = []
+        for _ in range(2):
+            sessions.append(await cli.async_main(
+                'a green slime', 3, str(temp_output_dir), False, sizes=(16, 32), seed=41, share=False
+            ))
+        files = [
+            {path.relative_to(session): path.read_bytes() for path in (session / 'seeded').iterdir()}
+            for session in sessions
+        ]
+        assert calls == [[41, 42, 43]] * 2
+        assert len(files[0]) == 6 and files[0] == files[1]
+        metadata = json.loads((sessions[0] / 'metadata.json').read_text())
+        assert metadata['seed'] == 41
+        assert metadata['providers']['seeded']['seeded']
+        assert metadata['providers']['seeded']['template'] == 'sprite'
+
+        # Lose variation 2 of the first session; resume regenerates it from seed 42
+        journal = sessions[0] / JOURNAL_FILENAME
+        lines = [
+            line for line in journal.read_text().splitlines()
+            if not ('"image"' in line and '"variation": 2' in line) and '"finish"' not in line
+        ]
+        journal.write_text('\n'.join(lines) + '\n')
+        lost = sessions[0] / 'seeded' / 'variation_2.png'
+        original = lost.read_bytes()
+        lost.unlink()
+        calls.clear()
+        await cli.async_resume(sessions[0])
+        assert calls == [[42]]
+        assert lost.read_bytes() == original
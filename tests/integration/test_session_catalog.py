@@ -0,0 +1,111 @@
+import os
+import shutil
+from PIL import Image
+from src.utils.catalog import SessionCatalog
+from src.utils.file_manager import OutputManager
+
+
+class TestSessionCatalog:
+    """Integration tests for the SQLite session catalog."""
+    
+    def _populate(self, output_dir):
+        manager = OutputManager(str(output_dir))
+        session_path = manager.create_session_folder()
+        for i in range(1, 4):
+            manager.save_image(Image.new('RGB', (16, 16), 'red'), 'openai', i, session_path)
+        manager.save_image(Image.new('RGB', (16, 16), 'blue'), 'stability', 1, session_path)
+        results = {
+            'openai': {'variations_requested': 3, 'variations_generated': 3, 'errors': []},
+            'stability': {'variations_requested': 3, 'variations_generated': 1, 'errors': ['boom']}
+        }
+        manager.save_metadata('a cat', {'image_description': 'a cat'}, results, session_path)
+        return manager, session_path
+    
+    def test_output_manager_updates_catalog(self, temp_output_dir):
+        """Test that saving images and metadata keeps the catalog current."""
+        manager, session_path = self._populate(temp_output_dir)
+        catalog = manager.catalog
+        
+        assert catalog.provider_image_counts(session_path.name) == {'openai': 3, 'stability': 1}
+        session = catalog.get_session(session_path.name)
+        assert session['query'] == 'a cat'
+        assert session['total_images'] == 4
+        
+        entries, total = catalog.list_entries(session_path.name)
+        assert total == 3
+        assert [e['name'] for e in entries] == ['openai', 'stability', 'metadata.json']
+    
+    def test_session_summary_uses_catalog(self, temp_output_dir):
+        """Test that the session summary reports catalog counts."""
+        manager, session_path = self._populate(temp_output_dir)
+        
+        summary = manager.create_session_summary(session_path)
+        
+        assert "openai: 3 images" in summary
+        assert "stability: 1 images" in summary
+        assert "Total: 4 images" in summary
+    
+    def test_pagination_and_sorting(self, temp_output_dir):
+        """Test paginated, sorted listings."""
+        manager, session_path = self._populate(temp_output_dir)
+        provider = f"{session_path.name}/openai"
+        
+        page1, total = manager.catalog.list_entries(provider, page=1, per_page=2)
+        page2, _ = manager.catalog.list_entries(provider, page=2, per_page=2)
+        descending, _ = manager.catalog.list_entries(provider, descending=True)
+        
+        assert total == 3
+        assert [e['name'] for e in page1] == ['variation_1.png', 'variation_2.png']
+        assert [e['name'] for e in page2] == ['variation_3.png']
+        assert descending[0]['name'] == 'variation_3.png'
+    
+    def test_rescan_picks_up_external_changes(self, temp_output_dir):
+        """Test that a rescan indexes new directories and drops removed ones."""
+        manager, session_path = self._populate(temp_output_dir)
+        catalog = SessionCatalog(temp_output_dir)
+        catalog.rescan()
+        
+        os.makedirs(temp_output_dir / 'external' / 'openai')
+        Image.new('RGB', (16, 16)).save(temp_output_dir / 'external' / 'openai' / 'variation_1.png')
+        catalog.rescan()
+        assert catalog.provider_image_counts('external') == {'openai': 1}
+        
+        shutil.rmtree(session_path)
+        catalog.rescan()
+        names = [e['name'] for e in catalog.list_entries('')[0]]
+        assert names == ['external']
+        assert catalog.provider_image_counts(session_path.name) == {}
+        assert catalog.get_session(session_path.name) is None
+    
+    def test_search_by_text_provider_and_status(self, temp_output_dir):
+        """Test full-text, provider and success filters."""
+        manager, session_path = self._populate(temp_output_dir)
+        catalog = manager.catalog
+        
+        assert len(catalog.search(text='cat')) == 4
+        assert catalog.search(text='dog') == []
+        assert {r['provider'] for r in catalog.search(provider='stability')} == {'stability'}
+        assert {r['provider'] for r in catalog.search(success=False)} == {'stability'}
+        assert len(catalog.search(text='cat', success=True)) == 3
+    
+    def test_search_by_dominant_color(self, temp_output_dir):
+        """Test color queries against precomputed dominant colors."""
+        manager, session_path = self._populate(temp_output_dir)
+        
+        reds = manager.catalog.search(color=(250, 10, 10), color_distance=30)
+        blues = manager.catalog.search(color=(0, 0, 255), color_distance=30)
+        
+        assert {r['provider'] for r in reds} == {'openai'}
+        assert [r['provider'] for r in blues] == ['stability']
+        assert blues[0]['color_distance'] == 0.0
+    
+    def test_rescan_indexes_color_features(self, temp_output_dir):
+        """Test that images written outside the app become color-searchable after a rescan."""
+        catalog = SessionCatalog(temp_output_dir)
+        os.makedirs(temp_output_dir / 'external' / 'openai')
+        Image.new('RGB', (16, 16), (0, 255, 0)).save(temp_output_dir / 'external' / 'openai' / 'variation_1.png')
+        
+        catalog.rescan()
+        
+        results = catalog.search(color=(0, 250, 0), color_distance=10)
+        assert [r['path'] for r in results] == ['external/openai/variation_1.png']
@@ -0,0 +1,142 @@
+import asyncio
+import multiprocessing
+import sqlite3
+import threading
+import time
+import pytest
+from PIL import Image
+from src.utils.single_flight import FLIGHTS_FILENAME, STALE_AFTER, SingleFlight
+
+
+def slow_generate(calls_file, color='red', delay=0.3, fail=False, started=None, until=None):
+    """
+    Return a generate coroutine function that logs each call to a file.
+
+    started is set once the call is logged, and until, a blocking callable,
+    holds the generation open in place of the delay.
+    """
+    async def generate():
+        with open(calls_file, 'a') as f:
+            f.write('call\n')
+        if started is not None:
+            started.set()
+        if until is not None:
+            await asyncio.to_thread(until)
+        else:
+            await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError("provider down")
+        return {
+            'openai': {
+                'service': 'openai',
+                'variations_generated': 2,
+                'images': [Image.new('RGB', (8, 8), color), Image.new('RGB', (8, 8), 'blue')],
+                'errors': []
+            },
+            'freepik': {'service': 'freepik', 'variations_generated': 0, 'images': [], 'errors': ['quota']}
+        }
+    return generate
+
+
+def notify_on_wait(flight, notify):
+    """Call notify the first time flight is told to wait on another leader for a key."""
+    claim = flight._claim
+    notified = set()
+
+    def claim_and_notify(key, take_finished):
+        role, results = claim(key, take_finished)
+        if role == 'wait' and key not in notified:
+            notified.add(key)
+            notify()
+        return role, results
+
+    flight._claim = claim_and_notify
+
+
+async def lead_then_wait(leading, waiting, started):
+    """Run two flights, starting the second once the first is generating."""
+    leader = asyncio.ensure_future(leading)
+    await started.wait()
+    return await asyncio.gather(leader, waiting, return_exceptions=True)
+
+
+def run_in_process(base_dir, calls_file, queue, waiting):
+    flight = SingleFlight(base_dir, poll_interval=0.02)
+    notify_on_wait(flight, waiting.release)
+    # Whichever process leads holds the flight open until the other two wait on it
+    hold = lambda: [waiting.acquire(timeout=30) for _ in range(2)]
+    results = asyncio.run(flight.run('key', slow_generate(calls_file, until=hold)))
+    queue.put([image.getpixel((0, 0)) for image in results['openai']['images']])
+
+
+class TestSingleFlight:
+    """Integration tests for cross-process single-flight generation."""
+
+    def test_processes_share_one_generation(self, temp_output_dir):
+        """Test that concurrent processes with the same key call the providers once."""
+        calls_file = temp_output_dir / 'calls.txt'
+        queue = multiprocessing.Queue()
+        waiting = multiprocessing.Semaphore(0)
+        processes = [
+            multiprocessing.Process(target=run_in_process, args=(str(temp_output_dir), str(calls_file), queue, waiting))
+            for _ in range(3)
+        ]
+        for process in processes:
+            process.start()
+        pixels = [queue.get(timeout=30) for _ in processes]
+        for process in processes:
+            process.join(timeout=30)
+
+        assert calls_file.read_text().count('call') == 1
+        assert pixels == [[(255, 0, 0), (0, 0, 255)]] * 3
+
+    @pytest.mark.asyncio
+    async def test_waiters_get_results_and_take_over_failures(self, temp_output_dir):
+        """Test shared results keep errors, and a failed or abandoned leader is replaced."""
+        calls_file = temp_output_dir / 'calls.txt'
+        leader, waiter = (SingleFlight(temp_output_dir, poll_interval=0.01) for _ in range(2))
+        waiting = threading.Event()
+        notify_on_wait(waiter, waiting.set)
+
+        # The leader only finishes once the waiter has seen its flight
+        started = asyncio.Event()
+        first, second = await lead_then_wait(
+            leader.run('a', slow_generate(calls_file, started=started, until=lambda: waiting.wait(30))),
+            waiter.run('a', slow_generate(calls_file, color='green')),
+            started
+        )
+        assert calls_file.read_text().count('call') == 1
+        assert second['openai']['images'][0].getpixel((0, 0)) == (255, 0, 0)
+        assert second['freepik'] == {'service': 'freepik', 'variations_generated': 0, 'images': [], 'errors': ['quota']}
+
+        # A failing leader releases the flight and the waiter generates instead
+        waiting.clear()
+        started = asyncio.Event()
+        failed, retried = await lead_then_wait(
+            leader.run('b', slow_generate(calls_file, fail=True, started=started, until=lambda: waiting.wait(30))),
+            waiter.run('b', slow_generate(calls_file, color='green', delay=0)),
+            started
+        )
+        assert isinstance(failed, RuntimeError)
+        assert retried['openai']['images'][0].getpixel((0, 0)) == (0, 128, 0)
+
+        # A leader that stopped heartbeating is taken over
+        with sqlite3.connect(temp_output_dir / FLIGHTS_FILENAME) as conn:
+            conn.execute(
+                "INSERT INTO flights (key, owner, heartbeat) VALUES ('c', 'gone:1', ?)",
+                (time.time() - STALE_AFTER - 1,)
+            )
+        taken = await waiter.run('c', slow_generate(calls_file, color='green', delay=0))
+        assert taken['openai']['images'][0].getpixel((0, 0)) == (0, 128, 0)
+
+        # Late callers generate afresh unless they opt in to finished results
+        await waiter.run('a', slow_generate(calls_file, delay=0))
+        assert calls_file.read_text().count('call') == 5
+        await waiter.run('a', slow_generate(calls_file, delay=0), reuse_finished=True)
+        assert calls_file.read_text().count('call') == 5
+
+        # Finished results expire after the TTL
+        expiring = SingleFlight(temp_output_dir, ttl=0)
+        await asyncio.sleep(0.01)
+        await expiring.run('a', slow_generate(calls_file, delay=0), reuse_finished=True)
+        assert calls_file.read_text().count('call') == 6
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import httpx
+import pytest
+from PIL import Image
+from src.generators.base import ImageGenerator
+from src.processors.pixel_art import convert_to_pixel_art
+from src.utils.file_manager import OutputManager
+from src.utils.instrumentation import InstrumentedTransport
+from src.utils.tracing import get_tracer, span, start_tracing
+
+
+class FakeGenerator(ImageGenerator):
+    """Generator that downloads a PNG through a mocked HTTP transport."""
+
+    def __init__(self):
+        super().__init__(api_key='test')
+        self.payload = httpx.MockTransport(lambda request: httpx.Response(200, content=b'x' * 1024))
+
+    def get_service_name(self) -> str:
+        return 'fake'
+
+    def is_available(self) -> bool:
+        return True
+
+    async def generate(self, prompt, variations=1, seeds=None):
+        transport = InstrumentedTransport(self.payload, provider='fake')
+        async with httpx.AsyncClient(transport=transport) as client:
+            for _ in range(variations):
+                response = await client.get('https://cdn.example.com/image.png')
+                assert len(response.content) == 1024
+        return [Image.new('RGB', (64, 64), 'green') for _ in range(variations)]
+
+
+class TestTracing:
+    """Integration tests for pipeline tracing."""
+
+    @pytest.mark.asyncio
+    async def test_spans_nest_across_tasks(self):
+        """Test that spans in gathered tasks get their parent and their own track."""
+        tracer = start_tracing()
+
+        async def child(n):
+            with span('child', n=n):
+                await asyncio.sleep(0.01)
+
+        with span('parent'):
+            await asyncio.gather(child(1), child(2))
+
+        spans = {s['name'] + str(s.get('attributes', {}).get('n', '')): s for s in tracer.summary()}
+        parent_id = spans['parent']['id']
+        assert spans['child1']['parent'] == parent_id
+        assert spans['child2']['parent'] == parent_id
+        assert spans['child1']['duration_ms'] >= 10
+
+        events = [e for e in tracer.to_chrome_trace()['traceEvents'] if e['ph'] == 'X']
+        child_tracks = {e['tid'] for e in events if e['name'] == 'child'}
+        assert len(child_tracks) == 2
+
+    def test_span_is_noop_without_tracer(self):
+        """Test that instrumentation costs nothing when tracing is off."""
+        assert get_tracer() is None
+        with span('ignored') as current:
+            assert current is None
+        convert_to_pixel_art(Image.new('RGB', (32, 32), 'red'))
+
+    @pytest.mark.asyncio
+    async def test_pipeline_stages_recorded(self, temp_output_dir):
+        """Test generate, HTTP, conversion and save spans end up in metadata.json."""
+        tracer = start_tracing()
+        generator = FakeGenerator()
+
+        result = await generator.generate_with_metadata('a cat', variations=2)
+        manager = OutputManager(str(temp_output_dir))
+        session_path = manager.create_session_folder()
+        for i, image in enumerate(result['images'], 1):
+            manager.save_image(convert_to_pixel_art(image), 'fake', i, session_path)
+        metadata_path = manager.save_metadata(
+            'a cat', {}, {'fake': result}, session_path, timings=tracer.summary()
+        )
+
+        with open(metadata_path) as f:
+            timings = json.load(f)['timings']
+        names = [t['name'] for t in timings]
+        assert names.count('ImageGenerator.generate') == 1
+        assert names.count('http') == 2
+        assert names.count('convert_to_pixel_art') == 2
+        assert names.count('OutputManager.save_image') == 2
+
+        generate_span = timings[names.index('ImageGenerator.generate')]
+        http_span = timings[names.index('http')]
+        assert http_span['parent'] == generate_span['id']
+        assert http_span['attributes']['status'] == 200
+        assert http_span['attributes']['bytes'] == 1024
+        assert generate_span['attributes'] == {'provider': 'fake', 'variations': 2, 'images': 2}
+
+    @pytest.mark.asyncio
+    async def test_export_formats(self, temp_output_dir):
+        """Test Chrome trace and OTLP JSON exports, including failed spans."""
+        tracer = start_tracing()
+        with pytest.raises(ValueError):
+            with span('outer', provider='fake'):
+                with span('inner'):
+                    raise ValueError("boom")
+
+        chrome = json.loads(tracer.export(temp_output_dir / 'trace.json').read_text())
+        events = {e['name']: e for e in chrome['traceEvents'] if e['ph'] == 'X'}
+        assert events['inner']['args']['error'] == 'ValueError: boom'
+        assert events['outer']['dur'] >= events['inner']['dur']
+
+        otlp = json.loads(tracer.export(temp_output_dir / 'trace.otlp.json', 'otlp').read_text())
+        spans = {s['name']: s for s in otlp['resourceSpans'][0]['scopeSpans'][0]['spans']}
+        assert spans['inner']['parentSpanId'] == spans['outer']['spanId']
+        assert spans['inner']['status']['code'] == 2
+        assert spans['outer']['attributes'] == [{'key': 'provider', 'value': {'stringValue': 'fake'}}]
+        assert int(spans['outer']['endTimeUnixNano']) >= int(spans['outer']['startTimeUnixNano'])
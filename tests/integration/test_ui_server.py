@@ -0,0 +1,146 @@
+import io
+import os
+import pytest
+from PIL import Image
+import src.ui_server as ui_server
+from src.utils.file_manager import OutputManager
+
+
+@pytest.fixture
+def ui_client(temp_output_dir, monkeypatch):
+    """UI test client serving a temporary output directory with one session."""
+    monkeypatch.setattr(ui_server, 'OUTPUT_DIR', str(temp_output_dir))
+    monkeypatch.setattr(ui_server, '_catalog', None)
+    
+    manager = OutputManager(str(temp_output_dir))
+    session_path = manager.create_session_folder()
+    manager.save_image(Image.new('RGB', (16, 16), 'red'), 'openai', 1, session_path)
+    results = {'openai': {'variations_requested': 1, 'variations_generated': 1, 'errors': []}}
+    manager.save_metadata('a red square', {'image_description': 'red square'}, results, session_path)
+    
+    return ui_server.app.test_client(), session_path.name
+
+
+class TestUIServer:
+    """Integration tests for the output browser."""
+    
+    def test_directory_listing(self, ui_client):
+        """Test that the root listing shows indexed sessions."""
+        client, session = ui_client
+        
+        response = client.get('/')
+        
+        assert response.status_code == 200
+        assert session.encode() in response.data
+    
+    def test_preview_rendered_on_demand(self, ui_client):
+        """Test that previews are rendered from the sprite with the requested scale."""
+        client, session = ui_client
+        
+        response = client.get(f'/preview/{session}/openai/variation_1.png?scale=10&grid=0')
+        
+        assert response.status_code == 200
+        assert Image.open(io.BytesIO(response.data)).size == (160, 160)
+    
+    def test_raw_file_conditional_get(self, ui_client):
+        """Test that images are revalidated and a file replaced at the same path is served fresh."""
+        client, session = ui_client
+        url = f'/raw/{session}/openai/variation_1.png'
+        
+        response = client.get(url)
+        assert response.status_code == 200
+        assert 'no-cache' in response.headers['Cache-Control']
+        assert 'immutable' not in response.headers['Cache-Control']
+        
+        revalidated = client.get(url, headers={'If-None-Match': response.headers['ETag']})
+        assert revalidated.status_code == 304
+        
+        # e.g. dedupe --action link swaps in a hard link at the same path
+        path = ui_server.resolve_output_path(f'{session}/openai/variation_1.png')
+        Image.new('RGB', (16, 16), 'blue').save(path + '.new', 'PNG')
+        os.replace(path + '.new', path)
+        replaced = client.get(url, headers={'If-None-Match': response.headers['ETag']})
+        assert replaced.status_code == 200
+        assert Image.open(io.BytesIO(replaced.data)).getpixel((0, 0)) == (0, 0, 255)
+    
+    def test_raw_file_range_request(self, ui_client):
+        """Test that byte ranges are honoured."""
+        client, session = ui_client
+        
+        response = client.get(f'/raw/{session}/openai/variation_1.png', headers={'Range': 'bytes=0-7'})
+        
+        assert response.status_code == 206
+        assert response.data == b'\x89PNG\r\n\x1a\n'
+    
+    def test_json_view_revalidation(self, ui_client):
+        """Test that JSON views carry an ETag and are answered with 304 when unchanged."""
+        client, session = ui_client
+        url = f'/{session}/metadata.json'
+        
+        response = client.get(url)
+        assert response.status_code == 200
+        assert b'a red square' in response.data
+        
+        revalidated = client.get(url, headers={'If-None-Match': response.headers['ETag']})
+        assert revalidated.status_code == 304
+    
+    def test_listing_revalidation_sees_child_rewrites(self, ui_client, temp_output_dir):
+        """Test that rewriting a file in place invalidates its directory listing's ETag."""
+        client, session = ui_client
+        
+        response = client.get(f'/{session}')
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        assert client.get(f'/{session}', headers={'If-None-Match': etag}).status_code == 304
+        
+        # Same name, so the directory's own mtime is untouched
+        results = {'openai': {'variations_requested': 1, 'variations_generated': 1, 'errors': ['x' * 4096]}}
+        OutputManager(str(temp_output_dir)).save_metadata('a red square', {}, results, temp_output_dir / session)
+        
+        revalidated = client.get(f'/{session}', headers={'If-None-Match': etag})
+        assert revalidated.status_code == 200
+        assert b'4.' in revalidated.data and revalidated.headers['ETag'] != etag
+    
+    def test_path_traversal_rejected(self, ui_client):
+        """Test that paths outside the output directory are refused."""
+        client, _ = ui_client
+        
+        response = client.get('/raw/..%2F..%2Fetc%2Fpasswd')
+        
+        assert response.status_code in (403, 404)
+    
+    def test_metrics_endpoint(self, ui_client, tmp_path, monkeypatch):
+        """Test that /metrics reports request counts and cache statistics across workers."""
+        client, session = ui_client
+        monkeypatch.setattr(ui_server, 'METRICS_DIR', str(tmp_path))
+        
+        client.get(f'/preview/{session}/openai/variation_1.png?scale=5')
+        client.get(f'/preview/{session}/openai/variation_1.png?scale=5')
+        response = client.get('/metrics')
+        
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain')
+        text = response.data.decode()
+        assert 'pixels_ui_requests_total{endpoint="serve_preview",status="200"}' in text
+        assert 'pixels_ui_request_duration_seconds_bucket{endpoint="serve_preview",le="+Inf"}' in text
+        assert 'pixels_cache_hits_total{cache="preview"}' in text
+        assert 'pixels_cache_hit_ratio{cache="preview",pid=' in text
+        # The serving worker published its snapshot for the others
+        assert len(list(tmp_path.glob('*.json'))) == 1
+    
+    def test_catalog_rescan_claimed_by_one_worker(self, tmp_path, monkeypatch):
+        """Test that only the first worker to claim the rescan lock runs the rescan."""
+        monkeypatch.setattr(ui_server, '_rescan_lock', None)
+        assert ui_server.claim_catalog_rescan(str(tmp_path))
+        # The claiming worker keeps its lock on later calls
+        assert ui_server.claim_catalog_rescan(str(tmp_path))
+        first = ui_server._rescan_lock
+        
+        # Another worker opens the lock file separately and is refused
+        monkeypatch.setattr(ui_server, '_rescan_lock', None)
+        assert not ui_server.claim_catalog_rescan(str(tmp_path))
+        
+        # Once the first worker exits its lock is released for a replacement
+        first.close()
+        assert ui_server.claim_catalog_rescan(str(tmp_path))
+        ui_server._rescan_lock.close()
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import multiprocessing
+import time
+from types import SimpleNamespace
+import pytest
+from PIL import Image, ImageDraw
+from src import main as cli
+from src.generators.base import ImageGenerator
+from src.generators import registry as registry_module
+from src.generators.registry import GeneratorRegistry
+from src.processors.prompts import PROMPT_ENGINE
+from src.utils.journal import JOURNAL_FILENAME
+from src.utils.rate_limit import SharedRateLimiter, rate_limits
+from src import worker_pool
+from src.worker_pool import run_pool
+
+
+def take_tokens(limiter, count, stamps):
+    async def take():
+        for _ in range(count):
+            await limiter.acquire('openai')
+            stamps.put(time.monotonic())
+    asyncio.run(take())
+
+
+class SquareGenerator(ImageGenerator):
+    """Generator drawing a square whose color depends on the prompt."""
+
+    def get_service_name(self) -> str:
+        return 'squares'
+
+    def is_available(self) -> bool:
+        return True
+
+    async def generate(self, prompt, variations=1, seeds=None):
+        await asyncio.sleep(0.05)
+        shade = sum(map(ord, prompt)) % 200
+        image = Image.new('RGB', (128, 128), 'white')
+        ImageDraw.Draw(image).rectangle((32, 32, 96, 96), fill=(shade, 50, 200 - shade))
+        return [image] * variations
+
+
+class StyledGenerator(SquareGenerator):
+    """Square generator recording the styled prompt it sends, after a network wait."""
+
+    def __init__(self, sent):
+        super().__init__(api_key='test')
+        self.sent = sent
+
+    def get_service_name(self) -> str:
+        # A provider with two templates to choose between
+        return 'stability'
+
+    async def generate(self, prompt, variations=1, seeds=None):
+        images = await super().generate(prompt, variations, seeds)
+        self.sent[prompt] = self.style_prompt(prompt)
+        return images
+
+
+class Classifier:
+    async def classify(self, query):
+        return SimpleNamespace(
+            is_image_request=query != 'tell me a joke', confidence=1.0,
+            image_description=query, rejection_reason='not an image'
+        )
+
+
+class Registry(GeneratorRegistry):
+    def _register_all_generators(self):
+        self.generators = {'squares': SquareGenerator(api_key='test')}
+
+
+class TestWorkerPool:
+    """Integration tests for the multi-process worker pool and shared rate limits."""
+
+    def test_rate_limit_is_shared_across_processes(self):
+        """Test that processes drawing from one limiter stay within its combined rate."""
+        limiter = SharedRateLimiter({'openai': 1200}, burst_seconds=0.1)
+        stamps = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=take_tokens, args=(limiter, 4, stamps)) for _ in range(3)]
+        started = time.monotonic()
+        for process in processes:
+            process.start()
+        times = sorted(stamps.get(timeout=10) for _ in range(12))
+        for process in processes:
+            process.join(timeout=10)
+
+        # 20 requests/s with a burst of 2: the 12th request waits for 10 refills
+        assert times[-1] - started >= 0.45
+        assert asyncio.run(limiter.acquire('unlimited', 100)) == 0
+
+        with pytest.raises(ValueError):
+            SharedRateLimiter({'openai': 0})
+
+    def test_rate_limit_configuration(self, monkeypatch):
+        """Test defaults, environment and option precedence."""
+        monkeypatch.setenv('RATE_LIMIT_OPENAI', '120')
+        limits = rate_limits({'stability': 30})
+        assert limits['openai'] == 120
+        assert limits['stability'] == 30
+        assert limits['replicate'] > 0
+
+    def test_pool_runs_every_query(self, temp_output_dir, monkeypatch):
+        """Test that workers share the queue, give each session its own folder and report failures."""
+        monkeypatch.setattr(cli, 'QueryClassifier', Classifier)
+        monkeypatch.setattr(registry_module, 'GeneratorRegistry', Registry)
+        queries = [f"a square number {n}" for n in range(5)] + ['tell me a joke']
+        options = {'variations': 1, 'output_dir': str(temp_output_dir), 'no_pixel_art': False}
+
+        # Workers are forked, so they record the metrics ports they open here
+        monkeypatch.setattr(worker_pool, 'start_metrics_server',
+                            lambda port: (temp_output_dir / f"metrics-{port}").touch())
+
+        results = run_pool(queries, workers=2, concurrency=2, options=options,
+                           limiter=SharedRateLimiter({'squares': 6000}), metrics_port=9100)
+
+        assert [result['query'] for result in results] == queries
+        assert [result['status'] for result in results] == ['ok'] * 5 + ['failed']
+        sessions = {result['session'] for result in results[:5]}
+        assert len(sessions) == 5
+        for session in sessions:
+            assert (temp_output_dir / session / 'squares' / 'variation_1.png').exists()
+        assert {result['worker'] for result in results} <= {0, 1}
+        assert sorted(path.name for path in temp_output_dir.glob('metrics-*')) == ['metrics-9100', 'metrics-9101']
+
+    @pytest.mark.asyncio
+    async def test_lanes_keep_their_own_templates(self, temp_output_dir, monkeypatch):
+        """Test that concurrent sessions on one registry each send the template they journaled."""
+        sent = {}
+
+        class Styled(GeneratorRegistry):
+            def _register_all_generators(self):
+                self.generators = {'stability': StyledGenerator(sent)}
+
+        # The first session picks the usual template, the second the next one
+        templates = iter(PROMPT_ENGINE.templates_for('stability'))
+        monkeypatch.setattr(PROMPT_ENGINE, 'choose_template', lambda name, stats=None: next(templates))
+        monkeypatch.setattr(cli, 'QueryClassifier', Classifier)
+        registry = Styled()
+
+        sessions = await asyncio.gather(*(
+            cli.async_main(query, 1, str(temp_output_dir), False, registry=registry)
+            for query in ('a red square', 'a blue square')
+        ))
+
+        journaled = set()
+        for query, session in zip(('a red square', 'a blue square'), sessions):
+            start = json.loads((session / JOURNAL_FILENAME).read_text().splitlines()[0])
+            template = start['templates']['stability']
+            assert sent[query] == PROMPT_ENGINE.render(query, 'stability', template)
+            journaled.add(template)
+        assert len(journaled) == 2
+        assert registry.generators['stability'].prompt_template is None